@@ -0,0 +1,108 @@
+-- Agregados pré-calculados para as perguntas mais frequentes do text-to-SQL.
+-- Refrescados no fim de cada ingestão (utils/db_connection.refresh_materialized_views).
+-- Cada vista tem um índice único para permitir REFRESH ... CONCURRENTLY.
+
+-- Prevalência / incidência / mortalidade por país, ano e doença
+-- (média sobre faixas etárias e género)
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_global_health_country_year AS
+SELECT
+    country,
+    year,
+    disease_name,
+    disease_category,
+    ROUND(AVG(prevalence_rate), 2) AS avg_prevalence_rate,
+    ROUND(AVG(incidence_rate), 2) AS avg_incidence_rate,
+    ROUND(AVG(mortality_rate), 2) AS avg_mortality_rate,
+    ROUND(AVG(recovery_rate), 2) AS avg_recovery_rate,
+    SUM(population_affected) AS total_population_affected,
+    SUM(dalys) AS total_dalys,
+    ROUND(AVG(healthcare_access_pct), 2) AS avg_healthcare_access_pct,
+    ROUND(AVG(doctors_per_1000), 2) AS avg_doctors_per_1000,
+    ROUND(AVG(hospital_beds_per_1000), 2) AS avg_hospital_beds_per_1000,
+    ROUND(AVG(average_treatment_cost_usd), 2) AS avg_treatment_cost_usd,
+    COUNT(*) AS n_records
+FROM global_health_stats
+GROUP BY country, year, disease_name, disease_category;
+
+CREATE UNIQUE INDEX IF NOT EXISTS mv_global_health_country_year_key
+    ON mv_global_health_country_year (country, year, disease_name, disease_category);
+
+-- Taxas de diagnóstico e fatores de risco BRFSS por ano do inquérito e estado (código FIPS).
+-- Códigos BRFSS: 1 = sim; 7/9 = não sabe/recusou (excluídos do denominador).
+-- Versões anteriores agregavam só por estado (misturando os anos): recriada sem ela.
+-- to_regclass (e não ::regclass) para o script correr numa base de dados vazia.
+DO $$
+BEGIN
+    IF to_regclass('mv_brfss_state_rates') IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM pg_attribute
+        WHERE attrelid = to_regclass('mv_brfss_state_rates')
+          AND attname = 'survey_year' AND NOT attisdropped
+    ) THEN
+        DROP MATERIALIZED VIEW mv_brfss_state_rates;
+    END IF;
+END $$;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_brfss_state_rates AS
+SELECT
+    survey_year,
+    state_code,
+    COUNT(*) AS n_respondents,
+    ROUND(100 * AVG(CASE WHEN diagnosed_diabetes = 1 THEN 1.0 WHEN diagnosed_diabetes IN (2, 3, 4) THEN 0 END), 2) AS diabetes_pct,
+    ROUND(100 * AVG(CASE WHEN diagnosed_asthma = 1 THEN 1.0 WHEN diagnosed_asthma = 2 THEN 0 END), 2) AS asthma_pct,
+    ROUND(100 * AVG(CASE WHEN diagnosed_stroke = 1 THEN 1.0 WHEN diagnosed_stroke = 2 THEN 0 END), 2) AS stroke_pct,
+    ROUND(100 * AVG(CASE WHEN diagnosed_heart_attack = 1 THEN 1.0 WHEN diagnosed_heart_attack = 2 THEN 0 END), 2) AS heart_attack_pct,
+    ROUND(100 * AVG(CASE WHEN diagnosed_heart_dis = 1 THEN 1.0 WHEN diagnosed_heart_dis = 2 THEN 0 END), 2) AS heart_disease_pct,
+    ROUND(100 * AVG(CASE WHEN diagnosed_copd = 1 THEN 1.0 WHEN diagnosed_copd = 2 THEN 0 END), 2) AS copd_pct,
+    ROUND(100 * AVG(CASE WHEN diagnosed_depressive = 1 THEN 1.0 WHEN diagnosed_depressive = 2 THEN 0 END), 2) AS depression_pct,
+    ROUND(100 * AVG(CASE WHEN diagnosed_kidney_dis = 1 THEN 1.0 WHEN diagnosed_kidney_dis = 2 THEN 0 END), 2) AS kidney_disease_pct,
+    ROUND(100 * AVG(CASE WHEN diagnosed_arthritis = 1 THEN 1.0 WHEN diagnosed_arthritis = 2 THEN 0 END), 2) AS arthritis_pct,
+    ROUND(100 * AVG(CASE WHEN diagnosed_skin_cancer = 1 THEN 1.0 WHEN diagnosed_skin_cancer = 2 THEN 0 END), 2) AS skin_cancer_pct,
+    ROUND(100 * AVG(CASE WHEN diagnosed_other_cancer = 1 THEN 1.0 WHEN diagnosed_other_cancer = 2 THEN 0 END), 2) AS other_cancer_pct,
+    ROUND(100 * AVG(CASE WHEN high_blood_pressure = 1 THEN 1.0 WHEN high_blood_pressure IN (2, 3, 4) THEN 0 END), 2) AS high_blood_pressure_pct,
+    ROUND(100 * AVG(CASE WHEN high_cholesterol = 1 THEN 1.0 WHEN high_cholesterol = 2 THEN 0 END), 2) AS high_cholesterol_pct,
+    ROUND(100 * AVG(CASE WHEN smoke_100 = 1 THEN 1.0 WHEN smoke_100 = 2 THEN 0 END), 2) AS smoked_100_pct,
+    ROUND(100 * AVG(CASE WHEN alcohol_binge = 2 THEN 1.0 WHEN alcohol_binge = 1 THEN 0 END), 2) AS binge_drinking_pct,
+    ROUND(100 * AVG(CASE WHEN exercise_any = 1 THEN 1.0 WHEN exercise_any = 2 THEN 0 END), 2) AS exercise_any_pct,
+    ROUND(AVG(bmi), 2) AS avg_bmi
+FROM brfss_responses
+GROUP BY survey_year, state_code;
+
+CREATE UNIQUE INDEX IF NOT EXISTS mv_brfss_state_rates_key
+    ON mv_brfss_state_rates (survey_year, state_code);
+
+-- Cobertura vacinal WUENIC por país, vacina e ano (sem JOINs às dimensões)
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_immunization_coverage AS
+SELECT
+    c.iso_code,
+    c.country_name,
+    v.vaccine_code,
+    f.year,
+    f.wuenic_coverage,
+    f.administrative_coverage,
+    f.calculated_coverage,
+    f.children_vaccinated,
+    f.children_target,
+    f.anomaly_flag
+FROM immunization_fact f
+JOIN country_dim c ON c.id = f.country_id
+JOIN vaccine_dim v ON v.id = f.vaccine_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS mv_immunization_coverage_key
+    ON mv_immunization_coverage (iso_code, vaccine_code, year);
+
+-- Cobertura vacinal global por vacina e ano (ponderada pela população-alvo)
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_immunization_global_year AS
+SELECT
+    v.vaccine_code,
+    f.year,
+    COUNT(*) AS n_countries,
+    ROUND(AVG(f.wuenic_coverage), 2) AS avg_wuenic_coverage,
+    SUM(f.children_vaccinated) AS children_vaccinated,
+    SUM(f.children_target) AS children_target,
+    ROUND(100.0 * SUM(f.children_vaccinated) / NULLIF(SUM(f.children_target), 0), 2) AS weighted_coverage_pct
+FROM immunization_fact f
+JOIN vaccine_dim v ON v.id = f.vaccine_id
+GROUP BY v.vaccine_code, f.year;
+
+CREATE UNIQUE INDEX IF NOT EXISTS mv_immunization_global_year_key
+    ON mv_immunization_global_year (vaccine_code, year);
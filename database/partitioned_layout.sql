@@ -0,0 +1,90 @@
+-- Layout opcional para as tabelas grandes de inquéritos e indicadores.
+-- Migra uma base de dados criada com schema.sql (e materialized_views.sql):
+--   * brfss_responses: particionada por intervalo de survey_year (uma partição por
+--     ano + DEFAULT); o filtro por ano passa a ler só a partição certa. Índice B-tree
+--     de cobertura (state_code) com as colunas mais agregadas, para index-only scans.
+--   * chronic_disease_indicators: reescrita por ordem de (year_start, location_abbr)
+--     com BRIN em (year_start, year_end) e B-trees de cobertura para os filtros
+--     habituais (pergunta + local, tópico + ano). Não é particionada: ~1M linhas e a
+--     chave única row_key (carga incremental) teria de incluir a coluna de partição.
+--
+-- Uso (psql, a partir da raiz do projeto; brfss_year = ano das linhas BRFSS antigas,
+-- que não tinham survey_year):
+--   docker compose exec -T db_sql psql -U $SQL_USER -d $SQL_DB -v brfss_year=2023 \
+--       < database/partitioned_layout.sql
+--   docker compose exec -T db_sql psql -U $SQL_USER -d $SQL_DB < database/materialized_views.sql
+-- (o segundo comando recria mv_brfss_state_rates, que depende da tabela antiga)
+-- Os loaders continuam iguais: anos fora de 2011-2035 vão para a partição DEFAULT.
+-- Benchmark antes/depois: python -m sql.bench_layout (ver README).
+
+\set ON_ERROR_STOP on
+\if :{?brfss_year}
+\else
+    \set brfss_year 2023
+\endif
+
+BEGIN;
+
+-- 1. BRFSS: ano do inquérito e chave (survey_year, sequence_no) no schema antigo
+ALTER TABLE brfss_responses ADD COLUMN IF NOT EXISTS survey_year INT;
+UPDATE brfss_responses SET survey_year = :brfss_year WHERE survey_year IS NULL;
+
+-- A vista depende da tabela antiga; recriada por materialized_views.sql
+DROP MATERIALIZED VIEW IF EXISTS mv_brfss_state_rates;
+
+ALTER TABLE brfss_responses RENAME TO brfss_responses_heap;
+ALTER TABLE brfss_responses_heap DROP CONSTRAINT IF EXISTS brfss_responses_pkey;
+ALTER TABLE brfss_responses_heap DROP CONSTRAINT IF EXISTS brfss_responses_sequence_no_key;
+ALTER TABLE brfss_responses_heap DROP CONSTRAINT IF EXISTS brfss_responses_year_seq;
+DROP INDEX IF EXISTS brfss_responses_year_seq;
+
+CREATE TABLE brfss_responses (LIKE brfss_responses_heap INCLUDING DEFAULTS)
+    PARTITION BY RANGE (survey_year);
+ALTER TABLE brfss_responses ALTER COLUMN survey_year SET NOT NULL;
+-- Em tabelas particionadas as chaves únicas têm de incluir a coluna de partição
+ALTER TABLE brfss_responses ADD PRIMARY KEY (survey_year, brfss_id);
+ALTER TABLE brfss_responses
+    ADD CONSTRAINT brfss_responses_year_seq UNIQUE (survey_year, sequence_no);
+
+-- A sequência do SERIAL passa para a tabela nova (senão seria apagada com a antiga)
+ALTER SEQUENCE brfss_responses_brfss_id_seq OWNED BY brfss_responses.brfss_id;
+
+DO $$
+BEGIN
+    FOR y IN 2011..2035 LOOP
+        EXECUTE format(
+            'CREATE TABLE brfss_responses_y%s PARTITION OF brfss_responses '
+            'FOR VALUES FROM (%s) TO (%s)', y, y, y + 1
+        );
+    END LOOP;
+END $$;
+CREATE TABLE brfss_responses_default PARTITION OF brfss_responses DEFAULT;
+
+-- Agregados por estado (mv_brfss_state_rates e perguntas ad hoc) sem ler o heap
+CREATE INDEX brfss_responses_state_cover ON brfss_responses (state_code)
+    INCLUDE (diagnosed_diabetes, high_blood_pressure, high_cholesterol, smoke_100,
+             general_health, bmi);
+
+INSERT INTO brfss_responses SELECT * FROM brfss_responses_heap;
+DROP TABLE brfss_responses_heap;
+
+-- 2. CDI: reescrita ordenada para o BRIN ser seletivo + índices de cobertura
+CREATE INDEX chronic_disease_indicators_year_location
+    ON chronic_disease_indicators (year_start, location_abbr);
+CLUSTER chronic_disease_indicators USING chronic_disease_indicators_year_location;
+DROP INDEX chronic_disease_indicators_year_location;
+
+CREATE INDEX IF NOT EXISTS chronic_disease_indicators_years_brin
+    ON chronic_disease_indicators USING brin (year_start, year_end);
+CREATE INDEX IF NOT EXISTS chronic_disease_indicators_question_cover
+    ON chronic_disease_indicators (question_id, location_abbr)
+    INCLUDE (year_start, year_end, data_value_type, stratification_1, data_value);
+CREATE INDEX IF NOT EXISTS chronic_disease_indicators_topic_cover
+    ON chronic_disease_indicators (topic_id, year_start)
+    INCLUDE (location_abbr, data_value_type, data_value);
+
+COMMIT;
+
+-- 3. Estatísticas e visibility map (index-only scans); fora da transação
+VACUUM (ANALYZE) brfss_responses;
+VACUUM (ANALYZE) chronic_disease_indicators;
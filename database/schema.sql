@@ -51,10 +51,15 @@ CREATE TABLE IF NOT EXISTS global_health_stats (
     per_capita_income_usd DECIMAL(12,2),
     education_index DECIMAL(4,3),
     urbanization_rate_pct DECIMAL(5,2),
+    -- Hashes da chave natural e do conteúdo (carga incremental, copy_loader.upsert_csv)
+    row_key TEXT,
+    row_hash TEXT,
     -- Unique constraint para evitar duplicados se correres o script várias vezes
     UNIQUE(country, year, disease_name, age_group, gender)
 );
 
+CREATE UNIQUE INDEX IF NOT EXISTS global_health_stats_row_key ON global_health_stats (row_key);
+
 CREATE TABLE IF NOT EXISTS chronic_disease_indicators (
     indicator_id SERIAL PRIMARY KEY,
     year_start INT,
@@ -76,12 +81,18 @@ CREATE TABLE IF NOT EXISTS chronic_disease_indicators (
     location_id VARCHAR(10),
     topic_id VARCHAR(50),
     question_id VARCHAR(50),
-    stratification_id_1 VARCHAR(50)
+    stratification_id_1 VARCHAR(50),
+    row_key TEXT,
+    row_hash TEXT
 );
 
+CREATE UNIQUE INDEX IF NOT EXISTS chronic_disease_indicators_row_key
+    ON chronic_disease_indicators (row_key);
+
 
 CREATE TABLE IF NOT EXISTS brfss_responses (
     brfss_id SERIAL PRIMARY KEY,
+    survey_year INT,             -- Ano do inquérito (ficheiro BRFSS<ano>.csv)
     state_code INT,
 
     -- Diagnósticos e Condições de Saúde (O "Diagnóstico")
@@ -115,9 +126,11 @@ CREATE TABLE IF NOT EXISTS brfss_responses (
     height_cm INT,               -- HTM4
     bmi DECIMAL(6,2),            -- _BMI5
     
-    -- Identificador Único
-    sequence_no BIGINT UNIQUE
+    -- Identificador do respondente (único dentro de cada ano)
+    sequence_no BIGINT,
+    CONSTRAINT brfss_responses_year_seq UNIQUE (survey_year, sequence_no)
 );
+-- Layout particionado por ano (opcional): database/partitioned_layout.sql
 
 
 
@@ -170,5 +183,32 @@ CREATE TABLE IF NOT EXISTS drugs_side_effects (
     no_of_reviews INTEGER,
     drug_link TEXT,
     medical_condition_url TEXT,
+    row_key TEXT,
+    row_hash TEXT,
     UNIQUE (drug_name, medical_condition)
 );
+
+CREATE UNIQUE INDEX IF NOT EXISTS drugs_side_effects_row_key ON drugs_side_effects (row_key);
+
+-- Versão de cada tabela, incrementada pelos loaders (utils/ingest_*.py) a cada
+-- ingestão. Usada pelo sql_query para invalidar as caches por tabela.
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Registo das queries geradas pelo sql_query (duração e estado), usado pelo
+-- relatório de queries lentas e pelo index advisor (src/sql/index_advisor.py).
+CREATE TABLE IF NOT EXISTS sql_workload (
+    id BIGSERIAL PRIMARY KEY,
+    question TEXT,
+    sql_text TEXT NOT NULL,
+    sql_hash TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration_ms DOUBLE PRECISION,
+    row_count INT,
+    executed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS sql_workload_executed_at ON sql_workload USING brin (executed_at);
@@ -4,6 +4,8 @@ import re
 import ollama
 from pymongo import MongoClient
 
+from utils.result_render import render_list
+
 LLM_MODEL = "gemma3:4b"
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://ollama:11434")
 
@@ -52,35 +54,47 @@ def _search_disease_info(db, keyword: str) -> dict | None:
     )
 
 
-def _build_context(action: str, plan: dict, db) -> str:
+def _list_result(action: str, plan: dict, db) -> tuple[str, list[str]]:
+    """
+    Título e itens das ações de listagem. Sem resultados, devolve a mensagem
+    de 'nada encontrado' como título e uma lista vazia.
+    """
     if action == "search_indicators":
         keyword = plan.get("keyword", "")
         results = _search_indicators(db, keyword)
         if not results:
-            return f"Nenhum indicador encontrado para '{keyword}'."
-        lines = [f"Indicadores WHO relacionados com '{keyword}' ({len(results)} encontrados):"]
-        for r in results:
-            lines.append(f"  - [{r.get('IndicatorCode', 'N/A')}] {r.get('IndicatorName', 'N/A')}")
-        return "\n".join(lines)
+            return f"Nenhum indicador encontrado para '{keyword}'.", []
+        items = [
+            f"[{r.get('IndicatorCode', 'N/A')}] {r.get('IndicatorName', 'N/A')}" for r in results
+        ]
+        return f"Indicadores WHO relacionados com '{keyword}'", items
 
-    elif action == "get_dimension_values":
+    if action == "get_dimension_values":
         dim_code = plan.get("dimension_code", "").upper()
         results = _get_dimension_values(db, dim_code)
         if not results:
-            return f"Nenhum valor encontrado para a dimensão '{dim_code}'."
-        lines = [f"Valores disponíveis para a dimensão '{dim_code}' ({len(results)} mostrados):"]
-        for r in results:
-            lines.append(f"  - [{r.get('Code', 'N/A')}] {r.get('Title', 'N/A')}")
-        return "\n".join(lines)
+            return f"Nenhum valor encontrado para a dimensão '{dim_code}'.", []
+        items = [f"[{r.get('Code', 'N/A')}] {r.get('Title', 'N/A')}" for r in results]
+        return f"Valores disponíveis para a dimensão '{dim_code}'", items
 
-    elif action == "list_collections":
-        collections = _list_collections(db)
-        lines = [f"Coleções disponíveis na base de dados MongoDB ({len(collections)} total):"]
-        for c in collections:
-            lines.append(f"  - {c}")
-        return "\n".join(lines)
+    collections = _list_collections(db)
+    return "Coleções disponíveis na base de dados MongoDB", collections
 
-    elif action == "search_disease_info":
+
+LIST_ACTIONS = ("search_indicators", "get_dimension_values", "list_collections")
+
+
+def _format_list(title: str, items: list[str]) -> str:
+    if not items:
+        return title
+    return f"{title} ({len(items)}):\n" + "\n".join(f"  - {item}" for item in items)
+
+
+def _build_context(action: str, plan: dict, db) -> str:
+    if action in LIST_ACTIONS:
+        return _format_list(*_list_result(action, plan, db))
+
+    if action == "search_disease_info":
         keyword = plan.get("keyword", "")
         result = _search_disease_info(db, keyword)
         if not result:
@@ -234,11 +248,21 @@ def _plan_query(user_question: str) -> tuple[str, dict]:
 def mongo_query(user_question: str) -> str:
     """
     Consulta a base de dados MongoDB com base na pergunta do utilizador.
-    Utiliza correspondência por regex para determinar a ação e o LLM para gerar a resposta final.
+    Utiliza correspondência por regex para determinar a ação; listas pequenas são
+    formatadas diretamente e o LLM só gera a resposta final para os restantes casos.
     """
     db = _get_mongo_db()
     action, plan = _plan_query(user_question)
-    context = _build_context(action, plan, db)
+
+    # Listas pequenas (coleções, dimensões, indicadores) não precisam do LLM
+    if action in LIST_ACTIONS:
+        title, items = _list_result(action, plan, db)
+        rendered = render_list(title, items) if items else title
+        if rendered is not None:
+            return rendered
+        context = _format_list(title, items)
+    else:
+        context = _build_context(action, plan, db)
 
     client = ollama.Client(host=OLLAMA_HOST)
     prompt = (
@@ -1,11 +1,16 @@
-from fastapi import APIRouter
+import asyncio
+
+from fastapi import APIRouter, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
 from agents.mongo_tool import mongo_query
 from agents.tool_selection_agent import select_tool
 from api.rules import apply_rules
 from rag.pipeline import rag_answer
-from sql.sql_query_tool import sql_query
+from sql.async_sql_tool import sql_query
+from sql.guardrails import QueryRejected
+from sql.templates import stats as template_stats
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -14,26 +19,53 @@ class ChatRequest(BaseModel):
     message: str
 
 
+async def _sql_query(message: str, request: Request) -> str:
+    """
+    Corre o sql_query assíncrono (pool asyncpg, sem ocupar threads) e cancela-o,
+    incluindo a query no Postgres, se o cliente se desligar.
+    """
+    task = asyncio.create_task(sql_query(message))
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=0.5)
+        if done:
+            return task.result()
+        if await request.is_disconnected():
+            task.cancel()
+            raise QueryRejected("cancelled", "Pedido cancelado pelo cliente.")
+
+
 @router.post("/")
-def chat(req: ChatRequest):
-    rule_response = apply_rules(req.message)
+async def chat(req: ChatRequest, request: Request):
+    rule_response = await run_in_threadpool(apply_rules, req.message)
     if rule_response:
         return {"response": rule_response}
 
-    decision = select_tool(req.message)
+    decision = await run_in_threadpool(select_tool, req.message)
     tool = decision["tool"]
 
-    if tool == "rag_answer":
-        reply = rag_answer(req.message)
-    elif tool == "both":
-        rag_reply = rag_answer(req.message)
-        sql_reply = sql_query(req.message)
-        reply = f"Resposta RAG:\n{rag_reply}\n\nResposta SQL:\n{sql_reply}"
-    elif tool == "sql_query":
-        reply = sql_query(req.message)
-    elif tool == "mongo_query":
-        reply = mongo_query(req.message)
-    else:
-        reply = "Desculpe, não consigo responder a essa pergunta."
+    try:
+        if tool == "rag_answer":
+            reply = await run_in_threadpool(rag_answer, req.message)
+        elif tool == "both":
+            rag_reply = await run_in_threadpool(rag_answer, req.message)
+            try:
+                sql_reply = await _sql_query(req.message, request)
+            except QueryRejected as e:
+                sql_reply = e.message
+            reply = f"Resposta RAG:\n{rag_reply}\n\nResposta SQL:\n{sql_reply}"
+        elif tool == "sql_query":
+            reply = await _sql_query(req.message, request)
+        elif tool == "mongo_query":
+            reply = await run_in_threadpool(mongo_query, req.message)
+        else:
+            reply = "Desculpe, não consigo responder a essa pergunta."
+    except QueryRejected as e:
+        return {"response": e.message, "tool_used": tool, "error": e.to_dict()}
 
     return {"response": reply, "tool_used": tool}
+
+
+@router.get("/stats")
+def stats():
+    """Taxa de acerto dos templates SQL e latência de geração poupada."""
+    return template_stats.summary()
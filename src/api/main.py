@@ -1,7 +1,18 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
+from sql.async_sql_tool import close_pool
+
 from .chat import router as chat_router
 
-app = FastAPI(title="DrHouseGPT API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await close_pool()
+
+
+app = FastAPI(title="DrHouseGPT API", lifespan=lifespan)
 
 app.include_router(chat_router)
@@ -11,6 +11,8 @@ from dotenv import load_dotenv
 from pymongo import MongoClient
 from pymongo.errors import OperationFailure, ServerSelectionTimeoutError
 
+from utils.http_cache import http_get
+
 load_dotenv()
 
 GHO_BASE_URL = "https://ghoapi.azureedge.net/api"
@@ -73,7 +75,7 @@ def verify_mongo_connection(db=None) -> tuple[bool, str]:
 def fetch_indicators() -> list[dict]:
     """Fetch all indicators from GHO API."""
     url = f"{GHO_BASE_URL}/Indicator"
-    resp = requests.get(url, timeout=30)
+    resp = http_get(url, timeout=30)
     resp.raise_for_status()
     data = resp.json()
     return data.get("value", [])
@@ -82,7 +84,7 @@ def fetch_indicators() -> list[dict]:
 def fetch_dimensions() -> list[dict]:
     """Fetch all dimensions from GHO API."""
     url = f"{GHO_BASE_URL}/Dimension"
-    resp = requests.get(url, timeout=30)
+    resp = http_get(url, timeout=30)
     resp.raise_for_status()
     data = resp.json()
     return data.get("value", [])
@@ -91,7 +93,7 @@ def fetch_dimensions() -> list[dict]:
 def fetch_dimension_values(dimension_code: str) -> list[dict]:
     """Fetch dimension values for a given dimension code."""
     url = f"{GHO_BASE_URL}/DIMENSION/{dimension_code}/DimensionValues"
-    resp = requests.get(url, timeout=30)
+    resp = http_get(url, timeout=30)
     resp.raise_for_status()
     data = resp.json()
     return data.get("value", [])
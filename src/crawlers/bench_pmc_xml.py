@@ -0,0 +1,93 @@
+"""
+Benchmark da extração de artigos PMC: árvore completa (etree.fromstring) vs iterparse.
+Gera um ficheiro XML sintético com N artigos e corre cada método num processo
+separado, reportando artigos/s e o pico de memória (RSS) desse processo.
+
+Uso: python bench_pmc_xml.py [n_artigos] [paragrafos_por_artigo]
+"""
+
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from lxml import etree
+from pmc_crawler import _extract_article
+from pmc_xml import iter_payloads_parallel, iter_pmc_articles
+
+PARAGRAPH = "Regular physical activity reduces the risk of chronic disease. " * 6
+
+
+def write_synthetic_xml(path, n_articles, n_paragraphs):
+    body = "".join(f"<sec><title>S{i}</title><p>{PARAGRAPH}</p></sec>" for i in range(n_paragraphs))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("<pmc-articleset>\n")
+        for i in range(n_articles):
+            f.write(
+                "<article><front><article-meta>"
+                f'<article-id pub-id-type="pmc">{i}</article-id>'
+                f"<title-group><article-title>Prevention study {i}</article-title></title-group>"
+                f"<abstract><p>{PARAGRAPH}</p></abstract>"
+                f"</article-meta></front><body>{body}</body>"
+                "<back><ref-list><ref><article-title>Ref</article-title></ref></ref-list></back>"
+                "</article>\n"
+            )
+        f.write("</pmc-articleset>\n")
+
+
+def _peak_rss_mb():
+    # ru_maxrss vem em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_tree(path):
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        root = etree.fromstring(f.read(), parser=etree.XMLParser(recover=True, huge_tree=True))
+    n = sum(1 for article in root.iterfind("article") if _extract_article(article))
+    return n, time.perf_counter() - start, _peak_rss_mb()
+
+
+def run_iterparse(path):
+    start = time.perf_counter()
+    n = sum(1 for _ in iter_pmc_articles(path))
+    return n, time.perf_counter() - start, _peak_rss_mb()
+
+
+def run_parallel(paths):
+    start = time.perf_counter()
+    n = sum(1 for _ in iter_payloads_parallel(paths))
+    return n, time.perf_counter() - start, _peak_rss_mb()
+
+
+def report(label, n, elapsed, rss):
+    print(f"{label:<22} {n:>7} artigos  {elapsed:7.2f}s  {n / elapsed:9.0f} art/s  {rss:8.1f} MB")
+
+
+if __name__ == "__main__":
+    n_articles = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    n_paragraphs = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    n_files = os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.xml")
+        write_synthetic_xml(path, n_articles, n_paragraphs)
+        print(f"Ficheiro sintético: {os.path.getsize(path) / 1e6:.1f} MB, {n_articles} artigos\n")
+
+        # Um lote por core para o modo paralelo
+        paths = []
+        for i in range(n_files):
+            p = os.path.join(tmp, f"part_{i}.xml")
+            write_synthetic_xml(p, n_articles // n_files, n_paragraphs)
+            paths.append(p)
+
+        # Cada método corre num processo novo para o pico de RSS ser isolado
+        for label, func, arg in [
+            ("fromstring (árvore)", run_tree, path),
+            ("iterparse", run_iterparse, path),
+            (f"iterparse x{n_files} proc", run_parallel, paths),
+        ]:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                report(label, *executor.submit(func, arg).result())
@@ -1,12 +1,32 @@
-import json
 import os
+import sys
 
 import chromadb
+from crawl_store import iter_records
+from near_dedup import MinHashIndex, content_key
 from sentence_transformers import SentenceTransformer
 
-# Ficheiros
+# Ficheiros (JSONL dos crawlers ou .json antigos)
 DATA_DIR = "../../data"
-JSON_FILES = ["pmc_simples.json", "pmc_preventive_medicine_clean.json"]
+JSON_FILES = [
+    "pmc_simples.json",
+    "pmc_preventive_medicine_clean.json",
+    "pmc_preventive_medicine_clean.jsonl",
+    "dataset_pubmed_preventive.json",
+    "dataset_pubmed_preventive.jsonl",
+]
+BATCH_CHUNKS = 512  # chunks por lote de embedding/inserção
+
+# Índices de quase-duplicados (persistentes entre execuções incrementais)
+DEDUP_DIR = os.path.join(DATA_DIR, "dedup")
+ARTICLE_INDEX = os.path.join(DEDUP_DIR, "pmc_articles.npz")
+CHUNK_INDEX = os.path.join(DEDUP_DIR, "pmc_chunks.npz")
+
+# Por omissão a ingestão é incremental; --rebuild apaga a coleção e os índices
+REBUILD = "--rebuild" in sys.argv
+
+# Primeiro ID das coleções antigas (pmc_0, pmc_1, ...), antes dos IDs por conteúdo
+LEGACY_CHUNK_ID = "pmc_0"
 
 
 # Chunking
@@ -28,60 +48,122 @@ embbeding_model = SentenceTransformer("BAAI/bge-base-en-v1.5")
 client = chromadb.HttpClient(host="localhost", port=8000)
 print(client.list_collections())  # Lista coleções
 
-if COLLECTION_NAME in [c.name for c in client.list_collections()]:
-    client.delete_collection(COLLECTION_NAME)
+# Uma coleção com os IDs antigos seria duplicada pelo modo incremental: reconstrói-se
+if not REBUILD and COLLECTION_NAME in [c.name for c in client.list_collections()]:
+    legacy = client.get_collection(COLLECTION_NAME).get(ids=[LEGACY_CHUNK_ID], include=[])
+    if legacy["ids"]:
+        print(f"{COLLECTION_NAME} tem IDs sequenciais antigos; a reconstruir a coleção")
+        REBUILD = True
+
+if REBUILD:
+    if COLLECTION_NAME in [c.name for c in client.list_collections()]:
+        client.delete_collection(COLLECTION_NAME)
+    for index_path in (ARTICLE_INDEX, CHUNK_INDEX):
+        if os.path.exists(index_path):
+            os.remove(index_path)
 
 collection = client.get_or_create_collection(name=COLLECTION_NAME)
 
 
 # Carregar Ficheiros
-all_articles = []
-for file in JSON_FILES:
-    path = os.path.join(DATA_DIR, file)
+def iter_articles(files=JSON_FILES):
+    for file in files:
+        path = os.path.join(DATA_DIR, file)
+
+        if not os.path.exists(path):
+            print(f"File not found:{path}")
+            continue
+
+        yield from iter_records(path)
 
-    if not os.path.exists(path):
-        print(f"File not found:{path}")
 
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        all_articles.extend(data)
+def store_batch(documents, metadatas, ids):
+    # Criar embeddings
+    embbeding = embbeding_model.encode(documents, normalize_embeddings=True)
 
-print(f"Loaded {len(all_articles)} total articles")
+    # Armazenar no Chromadb
+    collection.upsert(documents=documents, embeddings=embbeding, metadatas=metadatas, ids=ids)
 
 
-# Preparar para guardar no ChromaDB
+# Preparar e guardar no ChromaDB em lotes, sem manter o corpus todo em memória
+article_index = MinHashIndex(ARTICLE_INDEX)
+chunk_index = MinHashIndex(CHUNK_INDEX)
+
 documents = []
 metadatas = []
 ids = []
 
-doc_id = 0
-for article in all_articles:
-    text = article.get("text", "").strip()
+n_articles = 0
+n_chunks = 0
+n_stored = 0
+dup_articles = 0
+dup_chunks = 0
+# Já ingeridos numa execução anterior (mesma chave), separados dos quase-duplicados
+seen_articles = 0
+seen_chunks = 0
+for article in iter_articles():
+    n_articles += 1
+    text = (article.get("text") or article.get("abstract") or "").strip()
     if not text:
         continue
 
+    # Artigo inteiro já ingerido (ou quase igual a outro)?
+    source = article.get("source_url") or article.get("url")
+    article_key = source or content_key(text)
+    duplicate_of = article_index.check_and_add(article_key, text)
+    if duplicate_of == article_key:
+        seen_articles += 1
+        continue
+    if duplicate_of is not None:
+        dup_articles += 1
+        continue
+
     chunks = chunk_text(text)
 
     for chunk in chunks:
+        n_chunks += 1
+        chunk_id = f"pmc_{content_key(chunk)[:24]}"
+        duplicate_of = chunk_index.check_and_add(chunk_id, chunk)
+        if duplicate_of == chunk_id:
+            seen_chunks += 1
+            continue
+        if duplicate_of is not None:
+            dup_chunks += 1
+            continue
+
         documents.append(chunk)
 
         metadatas.append(
             {
                 "title": article.get("title"),
-                "source_url": article.get("source_url"),
-                "keyword": str(article.get("keyword") or article.get("mesh_query") or ""),
+                "source_url": source,
+                "keyword": str(
+                    article.get("keyword")
+                    or article.get("mesh_query")
+                    or article.get("search_term")
+                    or ""
+                ),
             }
         )
 
-        ids.append(f"pmc_{doc_id}")
-        doc_id += 1
+        ids.append(chunk_id)
 
-print(f"Prepared {len(documents)} chunks")
+    if len(documents) >= BATCH_CHUNKS:
+        store_batch(documents, metadatas, ids)
+        n_stored += len(documents)
+        print(f"Stored {n_stored} chunks so far")
+        documents, metadatas, ids = [], [], []
 
-# Criar embeddings
-embbeding = embbeding_model.encode(documents, normalize_embeddings=True, show_progress_bar=True)
+if documents:
+    store_batch(documents, metadatas, ids)
+    n_stored += len(documents)
 
-# Armazenar no Chromadb
-collection.add(documents=documents, embeddings=embbeding, metadatas=metadatas, ids=ids)
+article_index.save()
+chunk_index.save()
 
-print("Stored in ChromaDB Successfully!")
+print(
+    f"Loaded {n_articles} total articles ({seen_articles} already ingested, "
+    f"{dup_articles} near-duplicate articles skipped)"
+)
+print(f"Near-duplicate chunks removed: {dup_chunks} of {n_chunks} ({seen_chunks} already ingested)")
+print(f"Stored {n_stored} chunks in ChromaDB Successfully!")
@@ -0,0 +1,83 @@
+"""
+Persistência incremental dos crawlers.
+Os registos são acrescentados a um ficheiro JSONL à medida que são recolhidos e o
+progresso (IDs concluídos e offsets por query) fica num checkpoint append-only,
+para que um crawl interrompido possa ser retomado sem perder trabalho.
+"""
+
+import json
+import os
+
+
+def append_records(path, records):
+    """Acrescenta registos ao ficheiro JSONL e força a escrita em disco."""
+    if not records:
+        return 0
+
+    with open(path, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+    return len(records)
+
+
+def iter_records(path):
+    """
+    Lê registos um a um. Aceita JSONL (uma linha por registo) e, por compatibilidade,
+    os ficheiros .json antigos com uma lista única.
+    """
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # Última linha truncada por uma interrupção a meio da escrita
+                continue
+
+
+class CrawlCheckpoint:
+    """
+    Checkpoint append-only: cada linha regista IDs concluídos ou o próximo offset
+    de uma query. Ao abrir, o ficheiro é reproduzido para reconstruir o estado.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done_ids = set()
+        self.offsets = {}
+
+        if os.path.exists(path):
+            for event in iter_records(path):
+                self.done_ids.update(event.get("ids", []))
+                if "offset" in event:
+                    self.offsets[event["key"]] = event["offset"]
+
+    def is_done(self, item_id):
+        return item_id in self.done_ids
+
+    def offset(self, key, default=0):
+        return self.offsets.get(key, default)
+
+    def mark(self, ids=(), key=None, offset=None):
+        """Regista IDs processados e/ou o próximo offset de 'key' numa única linha."""
+        ids = [i for i in ids if i not in self.done_ids]
+        event = {}
+        if ids:
+            event["ids"] = ids
+            self.done_ids.update(ids)
+        if key is not None:
+            event["key"] = key
+            event["offset"] = offset
+            self.offsets[key] = offset
+        if event:
+            append_records(self.path, [event])
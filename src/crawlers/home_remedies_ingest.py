@@ -6,17 +6,24 @@ generates embeddings and stores in a dedicated ChromaDB collection.
 
 import io
 import os
-import uuid
+import sys
 
 import chromadb
-import requests
+from near_dedup import MinHashIndex, content_key
 from pypdf import PdfReader
 from sentence_transformers import SentenceTransformer
 
+# Permite importar utils/ quando o script corre a partir de crawlers/
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from utils.http_cache import http_get  # noqa: E402
+
 PDF_URL = "https://www.columbia.edu/itc/hs/medical/residency/peds/new_compeds_site/pdfs_new/quick_guideto_homeremedies2-20-08.pdf"
 COLLECTION_NAME = "home_remedies"
 CHUNK_SIZE = 500  # caracteres por chunk
 CHUNK_OVERLAP = 50  # sobreposição entre chunks
+DEDUP_INDEX = os.path.join(
+    os.path.dirname(__file__), "..", "..", "data", "dedup", "home_remedies_chunks.npz"
+)
 
 embedding_model = SentenceTransformer("BAAI/bge-base-en-v1.5")
 client_chromadb = chromadb.HttpClient(
@@ -27,7 +34,7 @@ client_chromadb = chromadb.HttpClient(
 def extract_text(url: str) -> str:
     """Download PDF and extract text."""
     print(f"A fazer download do PDF: {url}")
-    resp = requests.get(url, timeout=30)
+    resp = http_get(url, timeout=30)
     resp.raise_for_status()
     reader = PdfReader(io.BytesIO(resp.content))
     text = ""
@@ -60,6 +67,19 @@ def ingest_home_remedies():
     chunks = split_into_chunks(text)
     print(f"Chunks gerados: {len(chunks)}")
 
+    # 2b. Remover quase-duplicados (dentro do PDF e face a execuções anteriores)
+    dedup_index = MinHashIndex(DEDUP_INDEX)
+    chunk_indexes = [
+        i
+        for i, chunk in enumerate(chunks)
+        if not dedup_index.check_and_add(content_key(chunk), chunk)
+    ]
+    print(f"Chunks quase-duplicados removidos: {len(chunks) - len(chunk_indexes)}")
+    chunks = [chunks[i] for i in chunk_indexes]
+    if not chunks:
+        print("Nada de novo para inserir.")
+        return {"chunks": 0}
+
     # 3. Embeddings
     print("A gerar embeddings...")
     embeddings = embedding_model.encode(chunks, normalize_embeddings=True).tolist()
@@ -67,17 +87,19 @@ def ingest_home_remedies():
     # 4. Inserção no ChromaDB
     collection = client_chromadb.get_or_create_collection(name=COLLECTION_NAME)
 
-    ids = [str(uuid.uuid4()) for _ in chunks]
-    metadatas = [{"source": PDF_URL, "chunk_index": i} for i in range(len(chunks))]
+    ids = [content_key(chunk) for chunk in chunks]
+    metadatas = [{"source": PDF_URL, "chunk_index": i} for i in chunk_indexes]
 
-    collection.add(
+    collection.upsert(
         ids=ids,
         documents=chunks,
         embeddings=embeddings,
         metadatas=metadatas,
     )
 
+    dedup_index.save()
     print(f"Sucesso! {len(chunks)} chunks inseridos na coleção '{COLLECTION_NAME}'.")
+    return {"chunks": len(chunks)}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,126 @@
+"""
+Deteção de quase-duplicados com MinHash + LSH sobre shingles de palavras.
+Usado na ingestão para o ChromaDB, ao nível do artigo e do chunk, para não
+pagar embedding/armazenamento de cópias (ex.: o mesmo artigo vindo do PMC e do
+PubMed, ou fact sheets da WHO replicadas). O índice de assinaturas é guardado em
+disco para que execuções incrementais comparem também com o que já foi ingerido.
+"""
+
+import hashlib
+import os
+import re
+import struct
+from collections import defaultdict
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 16  # 16 bandas x 8 linhas: candidatos a partir de ~0.7 de semelhança
+THRESHOLD = 0.8  # Jaccard estimada mínima para considerar duplicado
+SHINGLE_SIZE = 5  # palavras por shingle
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD_RE = re.compile(r"\w+")
+
+
+def _permutations(num_perm, seed=1):
+    gen = np.random.RandomState(seed)
+    a = gen.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    b = gen.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def content_key(text):
+    """Chave estável para um texto (usada como ID do chunk no ChromaDB)."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class MinHashIndex:
+    """Índice LSH persistente de assinaturas MinHash."""
+
+    def __init__(self, path=None, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS):
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._a, self._b = _permutations(num_perm)
+
+        self.keys = []
+        self.signatures = []
+        self._buckets = defaultdict(list)
+
+        if path and os.path.exists(path):
+            data = np.load(path)
+            for key, sig in zip(data["keys"].tolist(), data["signatures"]):
+                self._insert(key, sig)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def signature(self, text):
+        hashes = np.fromiter(
+            (
+                struct.unpack("<I", hashlib.sha1(s.encode("utf-8")).digest()[:4])[0]
+                for s in shingles(text)
+            ),
+            dtype=np.uint64,
+        )
+        if hashes.size == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+
+        # (a * x + b) mod p, truncado a 32 bits, para cada permutação x shingle
+        phv = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return phv.min(axis=0)
+
+    def _band_keys(self, sig):
+        return [(i, sig[i * self.rows : (i + 1) * self.rows].tobytes()) for i in range(self.bands)]
+
+    def _insert(self, key, sig):
+        idx = len(self.keys)
+        self.keys.append(key)
+        self.signatures.append(sig)
+        for band in self._band_keys(sig):
+            self._buckets[band].append(idx)
+
+    def query(self, sig):
+        """Devolve a chave do primeiro quase-duplicado já indexado, ou None."""
+        candidates = set()
+        for band in self._band_keys(sig):
+            candidates.update(self._buckets.get(band, ()))
+        for idx in candidates:
+            if np.mean(self.signatures[idx] == sig) >= self.threshold:
+                return self.keys[idx]
+        return None
+
+    def check_and_add(self, key, text):
+        """
+        Se 'text' for quase-duplicado de algo já indexado devolve a chave desse
+        documento; caso contrário indexa-o e devolve None.
+        """
+        sig = self.signature(text)
+        duplicate_of = self.query(sig)
+        if duplicate_of is None:
+            self._insert(key, sig)
+        return duplicate_of
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        signatures = (
+            np.stack(self.signatures)
+            if self.signatures
+            else np.empty((0, self.num_perm), dtype=np.uint64)
+        )
+        tmp = f"{self.path}.tmp.npz"
+        np.savez_compressed(tmp, keys=np.array(self.keys, dtype=str), signatures=signatures)
+        os.replace(tmp, self.path)
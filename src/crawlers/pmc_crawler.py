@@ -1,11 +1,17 @@
-import json
+import os
+import sys
 import time
 from datetime import datetime
 
-import requests
-from lxml import etree
+from crawl_store import CrawlCheckpoint, append_records
+from pmc_xml import iter_pmc_articles
+from requests import RequestException
 from tqdm import tqdm
 
+# Permite importar utils/ quando o script corre a partir de crawlers/
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from utils.http_cache import http_get  # noqa: E402
+
 PMC_QUERIES = [
     "preventive medicine[MeSH Terms]",
     "disease prevention[MeSH Terms]",
@@ -14,8 +20,15 @@ PMC_QUERIES = [
     "health promotion[MeSH Terms]",
 ]
 
-MAX_RESULTS_PER_QUERY = 10
-OUTPUT_FILE = "pmc_preventive_medicine_clean.json"
+MAX_RESULTS_PER_QUERY = 1000  # objetivo de artigos por query MeSH
+BATCH_SIZE = 200  # artigos por pedido efetch (retstart/retmax)
+ESEARCH_MAX_RETRIEVABLE = 9999  # o ESearch não devolve registos para além deste offset
+PARTITION_START_YEAR = 1990
+REQUEST_DELAY = 0.4  # ~3 pedidos/s sem API key
+
+EUTILS_BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+OUTPUT_FILE = "pmc_preventive_medicine_clean.jsonl"
+CHECKPOINT_FILE = "pmc_preventive_medicine_clean.checkpoint.jsonl"
 
 MEDICAL_KEYWORDS = [
     "prevent",
@@ -32,62 +45,147 @@ MEDICAL_KEYWORDS = [
 ]
 
 
-def search_pmc(query, max_results=10):
-    url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
+def esearch_history(query, db="pmc", mindate=None, maxdate=None):
+    """
+    Regista a pesquisa no history server do ESearch (usehistory=y).
+    Devolve (count, webenv, query_key) para paginar depois com efetch.
+    """
+    params = {
+        "db": db,
+        "term": query,
+        "usehistory": "y",
+        "retmax": 0,
+        "retmode": "json",
+    }
+    if mindate or maxdate:
+        params.update({"datetype": "pdat", "mindate": mindate, "maxdate": maxdate})
+
+    r = http_get(f"{EUTILS_BASE_URL}/esearch.fcgi", params=params, timeout=30)
+    r.raise_for_status()
+    result = r.json()["esearchresult"]
+
+    return int(result.get("count", 0)), result["webenv"], result["querykey"]
+
+
+def partition_by_date(query, db="pmc", start_year=None, end_year=None):
+    """
+    Divide a query em intervalos de anos até cada intervalo caber no limite
+    de 10k registos do ESearch. Devolve [(mindate, maxdate, count, webenv, query_key)].
+    """
+    mindate = str(start_year) if start_year else None
+    maxdate = str(end_year) if end_year else None
+
+    count, webenv, query_key = esearch_history(query, db, mindate, maxdate)
+    time.sleep(REQUEST_DELAY)
+
+    if count <= ESEARCH_MAX_RETRIEVABLE or (start_year and start_year == end_year):
+        return [(mindate, maxdate, count, webenv, query_key)]
+
+    if start_year is None:
+        # Sem intervalo: tudo o que é anterior a PARTITION_START_YEAR fica num só bloco
+        return partition_by_date(query, db, 1800, PARTITION_START_YEAR - 1) + partition_by_date(
+            query, db, PARTITION_START_YEAR, datetime.now().year
+        )
+
+    middle = (start_year + end_year) // 2
+    return partition_by_date(query, db, start_year, middle) + partition_by_date(
+        query, db, middle + 1, end_year
+    )
+
+
+def efetch_batch(webenv, query_key, retstart, retmax=BATCH_SIZE, db="pmc"):
+    """
+    Obtém um lote de registos (XML) de qualquer base E-utilities (pmc, pubmed)
+    diretamente do history server.
+    Devolve None se o pedido falhar (a sessão já repete 429/5xx com backoff).
+    """
+    params = {
+        "db": db,
+        "WebEnv": webenv,
+        "query_key": query_key,
+        "retstart": retstart,
+        "retmax": retmax,
+        "retmode": "xml",
+    }
 
-    params = {"db": "pmc", "term": query, "retmax": max_results, "retmode": "json"}
+    try:
+        r = http_get(f"{EUTILS_BASE_URL}/efetch.fcgi", params=params, timeout=120)
+    except RequestException as e:
+        print("efetch error:", e)
+        return None
 
-    r = requests.get(url, params=params, timeout=30)
-    data = r.json()
+    if r.status_code == 200:
+        return r.content
 
-    return data["esearchresult"]["idlist"]
+    return None
 
 
-def fetch_pmc_xml(pmc_id):
-    url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
+def iter_pmc_batches(query, target=MAX_RESULTS_PER_QUERY, batch_size=BATCH_SIZE, checkpoint=None):
+    """
+    Percorre os resultados de uma query em lotes de efetch (retstart/retmax),
+    particionando por data quando a query ultrapassa o limite de 10k.
+    Para assim que 'target' artigos tiverem sido pedidos.
+    Devolve (chave da partição, próximo retstart, xml) para o chamador gravar o checkpoint;
+    com um checkpoint, os offsets já concluídos são saltados.
+    Se um lote falhar, a query pára sem o devolver: o checkpoint fica antes dele e
+    voltar a correr o crawl pede-o de novo.
+    """
+    partitions = partition_by_date(query)
+    keys = [f"{query}|{mindate}-{maxdate}" for mindate, maxdate, *_ in partitions]
+    offsets = {key: checkpoint.offset(key) if checkpoint else 0 for key in keys}
+    requested = sum(offsets.values())
 
-    params = {"db": "pmc", "id": pmc_id, "retmode": "xml"}
+    for key, (mindate, maxdate, count, webenv, query_key) in zip(keys, partitions):
+        print(f"  [{mindate or '...'}-{maxdate or '...'}] {count} resultados")
 
-    r = requests.get(url, params=params, timeout=30)
+        for retstart in range(offsets[key], min(count, ESEARCH_MAX_RETRIEVABLE), batch_size):
+            if requested >= target:
+                return
 
-    if r.status_code == 200 and "<article" in r.text:
-        return r.text
+            retmax = min(batch_size, target - requested)
+            xml = efetch_batch(webenv, query_key, retstart, retmax)
+            time.sleep(REQUEST_DELAY)
+            if xml is None:
+                print(f"  Lote {retstart}-{retstart + retmax} falhou; a query fica para retomar.")
+                return
+            requested += retmax
 
-    return None
+            yield key, retstart + retmax, xml
 
 
-def extract_text_from_xml(xml_text):
-    try:
-        parser = etree.XMLParser(recover=True)
-        root = etree.fromstring(xml_text.encode("utf-8"), parser=parser)
+def _extract_article(article):
+    title = ""
+    abstract = ""
+    body_text = []
 
-        title = ""
-        abstract = ""
-        body_text = []
+    # title
+    title_el = article.find(".//article-title")
+    if title_el is not None:
+        title = " ".join(title_el.itertext())
 
-        # title
-        title_el = root.find(".//article-title")
-        if title_el is not None:
-            title = " ".join(title_el.itertext())
+    # abstract
+    abs_el = article.find(".//abstract")
+    if abs_el is not None:
+        abstract = " ".join(abs_el.itertext())
 
-        # abstract
-        abs_el = root.find(".//abstract")
-        if abs_el is not None:
-            abstract = " ".join(abs_el.itertext())
+    # body paragraphs
+    for p in article.findall(".//body//p"):
+        txt = " ".join(p.itertext()).strip()
+        if len(txt) > 80:
+            body_text.append(txt)
 
-        # body paragraphs
-        for p in root.findall(".//body//p"):
-            txt = " ".join(p.itertext()).strip()
-            if len(txt) > 80:
-                body_text.append(txt)
+    full_text = "\n\n".join(body_text)
 
-        full_text = "\n\n".join(body_text)
+    return title, abstract, full_text
 
-        return title, abstract, full_text
 
+def extract_articles_from_batch(xml_bytes):
+    """Devolve [(pmc_id, title, abstract, text)] para um lote efetch com vários <article>."""
+    try:
+        return list(iter_pmc_articles(xml_bytes))
     except Exception as e:
         print("XML parse error:", e)
-        return "", "", ""
+        return []
 
 
 def is_medical_article(title, abstract):
@@ -99,60 +197,61 @@ def is_medical_article(title, abstract):
     return False
 
 
-def crawl_pmc_medical():
-    records = []
-    seen = set()
+def crawl_pmc_medical(
+    target_per_query=MAX_RESULTS_PER_QUERY, output_file=OUTPUT_FILE, checkpoint_file=CHECKPOINT_FILE
+):
+    """
+    Recolhe artigos PMC e acrescenta-os a 'output_file' (JSONL) lote a lote.
+    Se o crawl for interrompido, voltar a correr retoma a partir do checkpoint.
+    Devolve o número de artigos gravados nesta execução.
+    """
+    checkpoint = CrawlCheckpoint(checkpoint_file)
+    saved = 0
 
     for query in PMC_QUERIES:
         print(f"\nSearching PMC: {query}")
 
-        ids = search_pmc(query, MAX_RESULTS_PER_QUERY)
+        with tqdm(total=target_per_query) as progress:
+            batches = iter_pmc_batches(query, target_per_query, checkpoint=checkpoint)
+            for key, next_offset, xml in batches:
+                articles = extract_articles_from_batch(xml)
+                progress.update(len(articles))
 
-        for pmc_id in tqdm(ids):
-            if pmc_id in seen:
-                continue
+                records = []
+                for pmc_id, title, abstract, text in articles:
+                    if not pmc_id or checkpoint.is_done(pmc_id):
+                        continue
 
-            xml = fetch_pmc_xml(pmc_id)
-            if not xml:
-                continue
+                    # filtros
+                    if not is_medical_article(title, abstract):
+                        continue
 
-            title, abstract, text = extract_text_from_xml(xml)
+                    if len(text) < 1000:
+                        continue
 
-            # filtros
-            if not is_medical_article(title, abstract):
-                continue
+                    records.append(
+                        {
+                            "pmc_id": pmc_id,
+                            "title": title,
+                            "abstract": abstract,
+                            "text": text,
+                            "mesh_query": query,
+                            "source_url": f"https://www.ncbi.nlm.nih.gov/pmc/articles/PMC{pmc_id}/",
+                            "data_crawling": datetime.now().isoformat(),
+                        }
+                    )
 
-            if len(text) < 1000:
-                continue
+                saved += append_records(output_file, records)
+                checkpoint.mark(
+                    ids=[pmc_id for pmc_id, *_ in articles if pmc_id], key=key, offset=next_offset
+                )
 
-            record = {
-                "pmc_id": pmc_id,
-                "title": title,
-                "abstract": abstract,
-                "text": text,
-                "mesh_query": query,
-                "source_url": f"https://www.ncbi.nlm.nih.gov/pmc/articles/PMC{pmc_id}/",
-                "data_crawling": datetime.now().isoformat(),
-            }
-
-            records.append(record)
-            seen.add(pmc_id)
-
-            time.sleep(0.5)
-
-    return records
-
-
-def save_json(data, file):
-    with open(file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    return saved
 
 
 if __name__ == "__main__":
-    data = crawl_pmc_medical()
-
-    print(f"\nCollected {len(data)} medical PMC articles")
+    total = crawl_pmc_medical()
 
-    save_json(data, OUTPUT_FILE)
+    print(f"\nCollected {total} medical PMC articles")
 
     print("Saved:", OUTPUT_FILE)
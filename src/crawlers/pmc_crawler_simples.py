@@ -1,15 +1,31 @@
-import json
 import os
+import queue
 import random
+import sys
 import time
+from collections import defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from urllib.parse import urlsplit
 
-import requests
 import trafilatura
+from crawl_store import CrawlCheckpoint, append_records
+
+# Permite importar utils/ quando o script corre a partir de crawlers/
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from utils.http_cache import http_get  # noqa: E402
 
 PDF_FOLDER = "pdfs_medicina_preventiva"
 os.makedirs(PDF_FOLDER, exist_ok=True)
 
+OUTPUT_FILE = "medicina_preventiva_fulltext.jsonl"
+CHECKPOINT_FILE = "medicina_preventiva_fulltext.checkpoint.jsonl"
+
+MAX_WORKERS = 16  # pedidos HTTP em simultâneo (todos os hosts)
+PER_HOST_CONCURRENCY = 2  # pedidos em simultâneo ao mesmo host
+PER_HOST_DELAY = (2, 5)  # segundos entre pedidos consecutivos de cada ligação a um host
+EXTRACT_WORKERS = os.cpu_count() or 1  # processos para a extração (CPU-bound)
+
 
 urls = [
     "https://www.who.int/news-room/fact-sheets/detail/physical-activity",
@@ -20,72 +36,178 @@ urls = [
 
 
 def download_pdf(url, save_folder=PDF_FOLDER):
-    """Baixa PDF se URL terminar em .pdf"""
+    """
+    Baixa PDF se URL terminar em .pdf. Devolve None se a resposta não for um PDF;
+    erros de rede e respostas não-200 propagam-se (o URL fica para a próxima execução).
+    """
+    headers = {"User-Agent": "Mozilla/5.0"}
+    r = http_get(url, headers=headers, timeout=30)
+    r.raise_for_status()
+    if "application/pdf" not in r.headers.get("Content-Type", ""):
+        return None
+    filename = os.path.join(save_folder, url.split("/")[-1])
+    if not os.path.exists(filename):
+        with open(filename, "wb") as f:
+            f.write(r.content)
+    return filename
+
+
+def fetch_html(url):
+    """
+    Descarrega o HTML pela sessão partilhada (keep-alive + cache).
+    Erros de rede e respostas não-200 propagam-se, como em download_pdf.
+    """
+    r = http_get(url, timeout=30)
+    r.raise_for_status()
+    return r.text
+
+
+def extract_html(html):
+    """Extrai texto limpo de HTML (corre num processo do pool)"""
     try:
-        headers = {"User-Agent": "Mozilla/5.0"}
-        r = requests.get(url, headers=headers, stream=True, timeout=30)
-        if r.status_code == 200 and "application/pdf" in r.headers.get("Content-Type", ""):
-            filename = os.path.join(save_folder, url.split("/")[-1])
-            if not os.path.exists(filename):
-                with open(filename, "wb") as f:
-                    for chunk in r.iter_content(1024):
-                        f.write(chunk)
-            return filename
+        return trafilatura.extract(html, include_comments=False, include_tables=False) or ""
     except Exception as e:
-        print(f"Erro ao baixar PDF {url}: {e}")
-    return None
+        print(f"Erro ao extrair HTML: {e}")
+        return ""
 
 
-def extract_text_from_url(url):
-    """Extrai texto limpo de HTML"""
+def extract_pdf(pdf_file):
+    """Extrai o texto de um PDF descarregado (corre num processo do pool)"""
+    import fitz
+
     try:
-        downloaded = trafilatura.fetch_url(url)
-        if downloaded:
-            text = trafilatura.extract(downloaded, include_comments=False, include_tables=False)
-            return text
+        with fitz.open(pdf_file) as doc:
+            return "".join(page.get_text() + "\n\n" for page in doc)
     except Exception as e:
-        print(f"Erro ao extrair HTML {url}: {e}")
-    return ""
+        print(f"Erro ao extrair PDF {pdf_file}: {e}")
+        return ""
 
 
-def crawl_medicina_preventiva(urls, keyword="medicina preventiva"):
-    results = []
+def extract_text_from_url(url):
+    """Extrai texto limpo de HTML"""
+    return extract_html(fetch_html(url)) if url else ""
+
+
+def _host_lanes(urls, concurrency):
+    """
+    Agrupa os URLs por host e divide cada host em 'concurrency' filas.
+    Cada fila é processada em série com o atraso de cortesia, por isso um host
+    nunca recebe mais do que 'concurrency' pedidos em simultâneo.
+    """
+    by_host = defaultdict(list)
     for url in urls:
-        print(f"\n Processando: {url}")
-        text = ""
-        # Tenta extrair texto limpo
-        text = extract_text_from_url(url)
-        if not text and url.lower().endswith(".pdf"):
-            pdf_file = download_pdf(url)
-            if pdf_file:
-                import fitz
-
-                doc = fitz.open(pdf_file)
-                for page in doc:
-                    text += page.get_text() + "\n\n"
-        if not text:
-            print(" Nenhum texto extraído, ignorando URL")
-            continue
-        result = {
-            "title": url.split("/")[-1].replace("-", " ").capitalize(),
-            "authors": [],
-            "year": None,
-            "source_url": url,
-            "keyword": keyword,
-            "text": text,
-            "data_crawling": datetime.now().isoformat(),
-        }
-        print(f" Extraído {len(text)} caracteres")
-        results.append(result)
-        time.sleep(random.uniform(2, 5))
-    return results
+        by_host[urlsplit(url).netloc].append(url)
+
+    lanes = []
+    for host_urls in by_host.values():
+        n = min(concurrency, len(host_urls))
+        lanes.extend(host_urls[i::n] for i in range(n))
+
+    # Hosts com mais URLs primeiro, para não ficarem a atrasar o fim do crawl
+    return sorted(lanes, key=len, reverse=True)
+
+
+def _crawl_lane(lane, delay, extract_pool, results):
+    """
+    Descarrega os URLs de uma fila e envia o HTML (ou o PDF já gravado) para extração
+    no pool de processos. Um erro (download falhado, pool de processos partido) vai para
+    a fila como future com a exceção e a fila continua com os URLs seguintes.
+    """
+    for i, url in enumerate(lane):
+        future = None
+        try:
+            if i:
+                time.sleep(random.uniform(*delay))
+            if urlsplit(url).path.lower().endswith(".pdf"):
+                pdf_file = download_pdf(url)
+                if pdf_file:
+                    future = extract_pool.submit(extract_pdf, pdf_file)
+            else:
+                html = fetch_html(url)
+                if html:
+                    future = extract_pool.submit(extract_html, html)
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+        # Cada URL produz sempre exatamente um resultado na fila
+        results.put((url, future))
+
+
+def _build_result(url, text, keyword):
+    return {
+        "title": url.split("/")[-1].replace("-", " ").capitalize(),
+        "authors": [],
+        "year": None,
+        "source_url": url,
+        "keyword": keyword,
+        "text": text,
+        "data_crawling": datetime.now().isoformat(),
+    }
+
+
+def crawl_medicina_preventiva(
+    urls,
+    keyword="medicina preventiva",
+    output_path=OUTPUT_FILE,
+    checkpoint_path=CHECKPOINT_FILE,
+    max_workers=MAX_WORKERS,
+    per_host_concurrency=PER_HOST_CONCURRENCY,
+    per_host_delay=PER_HOST_DELAY,
+):
+    """
+    Crawl concorrente e cortês: filas por host com concorrência e atraso configuráveis,
+    ligações reutilizadas pela sessão partilhada e extração num pool de processos,
+    para que o parsing (CPU) se sobreponha aos pedidos (rede).
+    Os documentos são acrescentados a 'output_path' (JSONL) à medida que ficam prontos.
+    Devolve o número de documentos gravados.
+    """
+    checkpoint = CrawlCheckpoint(checkpoint_path)
+    pending = [url for url in dict.fromkeys(urls) if not checkpoint.is_done(url)]
+    lanes = _host_lanes(pending, per_host_concurrency)
+    print(f"{len(pending)} URLs em {len(lanes)} filas ({len(urls) - len(pending)} já feitos)")
+
+    saved = 0
+    results = queue.Queue()
+    with (
+        ProcessPoolExecutor(max_workers=EXTRACT_WORKERS) as extract_pool,
+        ThreadPoolExecutor(max_workers=max_workers) as fetch_pool,
+    ):
+        for lane in lanes:
+            fetch_pool.submit(_crawl_lane, lane, per_host_delay, extract_pool, results)
+
+        # Consome os resultados à medida que ficam prontos (memória constante)
+        for _ in range(len(pending)):
+            url, text_future = results.get()
+            try:
+                text = text_future.result() if text_future else ""
+            except Exception as e:
+                # Sem checkpoint: o URL volta a ser tentado na próxima execução
+                print(f" Erro ao processar {url}: {e}")
+                continue
+
+            # Descarregado com sucesso: fica no checkpoint, com ou sem texto
+
+            if not text:
+                print(f" Nenhum texto extraído, ignorando URL: {url}")
+            else:
+                print(f" Extraído {len(text)} caracteres: {url}")
+                saved += append_records(output_path, [_build_result(url, text, keyword)])
+
+            checkpoint.mark(ids=[url])
+
+    return saved
+
+
+def load_seed_urls(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
 
 
+# Uso: python pmc_crawler_simples.py [ficheiro_com_urls.txt]
 def main():
-    data = crawl_medicina_preventiva(urls)
-    with open("medicina_preventiva_fulltext.json", "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"\n Guardado {len(data)} documentos em medicina_preventiva_fulltext.json")
+    seeds = load_seed_urls(sys.argv[1]) if len(sys.argv) > 1 else urls
+    total = crawl_medicina_preventiva(seeds)
+    print(f"\n Guardado {total} documentos em {OUTPUT_FILE}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,103 @@
+"""
+Extração em streaming de artigos PMC (JATS XML) com lxml.etree.iterparse.
+Percorre o documento uma única vez, emite um artigo de cada vez e liberta os
+elementos já processados, para que lotes efetch com centenas de artigos não
+fiquem inteiros em memória.
+"""
+
+import io
+from concurrent.futures import ProcessPoolExecutor
+
+from lxml import etree
+
+MIN_PARAGRAPH_CHARS = 80
+TAGS = ("article", "article-id", "article-title", "abstract", "body", "back", "p")
+
+
+def _text(el):
+    return " ".join(el.itertext())
+
+
+def _release(el):
+    """Limpa o elemento e os irmãos anteriores já processados."""
+    el.clear(keep_tail=True)
+    parent = el.getparent()
+    if parent is not None:
+        while el.getprevious() is not None:
+            del parent[0]
+
+
+def iter_pmc_articles(source):
+    """
+    Devolve (pmc_id, title, abstract, text) para cada <article> em 'source'
+    (caminho, ficheiro aberto ou bytes).
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+
+    pmc_id, title, abstract, paragraphs = None, "", "", []
+    body_depth = 0
+    back_depth = 0
+
+    events = etree.iterparse(
+        source,
+        events=("start", "end"),
+        tag=TAGS,
+        recover=True,
+        huge_tree=True,
+        remove_comments=True,
+    )
+
+    for event, el in events:
+        tag = el.tag
+
+        if event == "start":
+            if tag == "body":
+                body_depth += 1
+            elif tag == "back":
+                back_depth += 1
+            continue
+
+        if tag == "article-id" and pmc_id is None:
+            if el.get("pub-id-type") in ("pmc", "pmcid") and el.text:
+                pmc_id = el.text.strip().removeprefix("PMC")
+
+        elif tag == "article-title" and not title and not back_depth:
+            title = _text(el)
+
+        elif tag == "abstract" and not abstract:
+            abstract = _text(el)
+            _release(el)
+
+        elif tag == "p" and body_depth:
+            txt = _text(el).strip()
+            if len(txt) > MIN_PARAGRAPH_CHARS:
+                paragraphs.append(txt)
+            _release(el)
+
+        elif tag == "body":
+            body_depth -= 1
+
+        elif tag == "back":
+            back_depth -= 1
+            _release(el)
+
+        elif tag == "article":
+            yield pmc_id, title, abstract, "\n\n".join(paragraphs)
+            _release(el)
+            pmc_id, title, abstract, paragraphs = None, "", "", []
+
+
+def extract_payload(source):
+    """Versão materializada de iter_pmc_articles, para correr num worker do pool."""
+    return list(iter_pmc_articles(source))
+
+
+def iter_payloads_parallel(payloads, workers=None):
+    """
+    Extrai vários payloads (bytes ou caminhos de ficheiro) num ProcessPoolExecutor,
+    devolvendo os artigos de cada payload pela ordem de entrada.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for articles in executor.map(extract_payload, payloads):
+            yield from articles
@@ -1,8 +1,14 @@
-import json
 import os
+import queue
 import re
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 
+from crawl_store import CrawlCheckpoint, append_records
+from lxml import etree
+from pmc_crawler import REQUEST_DELAY, efetch_batch, esearch_history
+from requests import RequestException
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
@@ -13,7 +19,15 @@ from webdriver_manager.chrome import ChromeDriverManager
 
 # --- Pastas de output ---
 OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data")
-JSON_PATH = os.path.join(OUTPUT_DIR, "dataset_pubmed_preventive.json")
+JSONL_PATH = os.path.join(OUTPUT_DIR, "dataset_pubmed_preventive.jsonl")
+CHECKPOINT_PATH = os.path.join(OUTPUT_DIR, "dataset_pubmed_preventive.checkpoint.jsonl")
+
+# --- Modo API (E-utilities) ---
+MAX_ARTIGOS_API = 200  # artigos por termo
+API_BATCH_SIZE = 100  # artigos por pedido efetch
+
+# --- Modo browser ---
+POOL_SIZE = 4  # sessões Chrome reutilizadas em paralelo
 
 # --- Termos de pesquisa focados em medicina preventiva ---
 TERMOS_MEDICINA_PREVENTIVA = [
@@ -53,107 +67,257 @@ def iniciar_driver():
     return driver
 
 
-# --- CRAWLER ---
-def extrair_dados_pubmed(driver, termo_pesquisa: str, num_paginas: int = 5) -> list[dict]:
-    dados_locais = []
+class DriverPool:
+    """Conjunto limitado de sessões WebDriver reutilizadas entre termos e artigos."""
+
+    def __init__(self, size: int = POOL_SIZE):
+        self._drivers = [iniciar_driver() for _ in range(size)]
+        self._livres = queue.Queue()
+        for driver in self._drivers:
+            self._livres.put(driver)
 
-    for pagina in range(1, num_paginas + 1):
+    @property
+    def size(self) -> int:
+        return len(self._drivers)
+
+    def run(self, func, *args):
+        """Executa func(driver, *args) com um driver livre, devolvendo-o no fim."""
+        driver = self._livres.get()
         try:
-            url = f"https://pubmed.ncbi.nlm.nih.gov/?term={termo_pesquisa}&page={pagina}"
-            print(f" >> A recolher '{termo_pesquisa}' | Pag {pagina}/{num_paginas}")
-            driver.get(url)
+            return func(driver, *args)
+        finally:
+            self._livres.put(driver)
 
+    def close(self):
+        for driver in self._drivers:
             try:
-                WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "a.docsum-title"))
-                )
+                driver.quit()
             except Exception:
-                print("    Sem mais resultados. A saltar termo.")
-                break
-
-            links = [
-                e.get_attribute("href")
-                for e in driver.find_elements(By.CSS_SELECTOR, "a.docsum-title")
-            ]
-
-            # Navegar em cada link encontrado
-            for link in links:
-                if link in [d["url"] for d in dados_locais]:
-                    continue  # Evitar duplicados locais
-
-                try:
-                    driver.get(link)
-                    # Espera apenas pelo título
-                    WebDriverWait(driver, 5).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, "h1.heading-title"))
-                    )
-
-                    # Extração
-                    titulo = driver.find_element(By.CSS_SELECTOR, "h1.heading-title").text.strip()
-                    try:
-                        abstract = driver.find_element(
-                            By.CSS_SELECTOR, "div.abstract-content"
-                        ).text.strip()
-                    except Exception:
-                        abstract = ""  # Se não tem abstract, não serve para RAG
-
-                    # Filtro de Qualidade: Só guarda se tiver Abstract
-                    if abstract and len(abstract) > 50:
-                        # Extrair PMID e Ano
-                        try:
-                            meta_str = driver.find_element(By.CSS_SELECTOR, "span.cit").text
-                            year_match = re.search(r"\d{4}", meta_str)
-                            year = year_match.group(0) if year_match else "2024"
-                        except Exception:
-                            year = "2024"
-
-                        pmid_match = re.search(r"/(\d+)/?$", link)
-                        pmid = pmid_match.group(1) if pmid_match else "N/A"
-
-                        dados_locais.append(
-                            {
-                                "pmid": pmid,
-                                "title": titulo,
-                                "abstract": abstract,
-                                "year": year,
-                                "search_term": termo_pesquisa,
-                                "url": link,
-                            }
-                        )
-                except Exception:
-                    pass
-
-        except Exception as e:
-            print(f"Erro na página {pagina}: {e}")
-
-    return dados_locais
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- CRAWLER (API) ---
+def _texto(el) -> str:
+    return " ".join("".join(el.itertext()).split()) if el is not None else ""
+
+
+def parse_pubmed_xml(xml_bytes: bytes, termo_pesquisa: str) -> list[dict]:
+    """Converte um lote efetch (PubmedArticleSet) em registos com abstract."""
+    parser = etree.XMLParser(recover=True, huge_tree=True)
+    root = etree.fromstring(xml_bytes, parser=parser)
+    dados = []
+
+    for artigo in root.iterfind("PubmedArticle"):
+        pmid = artigo.findtext("MedlineCitation/PMID")
+        titulo = _texto(artigo.find("MedlineCitation/Article/ArticleTitle"))
+
+        partes = []
+        for parte in artigo.iterfind("MedlineCitation/Article/Abstract/AbstractText"):
+            label = parte.get("Label")
+            partes.append(f"{label}: {_texto(parte)}" if label else _texto(parte))
+        abstract = "\n".join(partes)
+
+        pub_date = artigo.find("MedlineCitation/Article/Journal/JournalIssue/PubDate")
+        year_match = re.search(r"\d{4}", _texto(pub_date))
+
+        # Filtro de Qualidade: Só guarda se tiver Abstract
+        if pmid and abstract and len(abstract) > 50:
+            dados.append(
+                {
+                    "pmid": pmid,
+                    "title": titulo,
+                    "abstract": abstract,
+                    "year": year_match.group(0) if year_match else "2024",
+                    "search_term": termo_pesquisa,
+                    "url": f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/",
+                }
+            )
+
+    return dados
+
+
+def extrair_dados_pubmed_api(
+    termo_pesquisa: str,
+    max_artigos: int = MAX_ARTIGOS_API,
+    checkpoint: CrawlCheckpoint | None = None,
+    output_path: str = JSONL_PATH,
+) -> int:
+    """
+    Recolhe PMIDs e abstracts em lote via E-utilities (esearch + efetch XML),
+    sem browser. Grava cada lote em JSONL e retoma a partir do checkpoint.
+    """
+    checkpoint = checkpoint or CrawlCheckpoint(CHECKPOINT_PATH)
+    chave = f"api|{termo_pesquisa}"
+    gravados = 0
+
+    try:
+        count, webenv, query_key = esearch_history(termo_pesquisa, db="pubmed")
+    except (RequestException, KeyError, ValueError) as e:
+        # Falha da pesquisa: este termo fica para a próxima execução, os outros seguem
+        print(f" >> ESearch falhou para '{termo_pesquisa}': {e}")
+        return 0
+    total = min(count, max_artigos)
+    print(f" >> '{termo_pesquisa}': {count} resultados, a recolher {total}")
+
+    for retstart in range(checkpoint.offset(chave), total, API_BATCH_SIZE):
+        retmax = min(API_BATCH_SIZE, total - retstart)
+        xml = efetch_batch(webenv, query_key, retstart, retmax, db="pubmed")
+        time.sleep(REQUEST_DELAY)
+        if not xml:
+            # Sem avançar o checkpoint: a próxima execução volta a pedir este lote
+            print(f" >> Lote {retstart}-{retstart + retmax} falhou; a retomar na próxima execução.")
+            break
+
+        dados = [
+            d for d in parse_pubmed_xml(xml, termo_pesquisa) if not checkpoint.is_done(d["pmid"])
+        ]
+        gravados += append_records(output_path, dados)
+        checkpoint.mark(ids=[d["pmid"] for d in dados], key=chave, offset=retstart + retmax)
+
+    return gravados
+
+
+# --- CRAWLER (browser) ---
+def _recolher_links(driver, termo_pesquisa: str, pagina: int) -> list[str]:
+    url = f"https://pubmed.ncbi.nlm.nih.gov/?term={termo_pesquisa}&page={pagina}"
+    driver.get(url)
+
+    try:
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, "a.docsum-title"))
+        )
+    except Exception:
+        return []
+
+    return [
+        e.get_attribute("href") for e in driver.find_elements(By.CSS_SELECTOR, "a.docsum-title")
+    ]
+
+
+def _extrair_artigo(driver, link: str, pmid: str, termo_pesquisa: str) -> dict | None:
+    try:
+        driver.get(link)
+        # Espera apenas pelo título
+        WebDriverWait(driver, 5).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, "h1.heading-title"))
+        )
+
+        # Extração
+        titulo = driver.find_element(By.CSS_SELECTOR, "h1.heading-title").text.strip()
+        try:
+            abstract = driver.find_element(By.CSS_SELECTOR, "div.abstract-content").text.strip()
+        except Exception:
+            abstract = ""  # Se não tem abstract, não serve para RAG
+
+        # Filtro de Qualidade: Só guarda se tiver Abstract
+        if not abstract or len(abstract) <= 50:
+            return None
+
+        # Extrair Ano
+        try:
+            meta_str = driver.find_element(By.CSS_SELECTOR, "span.cit").text
+            year_match = re.search(r"\d{4}", meta_str)
+            year = year_match.group(0) if year_match else "2024"
+        except Exception:
+            year = "2024"
+
+        return {
+            "pmid": pmid,
+            "title": titulo,
+            "abstract": abstract,
+            "year": year,
+            "search_term": termo_pesquisa,
+            "url": link,
+        }
+    except Exception:
+        return None
+
+
+def extrair_dados_pubmed(
+    pool: DriverPool,
+    termo_pesquisa: str,
+    num_paginas: int = 5,
+    checkpoint: CrawlCheckpoint | None = None,
+    output_path: str = JSONL_PATH,
+) -> int:
+    """
+    Recolhe artigos de um termo com o browser, visitando os artigos de cada página
+    em paralelo pelas sessões do pool. Grava em JSONL no fim de cada página.
+    Com checkpoint, retoma na página seguinte à última concluída e ignora PMIDs já vistos.
+    Devolve o número de artigos gravados.
+    """
+    checkpoint = checkpoint or CrawlCheckpoint(CHECKPOINT_PATH)
+    gravados = 0
+
+    with ThreadPoolExecutor(max_workers=pool.size) as executor:
+        for pagina in range(checkpoint.offset(termo_pesquisa) + 1, num_paginas + 1):
+            try:
+                print(f" >> A recolher '{termo_pesquisa}' | Pag {pagina}/{num_paginas}")
+                links = pool.run(_recolher_links, termo_pesquisa, pagina)
+                if not links:
+                    print("    Sem mais resultados. A saltar termo.")
+                    break
+
+                # Evitar duplicados (nesta ou numa execução anterior) com lookup O(1)
+                pendentes = {}
+                sem_pmid = 0
+                for link in links:
+                    pmid_match = re.search(r"/(\d+)/?(?:[?#].*)?$", link or "")
+                    if not pmid_match:
+                        # Sem PMID não há chave única para o checkpoint: não é recolhido
+                        sem_pmid += 1
+                        continue
+                    pmid = pmid_match.group(1)
+                    if pmid not in pendentes and not checkpoint.is_done(pmid):
+                        pendentes[pmid] = link
+                if sem_pmid:
+                    print(f"    {sem_pmid} links sem PMID ignorados.")
+
+                futuros = [
+                    executor.submit(pool.run, _extrair_artigo, link, pmid, termo_pesquisa)
+                    for pmid, link in pendentes.items()
+                ]
+                dados_locais = [r for r in (f.result() for f in futuros) if r]
+
+                gravados += append_records(output_path, dados_locais)
+                checkpoint.mark(
+                    ids=[d["pmid"] for d in dados_locais], key=termo_pesquisa, offset=pagina
+                )
+
+            except Exception as e:
+                print(f"Erro na página {pagina}: {e}")
+
+    return gravados
 
 
 # --- EXECUCAO ---
+# Uso: python pubmed_crawler.py [api|browser]  (por omissão: api)
 if __name__ == "__main__":
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-    todos_resultados = []
-
-    for termo in TERMOS_MEDICINA_PREVENTIVA:
-        print(f"\n=== A pesquisar: '{termo}' ===")
-        resultados = extrair_dados_pubmed(iniciar_driver(), termo)
-        todos_resultados.extend(resultados)
-        print(f"Total parcial: {len(todos_resultados)} artigos recolhidos.")
-        time.sleep(3)
+    modo = sys.argv[1] if len(sys.argv) > 1 else "api"
+    checkpoint = CrawlCheckpoint(CHECKPOINT_PATH)
+    total = 0
 
-    if todos_resultados:
-        # Remove duplicados por pmid
-        vistos = set()
-        unicos = []
-        for r in todos_resultados:
-            if r["pmid"] not in vistos:
-                vistos.add(r["pmid"])
-                unicos.append(r)
-
-        with open(JSON_PATH, "w", encoding="utf-8") as f:
-            json.dump(unicos, f, ensure_ascii=False, indent=2)
+    if modo == "browser":
+        with DriverPool() as pool:
+            for termo in TERMOS_MEDICINA_PREVENTIVA:
+                print(f"\n=== A pesquisar: '{termo}' ===")
+                total += extrair_dados_pubmed(pool, termo, checkpoint=checkpoint)
+                print(f"Total parcial: {total} artigos recolhidos.")
+    else:
+        for termo in TERMOS_MEDICINA_PREVENTIVA:
+            print(f"\n=== A pesquisar: '{termo}' ===")
+            total += extrair_dados_pubmed_api(termo, checkpoint=checkpoint)
+            print(f"Total parcial: {total} artigos recolhidos.")
 
-        print(f"\nSucesso! {len(unicos)} artigos guardados em '{JSON_PATH}'.")
+    if total:
+        print(f"\nSucesso! {total} artigos guardados em '{JSONL_PATH}'.")
     else:
-        print("Nenhum dado recolhido.")
+        print("Nenhum dado novo recolhido.")
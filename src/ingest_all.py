@@ -0,0 +1,307 @@
+"""
+Orquestrador da ingestão: declara todos os jobs (loaders SQL de utils/, GHO e
+MedlinePlus para o MongoDB, ingestões ChromaDB) e as dependências entre eles, e
+corre em paralelo, num pool de processos, os jobs cujas dependências já terminaram.
+Cada job corre num processo novo; no fim é reportada a duração, as linhas ou
+documentos por segundo e o pico de memória de cada um. O estado fica em
+INGEST_STATE_PATH e '--resume' corre apenas os jobs que falharam ou ficaram por correr.
+
+Uso (a partir de src/):
+    python ingest_all.py                      # reconstrução completa, todos os cores
+    python ingest_all.py --resume             # retoma a partir do último job falhado
+    python ingest_all.py --only wuenic medlineplus
+    python ingest_all.py --list
+"""
+
+import argparse
+import importlib
+import json
+import os
+import resource
+import runpy
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.getenv("INGEST_DATA_DIR", os.path.join(SRC_DIR, "..", "data"))
+INGEST_STATE_PATH = os.getenv(
+    "INGEST_STATE_PATH", os.path.join(SRC_DIR, "..", "data", "ingest_state.json")
+)
+
+
+@dataclass(frozen=True)
+class Job:
+    name: str
+    cwd: str  # diretório (relativo a src/) onde o script espera correr
+    module: str
+    func: str | None = None  # None: corre o módulo como script (__main__)
+    args: tuple = ()  # ficheiros relativos ao diretório de dados
+    deps: tuple = ()
+    count_keys: tuple = ("rows_read",)  # chaves do resultado somadas como "linhas"
+
+
+JOBS = [
+    Job("symptoms", "utils", "ingest_symptoms", "ingest_data", args=(".",)),
+    Job(
+        "global_health",
+        "utils",
+        "ingest_global_health",
+        "ingest_global_stats",
+        args=("Global Health Statistics.csv",),
+    ),
+    Job("brfss", "utils", "ingest_BRFSS", "ingest_brfss", args=("BRFSS2023.csv",)),
+    Job("cdi", "utils", "ingest_CDI", "ingest_cdi", args=("U.S._Chronic_Disease_Indicators.csv",)),
+    Job("drugs", "utils", "ingest_drugs", "ingest_drugs", args=("drugs_side_effects.csv",)),
+    Job("wuenic", "utils", "ingest_wuenic", "ingest_wuenic", args=("wuenic-input.xlsx",)),
+    Job(
+        "gho",
+        ".",
+        "api_ingestion",
+        "ingest_to_mongo",
+        count_keys=("indicators", "dimensions", "dimension_values"),
+    ),
+    # Busca no MedlinePlus as doenças carregadas pelo job 'symptoms'
+    Job(
+        "medlineplus",
+        ".",
+        "medlineplus_ingestion",
+        "ingest_medlineplus",
+        deps=("symptoms",),
+        count_keys=("ingested", "skipped"),
+    ),
+    # Snapshots Parquet das tabelas de factos para o backend DuckDB do sql_query
+    Job(
+        "analytics",
+        ".",
+        "sql.duckdb_backend",
+        "export_snapshots",
+        deps=("global_health", "brfss", "cdi", "wuenic"),
+        count_keys=("rows",),
+    ),
+    Job("chroma_pmc", "crawlers", "chromadb_ingest", count_keys=("n_stored",)),
+    Job(
+        "chroma_home_remedies",
+        "crawlers",
+        "home_remedies_ingest",
+        "ingest_home_remedies",
+        count_keys=("chunks",),
+    ),
+]
+
+
+def validate(jobs):
+    """Falha se houver dependências desconhecidas ou ciclos."""
+    by_name = {job.name: job for job in jobs}
+    for job in jobs:
+        unknown = set(job.deps) - set(by_name)
+        if unknown:
+            raise ValueError(f"{job.name}: dependências desconhecidas {sorted(unknown)}")
+
+    visiting, visited = set(), set()
+
+    def visit(name, path):
+        if name in visiting:
+            raise ValueError(f"Ciclo de dependências: {' -> '.join(path + [name])}")
+        if name in visited:
+            return
+        visiting.add(name)
+        for dep in by_name[name].deps:
+            visit(dep, path + [name])
+        visiting.discard(name)
+        visited.add(name)
+
+    for job in jobs:
+        visit(job.name, [])
+
+
+def select_jobs(jobs, only=None):
+    """Jobs pedidos em --only mais as dependências (transitivas) de cada um."""
+    if not only:
+        return list(jobs)
+    by_name = {job.name: job for job in jobs}
+    unknown = set(only) - set(by_name)
+    if unknown:
+        raise ValueError(f"Jobs desconhecidos: {', '.join(sorted(unknown))}")
+    wanted = set()
+    stack = list(only)
+    while stack:
+        name = stack.pop()
+        if name not in wanted:
+            wanted.add(name)
+            stack.extend(by_name[name].deps)
+    return [job for job in jobs if job.name in wanted]
+
+
+def ready_jobs(jobs, done, started):
+    """Jobs ainda não lançados cujas dependências terminaram todas com sucesso."""
+    return [job for job in jobs if job.name not in started and all(dep in done for dep in job.deps)]
+
+
+def blocked_jobs(jobs, failed):
+    """Nomes dos jobs que dependem (direta ou indiretamente) de um job falhado."""
+    blocked = set()
+    changed = True
+    while changed:
+        changed = False
+        for job in jobs:
+            if job.name not in blocked and set(job.deps) & (set(failed) | blocked):
+                blocked.add(job.name)
+                changed = True
+    return blocked
+
+
+def _peak_memory_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KiB no Linux e em bytes no macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_job(job: Job, data_dir: str) -> dict:
+    """Executado no processo filho: corre o job e devolve as suas métricas."""
+    workdir = os.path.normpath(os.path.join(SRC_DIR, job.cwd))
+    os.chdir(workdir)
+    sys.path[:0] = [workdir, SRC_DIR]
+    args = [os.path.join(data_dir, arg) for arg in job.args]
+
+    start = time.perf_counter()
+    try:
+        if job.func is None:
+            sys.argv = [f"{job.module}.py", *args]
+            result = runpy.run_path(f"{job.module}.py", run_name="__main__")
+        else:
+            module = importlib.import_module(job.module)
+            result = getattr(module, job.func)(*args)
+    except SystemExit as e:
+        # Os scripts terminam com sys.exit(1) quando a ligação à BD falha
+        raise RuntimeError(f"o job terminou com sys.exit({e.code})") from None
+    elapsed = time.perf_counter() - start
+
+    # Os loaders apanham as próprias exceções e não devolvem estatísticas se falharem
+    if not isinstance(result, dict):
+        raise RuntimeError("o job não devolveu estatísticas (ver erros acima)")
+    count = sum(int(result.get(key) or 0) for key in job.count_keys)
+    return {
+        "seconds": round(elapsed, 2),
+        "rows": count,
+        "rows_per_second": round(count / elapsed) if elapsed else count,
+        "peak_memory_mb": round(_peak_memory_mb(), 1),
+    }
+
+
+def load_state(path=INGEST_STATE_PATH) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state: dict, path=INGEST_STATE_PATH):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def run(jobs, data_dir=DATA_DIR, workers=None, resume=False, state_path=INGEST_STATE_PATH):
+    """Corre o DAG e devolve o estado final de cada job."""
+    validate(jobs)
+    state = load_state(state_path)
+    if resume:
+        done = {job.name for job in jobs if state.get(job.name, {}).get("status") == "ok"}
+    else:
+        done = set()
+        for job in jobs:
+            state.pop(job.name, None)
+    if done:
+        print(f"A retomar: {len(done)} jobs já concluídos ({', '.join(sorted(done))})")
+
+    started = set(done)
+    failed = set()
+    running = {}
+    workers = min(workers or os.cpu_count() or 1, len(jobs)) or 1
+
+    # Um processo novo por job: isola os módulos com estado global e mede o pico de memória
+    with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=1) as pool:
+        while True:
+            for job in ready_jobs(jobs, done, started):
+                print(f"[{job.name}] a iniciar")
+                started.add(job.name)
+                running[pool.submit(run_job, job, data_dir)] = job
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                job = running.pop(future)
+                try:
+                    metrics = future.result()
+                except Exception as e:
+                    failed.add(job.name)
+                    state[job.name] = {"status": "failed", "error": str(e)}
+                    print(f"[{job.name}] falhou: {e}")
+                else:
+                    done.add(job.name)
+                    state[job.name] = {"status": "ok", **metrics}
+                    print(f"[{job.name}] concluído em {metrics['seconds']:.1f}s")
+                save_state(state, state_path)
+
+            # Dependentes de um job falhado nunca ficam prontos
+            for name in blocked_jobs(jobs, failed) - started:
+                started.add(name)
+                state[name] = {"status": "blocked"}
+            save_state(state, state_path)
+
+    return state
+
+
+def print_report(jobs, state, wall_seconds):
+    print(
+        f"\n{'job':<22} {'estado':<8} {'tempo (s)':>10} {'linhas':>10} "
+        f"{'linhas/s':>10} {'pico MB':>9}"
+    )
+    for job in jobs:
+        entry = state.get(job.name, {})
+        print(
+            f"{job.name:<22} {entry.get('status', '-'):<8} {entry.get('seconds', '-'):>10} "
+            f"{entry.get('rows', '-'):>10} {entry.get('rows_per_second', '-'):>10} "
+            f"{entry.get('peak_memory_mb', '-'):>9}"
+        )
+    serial = sum(state.get(job.name, {}).get("seconds", 0) for job in jobs)
+    print(f"\nTempo total: {wall_seconds:.1f}s (soma dos jobs: {serial:.1f}s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Orquestrador da ingestão")
+    parser.add_argument("--only", nargs="+", metavar="JOB", help="jobs a correr (+ dependências)")
+    parser.add_argument("--resume", action="store_true", help="salta os jobs já concluídos")
+    parser.add_argument("--workers", type=int, default=None, help="processos (omissão: cores)")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--list", action="store_true", help="lista os jobs e dependências")
+    args = parser.parse_args(argv)
+
+    jobs = select_jobs(JOBS, args.only)
+    if args.list:
+        for job in jobs:
+            deps = f" (depende de: {', '.join(job.deps)})" if job.deps else ""
+            print(f"{job.name}{deps}")
+        return 0
+
+    start = time.perf_counter()
+    state = run(
+        jobs, data_dir=os.path.abspath(args.data_dir), workers=args.workers, resume=args.resume
+    )
+    print_report(jobs, state, time.perf_counter() - start)
+
+    pending = [job.name for job in jobs if state.get(job.name, {}).get("status") != "ok"]
+    if pending:
+        print(f"Jobs por concluir: {', '.join(pending)} (correr de novo com --resume)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
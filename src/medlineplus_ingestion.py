@@ -14,6 +14,7 @@ from pymongo import MongoClient
 from pymongo.errors import OperationFailure, ServerSelectionTimeoutError
 
 from utils.db_connection import get_db_connection
+from utils.http_cache import http_get
 
 load_dotenv()
 
@@ -81,7 +82,7 @@ def fetch_medlineplus(disease_name: str) -> dict | None:
     """
     params = {"db": "healthTopics", "term": disease_name}
     try:
-        resp = requests.get(MEDLINE_BASE_URL, params=params, timeout=15)
+        resp = http_get(MEDLINE_BASE_URL, params=params, timeout=15)
         resp.raise_for_status()
     except requests.RequestException as e:
         print(f"  [WARN] Erro ao chamar API para '{disease_name}': {e}")
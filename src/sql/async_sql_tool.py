@@ -0,0 +1,210 @@
+"""
+Versão assíncrona do sql_query para a API (/chat).
+Usa um pool asyncpg limitado (SQL_POOL_MAX_SIZE ligações por worker) e as chamadas
+assíncronas do LLM, por isso um worker atende muitas perguntas SQL em simultâneo sem
+ocupar threads nem esgotar o max_connections do Postgres. A reflexão do schema, os
+templates e o grounding usam o engine SQLAlchemy do sql_query_tool, limitado a
+SQL_ENGINE_POOL_SIZE + SQL_ENGINE_MAX_OVERFLOW ligações: no total, cada worker abre no
+máximo SQL_POOL_MAX_SIZE + SQL_ENGINE_POOL_SIZE + SQL_ENGINE_MAX_OVERFLOW (12 por omissão).
+As queries correm com as mesmas proteções do sql_query: LIMIT, EXPLAIN, transação só de
+leitura e statement_timeout. Cancelar a task (cliente desligado) cancela a query no servidor.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+
+import asyncpg
+
+from sql.duckdb_backend import AnalyticsFallback, run_analytics, use_analytics
+from sql.guardrails import (
+    SQL_MAX_PLAN_COST,
+    SQL_STATEMENT_TIMEOUT_MS,
+    QueryRejected,
+    check_plan_cost,
+    ensure_limit,
+    timeout_rejection,
+)
+from sql.query_cache import referenced_tables, sql_hash
+from sql.sql_query_tool import (
+    PROMPT_NOT_FOUND_REPLY,
+    accept_generated_sql,
+    cache_result,
+    explanation_prompt,
+    get_database,
+    get_llm,
+    known_sql,
+    llm_text,
+    raw_result_reply,
+    render_result,
+    result_cache,
+    sql_prompt,
+)
+from sql.workload import WORKLOAD_COLUMNS, WORKLOAD_LOG, workload_row
+
+SQL_POOL_MIN_SIZE = int(os.getenv("SQL_POOL_MIN_SIZE", "1"))
+SQL_POOL_MAX_SIZE = int(os.getenv("SQL_POOL_MAX_SIZE", "10"))
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+
+async def get_pool() -> asyncpg.Pool:
+    """Pool partilhado do processo (criado na primeira utilização)."""
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await asyncpg.create_pool(
+                host=os.getenv("SQL_HOST", "localhost"),
+                port=int(os.getenv("SQL_PORT", "5432")),
+                database=os.getenv("SQL_DB"),
+                user=os.getenv("SQL_USER"),
+                password=os.getenv("SQL_PASSWORD"),
+                min_size=SQL_POOL_MIN_SIZE,
+                max_size=SQL_POOL_MAX_SIZE,
+                max_inactive_connection_lifetime=300,
+            )
+        return _pool
+
+
+async def close_pool():
+    global _pool
+    async with _pool_lock:
+        if _pool is not None:
+            await _pool.close()
+            _pool = None
+
+
+async def get_table_versions(pool) -> dict:
+    try:
+        rows = await pool.fetch("SELECT table_name, version FROM table_versions")
+        return {row["table_name"]: row["version"] for row in rows}
+    except (asyncpg.PostgresError, OSError) as e:
+        print(f"Aviso: não foi possível ler table_versions: {e}")
+        return {}
+
+
+async def log_query(pool, question, sql, status, duration_ms, row_count=None):
+    """Equivalente assíncrono de sql.workload.log_query."""
+    if not WORKLOAD_LOG:
+        return
+    row = workload_row(question, sql, status, duration_ms, row_count)
+    placeholders = ", ".join(f"${i}" for i in range(1, len(WORKLOAD_COLUMNS) + 1))
+    try:
+        await pool.execute(
+            f"INSERT INTO sql_workload ({', '.join(WORKLOAD_COLUMNS)}) VALUES ({placeholders})",
+            *(row[c] for c in WORKLOAD_COLUMNS),
+        )
+    except (asyncpg.PostgresError, OSError) as e:
+        print(f"Aviso: não foi possível registar a query em sql_workload: {e}")
+
+
+async def run_guarded(
+    pool,
+    sql: str,
+    max_cost: float = SQL_MAX_PLAN_COST,
+    timeout_ms: int = SQL_STATEMENT_TIMEOUT_MS,
+) -> tuple[str, list[str], list[tuple]]:
+    """Equivalente assíncrono de sql.guardrails.run_guarded."""
+    sql = ensure_limit(sql)
+
+    async with pool.acquire() as conn:
+        async with conn.transaction(readonly=True):
+            await conn.execute(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+            try:
+                plan = json.loads(await conn.fetchval(f"EXPLAIN (FORMAT JSON) {sql}"))
+                stmt = await conn.prepare(sql)
+            except asyncpg.PostgresError as e:
+                raise QueryRejected("invalid_query", f"A query SQL é inválida: {e}") from e
+
+            check_plan_cost(float(plan[0]["Plan"]["Total Cost"]), max_cost)
+
+            try:
+                records = await stmt.fetch()
+            except asyncpg.QueryCanceledError as e:
+                raise timeout_rejection(timeout_ms) from e
+            except asyncpg.PostgresError as e:
+                raise QueryRejected("query_failed", f"A query SQL falhou: {e}") from e
+
+            # Antes de devolver a ligação ao pool (o statement deixa de ser válido)
+            columns = [attr.name for attr in stmt.get_attributes()]
+
+    return sql, columns, [tuple(record) for record in records]
+
+
+async def execute_sql(pool, generated_sql: str, tables, table_versions: dict):
+    """Equivalente assíncrono de sql.sql_query_tool.execute_sql (DuckDB ou Postgres)."""
+    if use_analytics(generated_sql, tables, table_versions):
+        cancel_event = threading.Event()
+        try:
+            # O DuckDB é síncrono: corre numa thread e é interrompido se a task for cancelada
+            result = await asyncio.to_thread(run_analytics, generated_sql, cancel_event)
+            print("Backend: DuckDB (snapshots Parquet)")  # Debug
+            return result
+        except asyncio.CancelledError:
+            cancel_event.set()
+            raise
+        except AnalyticsFallback as e:
+            print(f"DuckDB não executou a query ({e}); a usar o Postgres")
+    return await run_guarded(pool, generated_sql)
+
+
+async def sql_query(user_question: str) -> str:
+    """
+    Equivalente assíncrono de sql.sql_query_tool.sql_query: os mesmos passos (caches,
+    templates, geração, renderização e explicação), com a execução no pool asyncpg e
+    as chamadas ao LLM assíncronas. Levanta QueryRejected nas mesmas situações.
+    """
+    pool = await get_pool()
+    table_versions = await get_table_versions(pool)
+    # A reflexão do schema e os embeddings são síncronos, mas só correm ao recarregar
+    db, _ = await asyncio.to_thread(get_database, table_versions)
+    llm = get_llm()
+
+    generated_sql = await asyncio.to_thread(known_sql, db, user_question, table_versions)
+
+    if generated_sql is None:
+        start = time.perf_counter()
+        prompt_sql = await asyncio.to_thread(sql_prompt, user_question)
+
+        if prompt_sql is None:
+            return PROMPT_NOT_FOUND_REPLY
+
+        raw_response = await llm.ainvoke(prompt_sql)
+        generated_sql = await asyncio.to_thread(
+            accept_generated_sql, db, user_question, raw_response, table_versions, start
+        )
+
+    tables = referenced_tables(generated_sql, db._metadata.tables.keys())
+    print(f"Generated SQL:\n{generated_sql}\n")  # Debug: mostrar SQL gerada
+    result = result_cache.get(sql_hash(generated_sql), table_versions)
+
+    if result is None:
+        start = time.perf_counter()
+        try:
+            executed_sql, columns, rows = await execute_sql(
+                pool, generated_sql, tables, table_versions
+            )
+        except (QueryRejected, asyncio.CancelledError) as e:
+            # Task cancelada = cliente desligado; o asyncpg já cancelou a query no servidor
+            status = e.code if isinstance(e, QueryRejected) else "cancelled"
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            await log_query(pool, user_question, ensure_limit(generated_sql), status, elapsed_ms)
+            raise
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        await log_query(pool, user_question, executed_sql, "ok", elapsed_ms, len(rows))
+        result = cache_result(generated_sql, executed_sql, columns, rows, tables, table_versions)
+
+    rendered = render_result(result)
+    if rendered is not None:
+        return rendered
+
+    explain_prompt = explanation_prompt(user_question, result)
+
+    if explain_prompt is None:
+        return raw_result_reply(result)
+
+    return llm_text(await llm.ainvoke(explain_prompt))
@@ -0,0 +1,160 @@
+"""
+Benchmark de queries representativas sobre brfss_responses e chronic_disease_indicators,
+para comparar o schema base com o layout de database/partitioned_layout.sql.
+
+Cada query corre com EXPLAIN (ANALYZE, BUFFERS): uma execução de aquecimento e a
+mediana de --repeat execuções (tempo de execução e blocos lidos). Os valores dos filtros
+(ano, estado, pergunta, ...) são os mais frequentes nos dados, por isso as mesmas queries
+correm antes e depois da migração.
+
+Uso (a partir de src/):
+    python -m sql.bench_layout run --out antes.json
+    (migrar com database/partitioned_layout.sql)
+    python -m sql.bench_layout run --out depois.json
+    python -m sql.bench_layout compare antes.json depois.json
+"""
+
+import argparse
+import json
+import statistics
+
+from utils.db_connection import get_db_connection
+
+QUERIES = {
+    "brfss_diabetes_by_state_year": """
+        SELECT state_code,
+               AVG(CASE WHEN diagnosed_diabetes = 1 THEN 1.0 ELSE 0 END) AS diabetes_rate
+        FROM brfss_responses
+        WHERE survey_year = {year}
+        GROUP BY state_code
+    """,
+    "brfss_health_one_state_year": """
+        SELECT general_health, COUNT(*)
+        FROM brfss_responses
+        WHERE survey_year = {year} AND state_code = {state}
+        GROUP BY general_health
+    """,
+    "brfss_bmi_one_state": """
+        SELECT AVG(bmi) FROM brfss_responses WHERE state_code = {state}
+    """,
+    "cdi_question_location": """
+        SELECT year_start, stratification_1, data_value
+        FROM chronic_disease_indicators
+        WHERE question_id = {question} AND location_abbr = {location}
+        ORDER BY year_start
+    """,
+    "cdi_topic_year_by_location": """
+        SELECT location_abbr, AVG(data_value)
+        FROM chronic_disease_indicators
+        WHERE topic_id = {topic} AND year_start = {cdi_year}
+        GROUP BY location_abbr
+    """,
+    "cdi_year_range": """
+        SELECT COUNT(*), AVG(data_value)
+        FROM chronic_disease_indicators
+        WHERE year_start BETWEEN {cdi_year} - 1 AND {cdi_year}
+    """,
+}
+
+# Valor mais frequente de cada parâmetro (literal SQL já formatado)
+_PARAMETERS = {
+    "year": "SELECT survey_year FROM brfss_responses GROUP BY 1 ORDER BY count(*) DESC LIMIT 1",
+    "state": "SELECT state_code FROM brfss_responses GROUP BY 1 ORDER BY count(*) DESC LIMIT 1",
+    "question": "SELECT quote_literal(question_id) FROM chronic_disease_indicators "
+    "GROUP BY question_id ORDER BY count(*) DESC LIMIT 1",
+    "location": "SELECT quote_literal(location_abbr) FROM chronic_disease_indicators "
+    "GROUP BY location_abbr ORDER BY count(*) DESC LIMIT 1",
+    "topic": "SELECT quote_literal(topic_id) FROM chronic_disease_indicators "
+    "GROUP BY topic_id ORDER BY count(*) DESC LIMIT 1",
+    "cdi_year": "SELECT year_start FROM chronic_disease_indicators "
+    "GROUP BY 1 ORDER BY count(*) DESC LIMIT 1",
+}
+
+
+def representative_values(cur) -> dict:
+    values = {}
+    for name, sql in _PARAMETERS.items():
+        cur.execute(sql)
+        row = cur.fetchone()
+        values[name] = "NULL" if row is None or row[0] is None else row[0]
+    return values
+
+
+def _buffers(plan: dict) -> int:
+    return plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0)
+
+
+def measure(cur, sql: str, repeat: int) -> dict:
+    times, blocks = [], []
+    for i in range(repeat + 1):
+        cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")
+        result = cur.fetchone()[0]
+        result = json.loads(result) if isinstance(result, str) else result
+        if i == 0:
+            plan = result[0]["Plan"]  # aquecimento: só guarda o plano
+            continue
+        times.append(result[0]["Execution Time"])
+        blocks.append(_buffers(result[0]["Plan"]))
+    return {
+        "ms": round(statistics.median(times), 2),
+        "blocks": int(statistics.median(blocks)),
+        "plan": plan["Node Type"],
+    }
+
+
+def run(repeat: int) -> dict:
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        values = representative_values(cur)
+        print(f"Parâmetros: {values}")
+        results = {}
+        for name, sql in QUERIES.items():
+            results[name] = measure(cur, sql.format(**values), repeat)
+            r = results[name]
+            print(f"{name:<32} {r['ms']:>10.2f} ms {r['blocks']:>10} blocos  {r['plan']}")
+        return {"parameters": values, "results": results}
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def compare(before: dict, after: dict):
+    print(f"{'query':<32} {'antes (ms)':>11} {'depois (ms)':>12} {'speedup':>8} {'blocos':>17}")
+    for name, b in before["results"].items():
+        a = after["results"].get(name)
+        if a is None:
+            continue
+        speedup = b["ms"] / a["ms"] if a["ms"] else float("inf")
+        print(
+            f"{name:<32} {b['ms']:>11.2f} {a['ms']:>12.2f} {speedup:>7.1f}x "
+            f"{b['blocks']:>8}->{a['blocks']:<8}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do layout BRFSS/CDI.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run", help="corre as queries e guarda os tempos")
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--out", help="ficheiro JSON com os resultados")
+    compare_parser = sub.add_parser("compare", help="compara dois ficheiros de resultados")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run(args.repeat)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+    else:
+        with open(args.before, encoding="utf-8") as f:
+            before = json.load(f)
+        with open(args.after, encoding="utf-8") as f:
+            after = json.load(f)
+        compare(before, after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+Backend analítico do sql_query: snapshots Parquet das tabelas de factos, exportados
+depois da ingestão, consultados em DuckDB embebido (colunar, vetorizado, em todos os
+cores, sem servidor extra). As perguntas de agregação (GROUP BY, COUNT, AVG, ...) sobre
+tabelas com snapshot atualizado correm aqui; tudo o resto, ou o que o DuckDB não
+conseguir executar, segue para o Postgres.
+
+Cada snapshot guarda no manifest a versão da tabela em table_versions no momento da
+exportação; uma ingestão posterior incrementa a versão e a tabela volta a ser servida
+pelo Postgres até ao próximo 'export'. O DuckDB só tem acesso de leitura à pasta
+dos snapshots.
+
+Uso (a partir de src/; também corre como job 'analytics' do ingest_all.py):
+    python -m sql.duckdb_backend export            # só as tabelas alteradas
+    python -m sql.duckdb_backend export --force
+    python -m sql.duckdb_backend status
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from sql.guardrails import SQL_STATEMENT_TIMEOUT_MS, QueryRejected, ensure_limit
+
+try:
+    import duckdb
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # backend desativado: tudo corre no Postgres
+    duckdb = pa = pq = None
+
+SQL_ANALYTICS = os.getenv("SQL_ANALYTICS", "1") == "1"
+SQL_ANALYTICS_DIR = os.path.abspath(
+    os.getenv(
+        "SQL_ANALYTICS_DIR",
+        os.path.join(os.path.dirname(__file__), "..", "..", "data", "analytics"),
+    )
+)
+# 0 = um thread por core (omissão do DuckDB)
+SQL_ANALYTICS_THREADS = int(os.getenv("SQL_ANALYTICS_THREADS", "0"))
+
+# Tabelas de factos (e dimensões usadas nos seus JOINs) com snapshot
+ANALYTICS_TABLES = [
+    "brfss_responses",
+    "chronic_disease_indicators",
+    "global_health_stats",
+    "immunization_fact",
+    "country_dim",
+    "vaccine_dim",
+]
+# Hashes da carga incremental (utils/copy_loader.upsert_csv), inúteis nas análises
+_SKIP_COLUMNS = {"row_key", "row_hash"}
+EXPORT_BATCH_ROWS = 100_000
+
+_AGGREGATE_RE = re.compile(
+    r"\bGROUP\s+BY\b|\b(?:COUNT|SUM|AVG|MIN|MAX|STDDEV\w*|VARIANCE|PERCENTILE_\w+)\s*\(",
+    re.IGNORECASE,
+)
+
+
+class AnalyticsFallback(Exception):
+    """O DuckDB não conseguiu executar a query; o chamador usa o Postgres."""
+
+
+def enabled() -> bool:
+    return SQL_ANALYTICS and duckdb is not None
+
+
+def _manifest_path() -> str:
+    return os.path.join(SQL_ANALYTICS_DIR, "manifest.json")
+
+
+def load_manifest() -> dict:
+    try:
+        with open(_manifest_path(), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(manifest: dict):
+    tmp = _manifest_path() + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, _manifest_path())
+
+
+# --- Exportação (depois da ingestão) ---
+
+
+def _arrow_type(data_type: str):
+    if data_type in ("smallint", "integer", "bigint"):
+        return pa.int64()
+    if data_type in ("numeric", "real", "double precision"):
+        return pa.float64()
+    if data_type == "boolean":
+        return pa.bool_()
+    if data_type == "date":
+        return pa.date32()
+    if data_type.startswith("timestamp"):
+        return pa.timestamp("us", tz="UTC" if "with time zone" in data_type else None)
+    return pa.string()
+
+
+def _table_schema(cur, table: str):
+    cur.execute(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = %s ORDER BY ordinal_position",
+        (table,),
+    )
+    return pa.schema(
+        [(name, _arrow_type(kind)) for name, kind in cur.fetchall() if name not in _SKIP_COLUMNS]
+    )
+
+
+def _export_table(conn, table: str, schema) -> int:
+    """Escreve a tabela em <tabela>.parquet, em row groups, e devolve o nº de linhas."""
+    path = os.path.join(SQL_ANALYTICS_DIR, f"{table}.parquet")
+    tmp = path + ".tmp"
+    rows = 0
+    # Cursor do lado do servidor: a memória fica limitada a um lote
+    with conn.cursor(name=f"export_{table}") as cur:
+        cur.itersize = EXPORT_BATCH_ROWS
+        cur.execute(f"SELECT {', '.join(schema.names)} FROM {table}")
+        with pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+            while batch := cur.fetchmany(EXPORT_BATCH_ROWS):
+                columns = list(zip(*batch))
+                writer.write_table(
+                    pa.table(
+                        [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                        schema=schema,
+                    )
+                )
+                rows += len(batch)
+    os.replace(tmp, path)
+    return rows
+
+
+def export_snapshots(tables=None, force: bool = False) -> dict:
+    """
+    Exporta para SQL_ANALYTICS_DIR as tabelas cuja versão mudou desde o último
+    snapshot (ou todas, com force). Tudo é lido no mesmo snapshot transacional, por
+    isso a versão guardada corresponde exatamente aos dados exportados.
+    """
+    import psycopg2.extensions
+
+    from utils.db_connection import get_db_connection
+
+    if pq is None:
+        raise RuntimeError("pyarrow não está instalado")
+    os.makedirs(SQL_ANALYTICS_DIR, exist_ok=True)
+    manifest = load_manifest()
+    start = time.perf_counter()
+
+    conn = get_db_connection()
+    conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+    # NUMERIC chega como float e não como Decimal (o snapshot guarda DOUBLE)
+    numeric_as_float = psycopg2.extensions.new_type(
+        psycopg2.extensions.DECIMAL.values,
+        "NUMERIC_AS_FLOAT",
+        lambda value, cur: float(value) if value is not None else None,
+    )
+    psycopg2.extensions.register_type(numeric_as_float, conn)
+    exported, total_rows = [], 0
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT table_name, version FROM table_versions")
+        versions = dict(cur.fetchall())
+        for table in tables or ANALYTICS_TABLES:
+            version = versions.get(table, 0)
+            entry = manifest.get(table, {})
+            path = os.path.join(SQL_ANALYTICS_DIR, f"{table}.parquet")
+            if not force and entry.get("version") == version and os.path.exists(path):
+                continue
+            schema = _table_schema(cur, table)
+            if not schema.names:
+                print(f"Aviso: a tabela {table} não existe; sem snapshot.")
+                continue
+            table_start = time.perf_counter()
+            rows = _export_table(conn, table, schema)
+            manifest[table] = {
+                "version": version,
+                "rows": rows,
+                "exported_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            }
+            _save_manifest(manifest)
+            exported.append(table)
+            total_rows += rows
+            print(f"Snapshot {table}: {rows} linhas em {time.perf_counter() - table_start:.1f}s")
+    finally:
+        conn.rollback()
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Snapshots atualizados: {', '.join(exported) or 'nenhum'} ({elapsed:.1f}s)")
+    return {"tables": len(exported), "rows": total_rows, "seconds": round(elapsed, 2)}
+
+
+# --- Consulta (sql_query) ---
+
+_lock = threading.Lock()
+_state = {"con": None, "manifest_mtime": None, "manifest": {}}
+
+
+def _connect():
+    con = duckdb.connect(":memory:")
+    if SQL_ANALYTICS_THREADS:
+        con.execute(f"SET threads = {SQL_ANALYTICS_THREADS}")
+    # SQL gerada pelo LLM: só leitura dos snapshots, nada de read_csv('/etc/...') ou COPY
+    con.execute(f"SET allowed_directories = ['{SQL_ANALYTICS_DIR}{os.sep}']")
+    con.execute("SET enable_external_access = false")
+    # Como no Postgres, inteiro / inteiro trunca (senão COUNT(*) / 2 dava 1.5 aqui e 1 lá);
+    # GLOBAL porque cada query corre num cursor (sessão) próprio
+    con.execute("SET GLOBAL integer_division = true")
+    con.execute("SET lock_configuration = true")
+    return con
+
+
+def _current_manifest():
+    """Ligação DuckDB e manifest; as vistas são recriadas quando o manifest muda."""
+    try:
+        mtime = os.path.getmtime(_manifest_path())
+    except OSError:
+        mtime = None
+    with _lock:
+        if _state["con"] is None:
+            _state["con"] = _connect()
+        if mtime != _state["manifest_mtime"]:
+            manifest = load_manifest()
+            for table in list(manifest):
+                path = os.path.join(SQL_ANALYTICS_DIR, f"{table}.parquet")
+                try:
+                    _state["con"].execute(
+                        f"CREATE OR REPLACE VIEW {table} AS SELECT * FROM read_parquet('{path}')"
+                    )
+                except duckdb.Error as e:
+                    print(f"Aviso: snapshot de {table} ignorado: {e}")
+                    del manifest[table]
+            _state.update(manifest_mtime=mtime, manifest=manifest)
+        return _state["con"], _state["manifest"]
+
+
+def close():
+    with _lock:
+        if _state["con"] is not None:
+            _state["con"].close()
+        _state.update(con=None, manifest_mtime=None, manifest={})
+
+
+def is_aggregate(sql: str) -> bool:
+    return bool(_AGGREGATE_RE.search(sql))
+
+
+def fresh_tables(table_versions: dict) -> set[str]:
+    """Tabelas cujo snapshot corresponde à versão atual em table_versions."""
+    if not enabled():
+        return set()
+    _, manifest = _current_manifest()
+    return {
+        table
+        for table, entry in manifest.items()
+        if entry.get("version") == table_versions.get(table, 0)
+    }
+
+
+def use_analytics(sql: str, tables, table_versions: dict) -> bool:
+    """Agregação em que todas as tabelas referidas têm snapshot atualizado."""
+    if not enabled() or not tables or not is_aggregate(sql):
+        return False
+    return set(tables) <= fresh_tables(table_versions)
+
+
+def run_analytics(
+    sql: str,
+    cancel_event: threading.Event | None = None,
+    timeout_ms: int = SQL_STATEMENT_TIMEOUT_MS,
+) -> tuple[str, list[str], list[tuple]]:
+    """
+    Executa 'sql' nos snapshots com LIMIT e o mesmo tempo limite do Postgres.
+    QueryRejected em timeout/cancelamento; AnalyticsFallback nos outros erros.
+    """
+    sql = ensure_limit(sql)
+    con, _ = _current_manifest()
+    cur = con.cursor()
+    deadline = time.monotonic() + timeout_ms / 1000
+    stop_watch = threading.Event()
+
+    def _watch():
+        while not stop_watch.wait(0.05):
+            if time.monotonic() > deadline or (cancel_event is not None and cancel_event.is_set()):
+                cur.interrupt()
+                return
+
+    threading.Thread(target=_watch, daemon=True).start()
+    try:
+        result = cur.execute(sql)
+        columns = [d[0] for d in result.description]
+        return sql, columns, result.fetchall()
+    except duckdb.InterruptException as e:
+        if cancel_event is not None and cancel_event.is_set():
+            raise QueryRejected("cancelled", "Pedido cancelado pelo cliente.") from e
+        raise QueryRejected(
+            "timeout",
+            f"A query excedeu o tempo limite de {timeout_ms / 1000:.0f}s.",
+            timeout_ms=timeout_ms,
+        ) from e
+    except duckdb.Error as e:
+        # Dialeto ou função sem equivalente no DuckDB
+        raise AnalyticsFallback(str(e)) from e
+    finally:
+        stop_watch.set()
+        cur.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshots Parquet para o backend DuckDB.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_parser = sub.add_parser("export", help="exporta as tabelas alteradas")
+    export_parser.add_argument("--tables", nargs="+", choices=ANALYTICS_TABLES)
+    export_parser.add_argument("--force", action="store_true", help="exporta todas")
+    sub.add_parser("status", help="mostra os snapshots existentes")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_snapshots(args.tables, args.force)
+    else:
+        for table, entry in sorted(load_manifest().items()):
+            print(
+                f"{table:<28} versão {entry['version']:<5} {entry['rows']:>10} linhas  "
+                f"{entry['exported_at']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Camada de execução protegida para SQL gerada pelo LLM.
+Antes de executar: garante um LIMIT e corre EXPLAIN, rejeitando planos acima de um
+custo máximo. Durante a execução: transação só de leitura com statement_timeout e
+cancelamento do lado do servidor se o cliente HTTP se desligar.
+As rejeições são QueryRejected, com um código e mensagem que o chamador pode mostrar.
+"""
+
+import os
+import re
+import threading
+
+import psycopg2
+from psycopg2 import errors as pg_errors
+
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "200"))
+SQL_MAX_PLAN_COST = float(os.getenv("SQL_MAX_PLAN_COST", "5000000"))
+SQL_STATEMENT_TIMEOUT_MS = int(os.getenv("SQL_STATEMENT_TIMEOUT_MS", "15000"))
+
+_LIMIT_RE = re.compile(r"\bLIMIT\s+(\d+|ALL)(\s+OFFSET\s+\d+(?:\s+ROWS?)?)?\s*$", re.IGNORECASE)
+# Forma SQL standard: [OFFSET n ROWS] FETCH FIRST|NEXT [n] ROW|ROWS ONLY|WITH TIES
+_FETCH_RE = re.compile(
+    r"\bFETCH\s+(?:FIRST|NEXT)\s+(?:(\d+)\s+)?ROWS?\s+(?:ONLY|WITH\s+TIES)\s*$", re.IGNORECASE
+)
+_OFFSET_RE = re.compile(r"\bOFFSET\s+\d+(?:\s+ROWS?)?\s*$", re.IGNORECASE)
+
+
+class QueryRejected(Exception):
+    """Query recusada ou interrompida pela camada de execução."""
+
+    def __init__(self, code: str, message: str, **detail):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.detail = detail
+
+    def to_dict(self) -> dict:
+        return {"code": self.code, "message": self.message, **self.detail}
+
+
+def ensure_limit(sql: str, max_rows: int = SQL_MAX_ROWS) -> str:
+    """
+    Acrescenta LIMIT se faltar no fim da query, ou reduz um LIMIT acima de max_rows
+    (LIMIT ALL, que equivale a não ter limite, também é substituído). Um FETCH FIRST
+    final é reduzido da mesma forma e um OFFSET sem LIMIT passa a LIMIT ... OFFSET.
+    """
+    sql = sql.strip().rstrip(";").strip()
+
+    match = _LIMIT_RE.search(sql)
+    if match is not None:
+        limit = match.group(1)
+        if limit.upper() == "ALL" or int(limit) > max_rows:
+            return f"{sql[: match.start()]}LIMIT {max_rows}{match.group(2) or ''}"
+        return sql
+
+    # Depois de FETCH não pode vir um LIMIT: reduz-se o número de linhas do próprio FETCH
+    match = _FETCH_RE.search(sql)
+    if match is not None:
+        if match.group(1) is not None and int(match.group(1)) > max_rows:
+            return f"{sql[: match.start(1)]}{max_rows}{sql[match.end(1) :]}"
+        return sql
+
+    match = _OFFSET_RE.search(sql)
+    if match is not None:
+        return f"{sql[: match.start()]}LIMIT {max_rows} {match.group(0)}"
+
+    return f"{sql} LIMIT {max_rows}"
+
+
+def check_plan_cost(cost: float, max_cost: float = SQL_MAX_PLAN_COST):
+    """QueryRejected se o custo estimado pelo EXPLAIN passar de max_cost."""
+    if cost > max_cost:
+        raise QueryRejected(
+            "cost_too_high",
+            "A query gerada é demasiado pesada para ser executada. "
+            "Tente uma pergunta mais específica (ex.: um país, ano ou doença).",
+            cost=cost,
+            max_cost=max_cost,
+        )
+
+
+def timeout_rejection(timeout_ms: int) -> QueryRejected:
+    return QueryRejected(
+        "timeout",
+        f"A query excedeu o tempo limite de {timeout_ms / 1000:.0f}s.",
+        timeout_ms=timeout_ms,
+    )
+
+
+def plan_cost(cursor, sql: str) -> float:
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+    plan = cursor.fetchone()[0]
+    return float(plan[0]["Plan"]["Total Cost"])
+
+
+def run_guarded(
+    engine,
+    sql: str,
+    cancel_event: threading.Event | None = None,
+    max_cost: float = SQL_MAX_PLAN_COST,
+    timeout_ms: int = SQL_STATEMENT_TIMEOUT_MS,
+) -> tuple[str, list[str], list[tuple]]:
+    """
+    Executa 'sql' com as proteções e devolve (sql executada, colunas, linhas).
+    Usa o cursor DBAPI diretamente para que '%' e ':' na SQL gerada não sejam
+    interpretados como parâmetros.
+    """
+    sql = ensure_limit(sql)
+    conn = engine.raw_connection()
+    stop_watch = threading.Event()
+
+    def _watch():
+        # Cancela a query no servidor se o cliente se desligar a meio
+        while not stop_watch.wait(0.2):
+            if cancel_event.is_set():
+                conn.cancel()
+                return
+
+    try:
+        cur = conn.cursor()
+        cur.execute("SET TRANSACTION READ ONLY")
+        cur.execute("SET LOCAL statement_timeout = %s", (timeout_ms,))
+
+        try:
+            cost = plan_cost(cur, sql)
+        except psycopg2.Error as e:
+            raise QueryRejected("invalid_query", f"A query SQL é inválida: {e}") from e
+
+        check_plan_cost(cost, max_cost)
+
+        if cancel_event is not None:
+            threading.Thread(target=_watch, daemon=True).start()
+
+        try:
+            cur.execute(sql)
+        except pg_errors.QueryCanceled as e:
+            if cancel_event is not None and cancel_event.is_set():
+                raise QueryRejected("cancelled", "Pedido cancelado pelo cliente.") from e
+            raise timeout_rejection(timeout_ms) from e
+        except psycopg2.Error as e:
+            raise QueryRejected("query_failed", f"A query SQL falhou: {e}") from e
+
+        columns = [d[0] for d in cur.description]
+        rows = cur.fetchall()
+        return sql, columns, rows
+    finally:
+        stop_watch.set()
+        conn.rollback()
+        conn.close()
@@ -0,0 +1,248 @@
+"""
+Index advisor a partir do workload real do sql_query (tabela sql_workload).
+
+Reproduz as queries registadas com EXPLAIN, extrai as colunas usadas em filtros e
+JOINs e avalia índices candidatos: B-tree (igualdade/intervalos), BRIN (colunas de
+ano) e GIN pg_trgm (ILIKE/LIKE). O benefício de cada candidato é a redução do custo
+estimado do plano, ponderada pelo nº de execuções de cada query. Os índices são
+criados dentro de uma transação que é revertida (ou como índices hipotéticos, se a
+extensão hypopg existir), por isso a análise não deixa nada na base de dados.
+
+Uso (a partir de src/):
+    python -m sql.index_advisor report [--days 30]
+    python -m sql.index_advisor advise [--days 30] [--min-gain 0.05] [--apply]
+"""
+
+import argparse
+import re
+from collections import defaultdict
+
+import psycopg2
+
+from sql.guardrails import plan_cost
+from sql.query_cache import referenced_tables
+from sql.sql_query_tool import get_database
+from sql.workload import replayable_queries, slow_queries
+
+YEAR_COLUMNS = {"year", "year_start", "year_end"}
+
+# [qualificador.]coluna seguida de um operador de filtro
+_PREDICATE_RE = re.compile(
+    r"(?:\"?(\w+)\"?\.)?\"?(\w+)\"?\s*(=|<>|!=|<=|>=|<|>|\bNOT\s+I?LIKE\b|\bI?LIKE\b|\bBETWEEN\b|\bIN\b)",
+    re.IGNORECASE,
+)
+
+
+def index_name(table, column, kind):
+    return f"idx_{table}_{column}_{kind}"[:63]
+
+
+def _index_method(column, kind):
+    if kind == "trgm":
+        return f"USING gin ({column} gin_trgm_ops)"
+    if kind == "brin":
+        return f"USING brin ({column})"
+    return f"({column})"
+
+
+def index_ddl(table, column, kind, concurrently=False):
+    how = "CONCURRENTLY " if concurrently else ""
+    name = index_name(table, column, kind)
+    return f"CREATE INDEX {how}IF NOT EXISTS {name} ON {table} {_index_method(column, kind)}"
+
+
+def candidate_indexes(sql, columns):
+    """
+    Índices candidatos (tabela, coluna, tipo) para uma query. Colunas sem qualificador
+    são atribuídas a todas as tabelas referidas que as tenham; o EXPLAIN decide.
+    """
+    tables = referenced_tables(sql, columns.keys())
+    candidates = set()
+    for qualifier, column, op in _PREDICATE_RE.findall(sql):
+        column = column.lower()
+        owners = [t for t in tables if column in columns.get(t, ())]
+        if qualifier and qualifier.lower() in owners:
+            owners = [qualifier.lower()]
+        for table in owners:
+            if "LIKE" in op.upper():
+                candidates.add((table, column, "trgm"))
+            else:
+                candidates.add((table, column, "btree"))
+                if column in YEAR_COLUMNS:
+                    candidates.add((table, column, "brin"))
+    return candidates
+
+
+def existing_indexes(cur):
+    """(tabela, primeira coluna, tipo) dos índices que já existem."""
+    cur.execute("SELECT tablename, indexdef FROM pg_indexes WHERE schemaname = 'public'")
+    found = set()
+    for table, indexdef in cur.fetchall():
+        match = re.search(r"USING (\w+) \((\w+)( gin_trgm_ops)?", indexdef)
+        if match:
+            method, column, trgm = match.groups()
+            kind = "trgm" if trgm else method
+            found.add((table, column, kind))
+    return found
+
+
+def _has_extension(cur, name):
+    cur.execute("SELECT 1 FROM pg_extension WHERE extname = %s", (name,))
+    return cur.fetchone() is not None
+
+
+def _workload_costs(cur, workload):
+    """Custo estimado de cada query; as que já não são válidas ficam de fora."""
+    costs = {}
+    for sql, _ in workload:
+        cur.execute("SAVEPOINT advisor_query")
+        try:
+            costs[sql] = plan_cost(cur, sql)
+        except psycopg2.Error:
+            cur.execute("ROLLBACK TO SAVEPOINT advisor_query")
+    return costs
+
+
+def evaluate(conn, workload, columns):
+    """
+    Avalia cada candidato isoladamente e devolve uma lista de propostas
+    ordenada pelo ganho relativo no custo total (ponderado) do workload.
+    """
+    cur = conn.cursor()
+    calls = dict(workload)
+    baseline = _workload_costs(cur, workload)
+    total = sum(calls[sql] * cost for sql, cost in baseline.items()) or 1.0
+
+    queries_for = defaultdict(set)
+    for sql in baseline:
+        for candidate in candidate_indexes(sql, columns):
+            queries_for[candidate].add(sql)
+
+    skip = existing_indexes(cur)
+    hypopg = _has_extension(cur, "hypopg")
+    trgm_ready = _has_extension(cur, "pg_trgm")
+
+    proposals = []
+    for candidate, queries in sorted(queries_for.items()):
+        if candidate in skip:
+            continue
+        table, column, kind = candidate
+
+        cur.execute("SAVEPOINT advisor_index")
+        try:
+            if kind == "trgm" and not trgm_ready:
+                cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            if hypopg and kind != "trgm":
+                ddl = f"CREATE INDEX ON {table} {_index_method(column, kind)}"
+                cur.execute("SELECT * FROM hypopg_create_index(%s)", (ddl,))
+            else:
+                # Índice real, revertido no ROLLBACK; bloqueia escritas na tabela enquanto dura
+                cur.execute(index_ddl(*candidate))
+            new_costs = {sql: plan_cost(cur, sql) for sql in queries}
+        except psycopg2.Error as e:
+            print(f"Aviso: não foi possível avaliar {index_name(*candidate)}: {e}")
+            new_costs = {}
+        finally:
+            cur.execute("ROLLBACK TO SAVEPOINT advisor_index")
+            if hypopg:
+                cur.execute("SELECT hypopg_reset()")
+
+        gain = sum(calls[sql] * (baseline[sql] - cost) for sql, cost in new_costs.items())
+        if gain > 0:
+            proposals.append(
+                {
+                    "table": table,
+                    "column": column,
+                    "kind": kind,
+                    "gain": gain / total,
+                    "queries": len(new_costs),
+                }
+            )
+
+    conn.rollback()
+
+    # Um índice por (tabela, coluna): o tipo com maior ganho
+    best = {}
+    for p in proposals:
+        key = (p["table"], p["column"])
+        if key not in best or p["gain"] > best[key]["gain"]:
+            best[key] = p
+    return sorted(best.values(), key=lambda p: p["gain"], reverse=True)
+
+
+def apply_indexes(conn, proposals):
+    """Cria os índices propostos sem bloquear escritas (CONCURRENTLY, fora de transação)."""
+    conn.autocommit = True
+    cur = conn.cursor()
+    if any(p["kind"] == "trgm" for p in proposals):
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for p in proposals:
+        ddl = index_ddl(p["table"], p["column"], p["kind"], concurrently=True)
+        print(ddl)
+        cur.execute(ddl)
+
+
+def print_report(engine, days):
+    rows = slow_queries(engine, days=days)
+    if not rows:
+        print("Sem queries registadas em sql_workload.")
+        return
+    print(
+        f"{'calls':>6} {'total ms':>10} {'avg ms':>8} {'p95 ms':>8} {'max ms':>8} {'fail':>5}  sql"
+    )
+    for r in rows:
+        sql = " ".join(r["sql_text"].split())
+        print(
+            f"{r['calls']:>6} {r['total_ms'] or 0:>10.0f} {r['avg_ms'] or 0:>8.1f} "
+            f"{r['p95_ms'] or 0:>8.1f} {r['max_ms'] or 0:>8.1f} {r['failures']:>5}  {sql[:120]}"
+        )
+
+
+def advise(engine, columns, days, min_gain, apply):
+    workload = replayable_queries(engine, days=days)
+    if not workload:
+        print("Sem queries registadas em sql_workload.")
+        return
+
+    conn = engine.raw_connection()
+    try:
+        proposals = [p for p in evaluate(conn, workload, columns) if p["gain"] >= min_gain]
+        if not proposals:
+            print(f"Nenhum índice reduz o custo do workload em {min_gain:.0%} ou mais.")
+            return
+
+        print(f"Workload: {len(workload)} queries distintas ({days} dias)")
+        for p in proposals:
+            print(
+                f"  -{p['gain']:6.1%} custo  ({p['queries']} queries)  "
+                f"{index_ddl(p['table'], p['column'], p['kind'])};"
+            )
+        if apply:
+            apply_indexes(conn, proposals)
+            print(f"{len(proposals)} índices criados.")
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relatório de queries lentas e index advisor.")
+    parser.add_argument("command", choices=["report", "advise"])
+    parser.add_argument("--days", type=int, default=30, help="janela do workload em dias")
+    parser.add_argument(
+        "--min-gain", type=float, default=0.05, help="redução mínima do custo total (0-1)"
+    )
+    parser.add_argument("--apply", action="store_true", help="criar os índices propostos")
+    args = parser.parse_args()
+
+    db, _ = get_database()
+    if args.command == "report":
+        print_report(db._engine, args.days)
+    else:
+        columns = {
+            name: {col.name for col in table.columns} for name, table in db._metadata.tables.items()
+        }
+        advise(db._engine, columns, args.days, args.min_gain, args.apply)
+
+
+if __name__ == "__main__":
+    main()
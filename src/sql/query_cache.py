@@ -0,0 +1,98 @@
+"""
+Caches do sql_query: pergunta normalizada -> SQL validada e hash da SQL -> resultado.
+Cada entrada guarda a versão das tabelas de que depende (tabela table_versions,
+incrementada pelos loaders utils/ingest_*.py), por isso uma ingestão numa tabela
+invalida apenas as entradas que a usam. Eviction LRU com TTL.
+"""
+
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+_TABLE_REF_RE = re.compile(r"\b(?:FROM|JOIN)\s+((?:\"?\w+\"?\.)?\"?\w+\"?)", re.IGNORECASE)
+
+
+def normalize_question(question: str) -> str:
+    """Minúsculas, sem acentos, pontuação nem espaços repetidos."""
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def sql_hash(sql: str) -> str:
+    normalized = " ".join(sql.strip().rstrip(";").split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def referenced_tables(sql: str, known_tables) -> set[str]:
+    """
+    Tabelas conhecidas referidas em FROM/JOIN. Se nenhuma for reconhecida, assume
+    todas (dependência conservadora, para nunca servir resultados desatualizados).
+    """
+    known = {t.lower() for t in known_tables}
+    found = set()
+    for ref in _TABLE_REF_RE.findall(sql):
+        name = ref.replace('"', "").split(".")[-1].lower()
+        if name in known:
+            found.add(name)
+    return found or known
+
+
+class TTLCache:
+    """Cache LRU com TTL, thread-safe, com dependência em versões de tabelas."""
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, table_versions: dict | None = None):
+        """
+        Devolve o valor ou None se não existir, tiver expirado ou alguma das tabelas
+        de que depende tiver mudado de versão desde que foi guardado.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, deps, stored_at = entry
+                stale = table_versions is not None and any(
+                    table_versions.get(t, 0) != v for t, v in deps.items()
+                )
+                if stale or time.monotonic() - stored_at > self.ttl:
+                    del self._data[key]
+                else:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def set(self, key, value, tables=(), table_versions: dict | None = None):
+        versions = table_versions or {}
+        deps = {t: versions.get(t, 0) for t in tables}
+        with self._lock:
+            self._data[key] = (value, deps, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate_tables(self, tables):
+        """Remove as entradas que dependem de alguma das tabelas indicadas."""
+        tables = {t.lower() for t in tables}
+        with self._lock:
+            for key in [k for k, (_, deps, _) in self._data.items() if tables & deps.keys()]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
@@ -0,0 +1,154 @@
+"""
+Índice semântico do schema para os prompts de text-to-SQL.
+Em vez de enviar todas as tabelas em cada prompt, embebe descrições de tabelas e
+colunas e inclui apenas as top-k tabelas mais relevantes para a pergunta, mais os
+seus parceiros de JOIN (chaves estrangeiras).
+"""
+
+import os
+from collections import defaultdict
+
+from sentence_transformers import SentenceTransformer
+
+SCHEMA_EMBEDDING_MODEL = os.getenv("SQL_SCHEMA_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+# Tabelas de controlo que nunca devem aparecer no prompt
+INTERNAL_TABLES = {"table_versions", "sql_workload"}
+# Hashes da carga incremental (utils/copy_loader.upsert_csv), sem significado para o LLM
+INTERNAL_COLUMNS = {"row_key", "row_hash"}
+
+# Vistas materializadas (database/materialized_views.sql) que agregam cada tabela.
+# Aparecem no prompt antes das tabelas de factos, para o gerador as preferir.
+ROLLUP_PREFIX = "mv_"
+ROLLUPS = {
+    "global_health_stats": ["mv_global_health_country_year"],
+    "brfss_responses": ["mv_brfss_state_rates"],
+    "immunization_fact": ["mv_immunization_coverage", "mv_immunization_global_year"],
+}
+
+TABLE_DESCRIPTIONS = {
+    "diseases": "Disease names and descriptions (doenças).",
+    "symptoms": "Symptom names and severity weights (sintomas, gravidade).",
+    "disease_symptoms": "Which symptoms are associated with which disease.",
+    "disease_precautions": "Precautions and care recommended for each disease (precauções).",
+    "global_health_stats": (
+        "Global health statistics by country, year, disease, age group and gender: prevalence, "
+        "incidence and mortality rates, healthcare access, doctors and hospital beds, treatment "
+        "cost, recovery rate, DALYs (prevalência, mortalidade por país e ano)."
+    ),
+    "chronic_disease_indicators": (
+        "U.S. chronic disease indicators (CDI) by state/location and year: topic, question, "
+        "data value with confidence limits, stratification (indicadores de doença crónica, EUA)."
+    ),
+    "brfss_responses": (
+        "BRFSS survey respondents by U.S. state: diagnosed diabetes, asthma, stroke, heart "
+        "disease, COPD, depression, cancer; smoking, alcohol, exercise, blood pressure, "
+        "cholesterol; BMI, weight, height (inquérito de fatores de risco)."
+    ),
+    "country_dim": "Countries with ISO code and name for vaccination coverage (países).",
+    "vaccine_dim": "Vaccine codes such as DTP3, MCV1, BCG (vacinas).",
+    "immunization_fact": (
+        "WHO/UNICEF (WUENIC) vaccination coverage by country, vaccine and year: coverage "
+        "estimates, children vaccinated and in target (cobertura vacinal)."
+    ),
+    "drugs_side_effects": (
+        "Drugs and medications: medical condition, side effects, generic and brand names, drug "
+        "classes, pregnancy category, alcohol interaction, rating and reviews "
+        "(medicamentos, efeitos secundários)."
+    ),
+    "mv_global_health_country_year": (
+        "Pre-aggregated prevalence, incidence, mortality and recovery rates, population "
+        "affected and DALYs by country, year and disease (prevalência, mortalidade por país e ano)."
+    ),
+    "mv_brfss_state_rates": (
+        "Pre-aggregated BRFSS percentages by survey year and U.S. state: diabetes, asthma, "
+        "stroke, heart disease, COPD, depression, cancer, high blood pressure, smoking, "
+        "exercise, average BMI (taxas de diagnóstico por estado e ano)."
+    ),
+    "mv_immunization_coverage": (
+        "Vaccination coverage by country name/ISO code, vaccine code and year, without joins "
+        "(cobertura vacinal por país, vacina e ano)."
+    ),
+    "mv_immunization_global_year": (
+        "Global vaccination coverage per vaccine and year across countries "
+        "(cobertura vacinal mundial por vacina e ano)."
+    ),
+}
+
+_model = None
+
+
+def _get_model():
+    global _model
+    if _model is None:
+        _model = SentenceTransformer(SCHEMA_EMBEDDING_MODEL)
+    return _model
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa grosseira (~4 caracteres por token), suficiente para comparar prompts."""
+    return max(1, len(text) // 4)
+
+
+def rollups_first(tables) -> list[str]:
+    """Ordena as vistas materializadas (agregados) antes das restantes tabelas."""
+    return sorted(tables, key=lambda t: not t.startswith(ROLLUP_PREFIX))
+
+
+def format_schema(columns: dict, tables) -> str:
+    """Formato minimalista: tabela (coluna1, coluna2, ...)"""
+    return "\n".join(f"{t} ({', '.join(columns[t])})" for t in tables if t in columns)
+
+
+class SchemaIndex:
+    """Embeddings de tabelas/colunas de um SQLDatabase e grafo de JOINs."""
+
+    def __init__(self, db):
+        metadata = db._metadata.tables
+        self.columns = {
+            name: [col.name for col in table.columns if col.name not in INTERNAL_COLUMNS]
+            for name, table in metadata.items()
+            if name not in INTERNAL_TABLES
+        }
+
+        self.partners = defaultdict(set)
+        for name, table in metadata.items():
+            for fk in table.foreign_keys:
+                ref = fk.column.table.name
+                self.partners[name].add(ref)
+                self.partners[ref].add(name)
+
+        texts, owners = [], []
+        for table, cols in self.columns.items():
+            label = table.replace("_", " ")
+            texts.append(f"{label}: {TABLE_DESCRIPTIONS.get(table, '')}")
+            owners.append(table)
+            for col in cols:
+                texts.append(f"{label} {col.replace('_', ' ')}")
+                owners.append(table)
+
+        self.owners = owners
+        self.embeddings = _get_model().encode(texts, normalize_embeddings=True)
+
+    def select_tables(self, question: str, k: int = 3) -> list[str]:
+        """
+        Top-k tabelas por semelhança (máximo entre tabela e colunas) + agregados e
+        parceiros de JOIN, com as vistas materializadas à frente.
+        """
+        q = _get_model().encode([question], normalize_embeddings=True)[0]
+        sims = self.embeddings @ q
+
+        best = {}
+        for owner, sim in zip(self.owners, sims):
+            best[owner] = max(best.get(owner, -1.0), float(sim))
+
+        top = sorted(best, key=best.get, reverse=True)[:k]
+        selected = list(top)
+        for table in top:
+            for partner in ROLLUPS.get(table, []) + sorted(self.partners[table]):
+                if partner not in selected and partner in self.columns:
+                    selected.append(partner)
+        return rollups_first(selected)
+
+    def schema_for(self, question: str, k: int = 3) -> str:
+        return format_schema(self.columns, self.select_tables(question, k))
@@ -1,10 +1,28 @@
 import os
 import re
+import threading
+import time
 from urllib.parse import quote_plus
 
 import yaml
 from langchain_community.utilities import SQLDatabase
 from langchain_ollama import ChatOllama
+from sqlalchemy import inspect, text
+
+from sql.duckdb_backend import AnalyticsFallback, run_analytics, use_analytics
+from sql.guardrails import QueryRejected, ensure_limit, run_guarded
+from sql.query_cache import TTLCache, normalize_question, referenced_tables, sql_hash
+from sql.schema_index import (
+    INTERNAL_COLUMNS,
+    INTERNAL_TABLES,
+    SchemaIndex,
+    estimate_tokens,
+    rollups_first,
+)
+from sql.templates import load_known_values, match_template, stats
+from sql.value_grounding import ground_literals, load_value_dictionary
+from sql.workload import log_query
+from utils.result_render import render_rows
 
 FORBIDDEN_KEYWORDS = [
     "INSERT",
@@ -19,6 +37,44 @@ FORBIDDEN_KEYWORDS = [
     "REVOKE",
 ]
 
+# Schema refletido uma vez por processo; recarregado quando table_versions muda (os
+# loaders correm noutros processos), após invalidação explícita ou TTL
+SCHEMA_TTL_SECONDS = int(os.getenv("SQL_SCHEMA_TTL", "3600"))
+
+# Pool do engine SQLAlchemy (reflexão, templates, dicionários de valores e o sql_query
+# síncrono). Na API as queries correm no pool asyncpg (async_sql_tool), por isso este
+# fica pequeno: cada worker abre até SQL_POOL_MAX_SIZE + pool_size + max_overflow ligações.
+SQL_ENGINE_POOL_SIZE = int(os.getenv("SQL_ENGINE_POOL_SIZE", "1"))
+SQL_ENGINE_MAX_OVERFLOW = int(os.getenv("SQL_ENGINE_MAX_OVERFLOW", "1"))
+
+_schema_lock = threading.Lock()
+_schema_cache = {"db": None, "schema": None, "index": None, "loaded_at": 0.0, "versions": None}
+
+# Templates verificados para as formas de pergunta recorrentes (sem LLM de geração)
+SQL_TEMPLATES = os.getenv("SQL_TEMPLATES", "1") == "1"
+
+# Literais da SQL gerada trocados pelo valor real mais próximo (ex.: 'Portugal' -> 'PORTUGAL')
+SQL_VALUE_GROUNDING = os.getenv("SQL_VALUE_GROUNDING", "1") == "1"
+
+PROMPTS_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "agents", "prompts.yaml")
+)
+
+# Incluir no prompt só as top-k tabelas relevantes (e parceiros de JOIN)
+SCHEMA_PRUNING = os.getenv("SQL_SCHEMA_PRUNING", "1") == "1"
+SCHEMA_TOP_K = int(os.getenv("SQL_SCHEMA_TOP_K", "3"))
+
+# Pergunta normalizada -> SQL validada; hash da SQL -> resultado.
+# Invalidadas por tabela quando os loaders incrementam table_versions.
+SQL_CACHE_SIZE = int(os.getenv("SQL_CACHE_SIZE", "256"))
+SQL_CACHE_TTL = int(os.getenv("SQL_CACHE_TTL", "3600"))
+
+question_cache = TTLCache(maxsize=SQL_CACHE_SIZE, ttl=SQL_CACHE_TTL)
+result_cache = TTLCache(maxsize=SQL_CACHE_SIZE, ttl=SQL_CACHE_TTL)
+
+PROMPT_NOT_FOUND_REPLY = "Erro interno: Prompt de geração de SQL não encontrado."
+NO_RESULTS_REPLY = "Não encontrei resultados para essa pergunta na base de dados."
+
 
 def load_prompt(yaml_path: str, key: str) -> str:
     """Lê um prompt específico do ficheiro YAML."""
@@ -83,65 +139,291 @@ def get_slim_schema(db):
     metadata = db._metadata.tables
     slim_schema = []
 
-    for table_name, table_obj in metadata.items():
+    # Vistas materializadas (agregados mv_*) primeiro, para o gerador as preferir
+    for table_name in rollups_first(metadata):
+        table_obj = metadata[table_name]
+        if table_name in INTERNAL_TABLES:
+            continue
         # Pega apenas os nomes das colunas, sem tipos ou constraints pesadas
-        col_names = [col.name for col in table_obj.columns]
+        # (nem as colunas internas da carga incremental, row_key/row_hash)
+        col_names = [col.name for col in table_obj.columns if col.name not in INTERNAL_COLUMNS]
         slim_schema.append(f"{table_name} ({', '.join(col_names)})")
-    print(f"Slim schema:\n{slim_schema}\n")  # Debug: mostrar schema minimalista
     return "\n".join(slim_schema)
 
 
-def sql_query(user_question: str) -> str:
-    """Generate and run a safe SQL query from a natural-language question."""
+def _reflect_materialized_views(db):
+    """
+    O SQLDatabase só reflete tabelas e vistas simples; junta-lhe as vistas
+    materializadas (mv_*, database/materialized_views.sql) para entrarem no schema.
+    """
+    names = inspect(db._engine).get_materialized_view_names()
+    if names:
+        db._metadata.reflect(bind=db._engine, views=True, only=names)
+
+
+def get_database(table_versions: dict | None = None) -> tuple[SQLDatabase, str]:
+    """
+    Devolve o SQLDatabase e o schema minimalista já formatado para o prompt.
+    A reflexão do Postgres (várias round trips) só é feita na primeira chamada,
+    quando 'table_versions' difere das versões vistas no último carregamento (houve
+    uma ingestão), depois de invalidate_schema_cache() ou quando o TTL expira.
+    """
+    with _schema_lock:
+        expired = time.monotonic() - _schema_cache["loaded_at"] > SCHEMA_TTL_SECONDS
+        # {} = table_versions ilegível; não força recarregamentos em cada pedido
+        changed = bool(table_versions) and _schema_cache["versions"] not in (None, table_versions)
+        if _schema_cache["db"] is None or expired or changed:
+            db = SQLDatabase.from_uri(
+                _build_postgres_uri(),
+                view_support=True,
+                engine_args={
+                    "pool_size": SQL_ENGINE_POOL_SIZE,
+                    "max_overflow": SQL_ENGINE_MAX_OVERFLOW,
+                },
+            )
+            _reflect_materialized_views(db)
+            _schema_cache.update(
+                db=db, schema=get_slim_schema(db), index=None, loaded_at=time.monotonic()
+            )
+            print(f"Slim schema:\n{_schema_cache['schema']}\n")  # Debug: só ao recarregar
+        if table_versions:
+            _schema_cache["versions"] = dict(table_versions)
+        return _schema_cache["db"], _schema_cache["schema"]
+
+
+def invalidate_schema_cache():
+    """Força nova reflexão do schema (ex.: depois de uma alteração de DDL)."""
+    with _schema_lock:
+        _schema_cache.update(db=None, schema=None, index=None, loaded_at=0.0, versions=None)
+
+
+def get_schema_context(user_question: str) -> str:
+    """
+    Schema a incluir no prompt: apenas as tabelas relevantes para a pergunta quando
+    SQL_SCHEMA_PRUNING está ativo, caso contrário o schema completo.
+    """
+    db, schema = get_database()
+    if not SCHEMA_PRUNING:
+        return schema
+
+    with _schema_lock:
+        if _schema_cache["index"] is None:
+            _schema_cache["index"] = SchemaIndex(db)
+        index = _schema_cache["index"]
 
-    db = SQLDatabase.from_uri(_build_postgres_uri())
+    pruned = index.schema_for(user_question, SCHEMA_TOP_K)
+    print(
+        f"Schema tokens (estimativa): {estimate_tokens(schema)} -> {estimate_tokens(pruned)}"
+    )  # Debug: poupança no prompt
+    return pruned
+
+
+def get_table_versions(db) -> dict:
+    """Versão atual de cada tabela (incrementada pelos loaders de ingestão)."""
+    try:
+        with db._engine.connect() as conn:
+            rows = conn.execute(text("SELECT table_name, version FROM table_versions"))
+            return {name: version for name, version in rows}
+    except Exception as e:
+        print(f"Aviso: não foi possível ler table_versions: {e}")
+        return {}
 
-    # 1. Obter apenas o essencial do schema
-    schema = get_slim_schema(db)
 
-    llm = ChatOllama(
+def get_llm() -> ChatOllama:
+    return ChatOllama(
         model=os.getenv("SQL_LLM_MODEL", "gemma3:4b"),
         base_url=os.getenv("OLLAMA_HOST", "http://ollama:11434"),
         temperature=0,
     )
 
-    agents_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "agents"))
-    prompts_path = os.path.join(agents_dir, "prompts.yaml")
-    gen_template = load_prompt(prompts_path, "sql_prompt")
 
-    if not gen_template:
-        return "Erro interno: Prompt de geração de SQL não encontrado."
-
-    prompt_sql = gen_template.format(schema=schema, user_question=user_question)
-
-    # 2. Gerar e extrair SQL
-    raw_response = llm.invoke(prompt_sql)
+def parse_generated_sql(raw_response) -> str:
+    """Extrai a SQL da resposta do LLM; QueryRejected se não for um SELECT seguro."""
+    usage = getattr(raw_response, "usage_metadata", None) or {}
+    if usage:
+        print(f"Prompt tokens (SQL): {usage.get('input_tokens')}")  # Debug
     raw_sql = raw_response.content if hasattr(raw_response, "content") else str(raw_response)
     generated_sql = _extract_sql(raw_sql)
 
-    # 3. Validar SQL
     if not generated_sql or not _is_safe_query(generated_sql):
-        return "Não consegui gerar uma query SQL segura (apenas SELECT é permitido)."
+        raise QueryRejected(
+            "unsafe_query",
+            "Não consegui gerar uma query SQL segura (apenas SELECT é permitido).",
+        )
+    return generated_sql
+
+
+def template_sql(db, user_question: str, table_versions: dict) -> str | None:
+    """SQL de um template verificado que encaixe na pergunta, ou None."""
+    if not SQL_TEMPLATES:
+        return None
+    known_values = load_known_values(db._engine, table_versions)
+    match = match_template(user_question, known_values, db._metadata.tables.keys())
+    if match is None:
+        return None
+    stats.record_hit(match.template.name)
+    summary = stats.summary()
+    print(
+        f"Template {match.template.name} {match.values} "
+        f"(hit rate {summary['hit_rate']:.0%}, ~{summary['estimated_saved_ms']:.0f} ms poupados)"
+    )  # Debug
+    return match.sql
+
+
+def ground_sql(db, generated_sql: str, table_versions: dict) -> str:
+    """SQL do LLM com os literais de colunas conhecidas alinhados com os dados."""
+    if not SQL_VALUE_GROUNDING:
+        return generated_sql
+    dictionary = load_value_dictionary(db._engine, table_versions)
+    grounded_sql, replacements = ground_literals(generated_sql, dictionary)
+    for column, literal, value in replacements:
+        print(f"Literal {column}: {literal!r} -> {value!r}")  # Debug
+    return grounded_sql
+
+
+# --- Passos comuns ao sql_query e ao async_sql_tool.sql_query (só a execução difere) ---
+
+
+def known_sql(db, user_question: str, table_versions: dict) -> str | None:
+    """SQL já validada para a mesma pergunta (cache) ou de um template; None = usar o LLM."""
+    generated_sql = question_cache.get(normalize_question(user_question), table_versions)
+    if generated_sql is None:
+        generated_sql = template_sql(db, user_question, table_versions)
+    return generated_sql
+
+
+def sql_prompt(user_question: str) -> str | None:
+    """Prompt de geração com o schema relevante; None se o prompt não existir."""
+    gen_template = load_prompt(PROMPTS_PATH, "sql_prompt")
+    if not gen_template:
+        return None
+    schema = get_schema_context(user_question)
+    return gen_template.format(schema=schema, user_question=user_question)
 
-    print(f"Generated SQL:\n{generated_sql}\n")  # Debug: mostrar SQL gerada
-    # 4. Executar SQL
-    result = db.run_no_throw(generated_sql)
 
-    if isinstance(result, str) and result.strip().startswith("Error"):
-        return f"A query SQL falhou: {result}"
+def accept_generated_sql(
+    db, user_question: str, raw_response, table_versions: dict, started: float
+) -> str:
+    """Valida e alinha a SQL do LLM e guarda-a na cache de perguntas."""
+    generated_sql = parse_generated_sql(raw_response)
+    stats.record_generation((time.perf_counter() - started) * 1000)
+    generated_sql = ground_sql(db, generated_sql, table_versions)
 
-    if result in ("", "[]", [], None):
-        return "Não encontrei resultados para essa pergunta na base de dados."
+    tables = referenced_tables(generated_sql, db._metadata.tables.keys())
+    question_cache.set(normalize_question(user_question), generated_sql, tables, table_versions)
+    return generated_sql
 
-    # 5. Carregar prompt de explicação e gerar resposta final
-    exp_template = load_prompt(prompts_path, "sql_explanation_prompt")
 
-    if not exp_template:
-        return f"Resultados brutos (Erro ao carregar prompt de explicação): {result}"
+def cache_result(generated_sql: str, executed_sql, columns, rows, tables, table_versions) -> dict:
+    result = {"sql": executed_sql, "columns": columns, "rows": rows}
+    result_cache.set(sql_hash(generated_sql), result, tables, table_versions)
+    return result
 
-    explain_prompt = exp_template.format(
-        user_question=user_question, generated_sql=generated_sql, result=result
+
+def render_result(result: dict) -> str | None:
+    """Resposta sem LLM (sem linhas ou resultado pequeno), ou None se for preciso explicar."""
+    if not result["rows"]:
+        return NO_RESULTS_REPLY
+    # Resultados pequenos: tabela/frase determinística, sem a chamada de explicação
+    return render_rows(result["columns"], result["rows"])
+
+
+def explanation_prompt(user_question: str, result: dict) -> str | None:
+    exp_template = load_prompt(PROMPTS_PATH, "sql_explanation_prompt")
+    if not exp_template:
+        return None
+    return exp_template.format(
+        user_question=user_question, generated_sql=result["sql"], result=_rows_text(result)
     )
 
-    final = llm.invoke(explain_prompt)
-    return final.content if hasattr(final, "content") else str(final)
+
+def raw_result_reply(result: dict) -> str:
+    return f"Resultados brutos (Erro ao carregar prompt de explicação): {_rows_text(result)}"
+
+
+def _rows_text(result: dict) -> str:
+    return str([tuple(row) for row in result["rows"]])
+
+
+def llm_text(response) -> str:
+    return response.content if hasattr(response, "content") else str(response)
+
+
+def execute_sql(db, generated_sql: str, tables, table_versions: dict, cancel_event=None):
+    """
+    Agregações sobre tabelas com snapshot atualizado correm no DuckDB; o resto, ou o
+    que o DuckDB não conseguir executar, no Postgres (run_guarded).
+    """
+    if use_analytics(generated_sql, tables, table_versions):
+        try:
+            result = run_analytics(generated_sql, cancel_event)
+            print("Backend: DuckDB (snapshots Parquet)")  # Debug
+            return result
+        except AnalyticsFallback as e:
+            print(f"DuckDB não executou a query ({e}); a usar o Postgres")
+    return run_guarded(db._engine, generated_sql, cancel_event)
+
+
+def sql_query(user_question: str, cancel_event: threading.Event | None = None) -> str:
+    """
+    Generate and run a safe SQL query from a natural-language question.
+    Raises QueryRejected when the generated query is unsafe, too expensive,
+    times out or is cancelled (cancel_event set when the client disconnects).
+    """
+
+    # 1. Base de dados e schema em cache por processo (recarregados após uma ingestão)
+    db, _ = get_database()
+    table_versions = get_table_versions(db)
+    db, _ = get_database(table_versions)
+
+    llm = get_llm()
+
+    # 2. SQL já validada para a mesma pergunta ou de um template; senão, gerada pelo LLM
+    generated_sql = known_sql(db, user_question, table_versions)
+
+    if generated_sql is None:
+        start = time.perf_counter()
+        prompt_sql = sql_prompt(user_question)
+
+        if prompt_sql is None:
+            return PROMPT_NOT_FOUND_REPLY
+
+        # 3. Extrair e validar SQL
+        generated_sql = accept_generated_sql(
+            db, user_question, llm.invoke(prompt_sql), table_versions, start
+        )
+
+    tables = referenced_tables(generated_sql, db._metadata.tables.keys())
+    print(f"Generated SQL:\n{generated_sql}\n")  # Debug: mostrar SQL gerada
+    # 4. Executar SQL (ou reutilizar o resultado da mesma SQL)
+    result = result_cache.get(sql_hash(generated_sql), table_versions)
+
+    if result is None:
+        if cancel_event is not None and cancel_event.is_set():
+            raise QueryRejected("cancelled", "Pedido cancelado pelo cliente.")
+
+        # DuckDB ou Postgres (EXPLAIN + LIMIT + statement_timeout, só de leitura)
+        start = time.perf_counter()
+        try:
+            executed_sql, columns, rows = execute_sql(
+                db, generated_sql, tables, table_versions, cancel_event
+            )
+        except QueryRejected as e:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            log_query(db._engine, user_question, ensure_limit(generated_sql), e.code, elapsed_ms)
+            raise
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        log_query(db._engine, user_question, executed_sql, "ok", elapsed_ms, len(rows))
+        result = cache_result(generated_sql, executed_sql, columns, rows, tables, table_versions)
+
+    rendered = render_result(result)
+    if rendered is not None:
+        return rendered
+
+    # 5. Carregar prompt de explicação e gerar resposta final
+    explain_prompt = explanation_prompt(user_question, result)
+
+    if explain_prompt is None:
+        return raw_result_reply(result)
+
+    return llm_text(llm.invoke(explain_prompt))
@@ -0,0 +1,281 @@
+"""
+Templates SQL verificados para as formas de pergunta mais frequentes
+("prevalência de X em Y no ano Z", "efeitos secundários de DROGA", ...).
+As perguntas são normalizadas e os slots (doenças, países, anos, medicamentos,
+vacinas) preenchidos apenas com valores que existem nas colunas de origem; um
+template que encaixa é executado diretamente, sem a chamada ao LLM de geração.
+Perguntas sem template seguem para o sql_prompt.
+"""
+
+import re
+import threading
+from dataclasses import dataclass
+
+from sql.query_cache import normalize_question
+
+MAX_NGRAM = 6  # palavras máximas de um valor (ex.: "Bactrim DS", "United States")
+
+_YEAR_RE = re.compile(r"\b(?:19|20)\d{2}\b")
+
+
+@dataclass(frozen=True)
+class Template:
+    name: str
+    pattern: str  # regex sobre a pergunta normalizada (sem acentos, minúsculas)
+    slots: dict  # slot -> (tabela, coluna) de onde vêm os valores válidos
+    sql: str  # SQL com {slot} substituído por literais já validados
+    tables: tuple  # relações que têm de existir para o template ser usado
+
+    def render(self, values: dict) -> str:
+        return self.sql.format(**{slot: _literal(v) for slot, v in values.items()})
+
+
+def _literal(value) -> str:
+    if isinstance(value, int):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+_GH = "mv_global_health_country_year"
+_GH_SLOTS = {
+    "disease": ("global_health_stats", "disease_name"),
+    "country": ("global_health_stats", "country"),
+}
+_GH_YEAR = {"year": ("global_health_stats", "year")}
+
+_RATES = {
+    "prevalence": (r"\bpreval", "avg_prevalence_rate"),
+    "mortality": (r"\bmortal|\bmortes?\b|\bobitos?\b|\bdeaths?\b", "avg_mortality_rate"),
+    "incidence": (r"\bincid", "avg_incidence_rate"),
+}
+
+TEMPLATES = []
+for _metric, (_pattern, _column) in _RATES.items():
+    TEMPLATES += [
+        Template(
+            name=f"{_metric}_country_year",
+            pattern=_pattern,
+            slots={**_GH_SLOTS, **_GH_YEAR},
+            sql=(
+                f"SELECT country, year, disease_name, {_column} FROM {_GH} "
+                "WHERE disease_name = {disease} AND country = {country} AND year = {year}"
+            ),
+            tables=(_GH,),
+        ),
+        Template(
+            name=f"{_metric}_country",
+            pattern=_pattern,
+            slots=_GH_SLOTS,
+            sql=(
+                f"SELECT country, year, disease_name, {_column} FROM {_GH} "
+                "WHERE disease_name = {disease} AND country = {country} ORDER BY year"
+            ),
+            tables=(_GH,),
+        ),
+    ]
+
+TEMPLATES += [
+    Template(
+        name="vaccine_coverage_country_year",
+        pattern=r"\bcobertura|\bcoverage|\bvacina|\bvaccin",
+        slots={
+            "vaccine": ("vaccine_dim", "vaccine_code"),
+            "country": ("country_dim", "country_name"),
+            "year": ("immunization_fact", "year"),
+        },
+        sql=(
+            "SELECT country_name, vaccine_code, year, wuenic_coverage "
+            "FROM mv_immunization_coverage "
+            "WHERE vaccine_code = {vaccine} AND country_name = {country} AND year = {year}"
+        ),
+        tables=("mv_immunization_coverage",),
+    ),
+    Template(
+        name="vaccine_coverage_country",
+        pattern=r"\bcobertura|\bcoverage|\bvacina|\bvaccin",
+        slots={
+            "vaccine": ("vaccine_dim", "vaccine_code"),
+            "country": ("country_dim", "country_name"),
+        },
+        sql=(
+            "SELECT country_name, vaccine_code, year, wuenic_coverage "
+            "FROM mv_immunization_coverage "
+            "WHERE vaccine_code = {vaccine} AND country_name = {country} ORDER BY year"
+        ),
+        tables=("mv_immunization_coverage",),
+    ),
+    Template(
+        name="drug_side_effects",
+        pattern=r"\befeitos? (?:secundarios?|adversos?|colaterais)|\bside effects?\b",
+        slots={"drug": ("drugs_side_effects", "drug_name")},
+        sql=(
+            "SELECT drug_name, generic_name, side_effects FROM drugs_side_effects "
+            "WHERE drug_name = {drug}"
+        ),
+        tables=("drugs_side_effects",),
+    ),
+    Template(
+        name="disease_symptoms",
+        pattern=r"\bsintomas?\b|\bsymptoms?\b",
+        slots={"disease": ("diseases", "name")},
+        sql=(
+            "SELECT d.name AS disease, s.name AS symptom FROM diseases d "
+            "JOIN disease_symptoms ds ON ds.disease_id = d.disease_id "
+            "JOIN symptoms s ON s.symptom_id = ds.symptom_id "
+            "WHERE d.name = {disease} ORDER BY s.severity_weight DESC"
+        ),
+        tables=("diseases", "disease_symptoms", "symptoms"),
+    ),
+    Template(
+        name="disease_precautions",
+        pattern=r"\bprecauc|\bprevenir\b|\bprevencao\b|\bprecautions?\b",
+        slots={"disease": ("diseases", "name")},
+        sql=(
+            "SELECT d.name AS disease, p.precaution FROM diseases d "
+            "JOIN disease_precautions p ON p.disease_id = d.disease_id "
+            "WHERE d.name = {disease}"
+        ),
+        tables=("diseases", "disease_precautions"),
+    ),
+]
+
+
+@dataclass
+class TemplateMatch:
+    template: Template
+    values: dict
+    sql: str
+
+
+def find_slot_values(normalized_question: str, known: dict) -> set:
+    """Valores de uma coluna ('known': normalizado -> original) presentes na pergunta."""
+    if not known:
+        return set()
+    if all(isinstance(v, int) for v in known.values()):
+        return {known[y] for y in _YEAR_RE.findall(normalized_question) if y in known}
+
+    words = normalized_question.split()
+    found = {}
+    covered = set()
+    # N-gramas mais longos primeiro: "south africa" ganha a "africa"
+    for n in range(min(MAX_NGRAM, len(words)), 0, -1):
+        for i in range(len(words) - n + 1):
+            span = set(range(i, i + n))
+            if span & covered:
+                continue
+            gram = " ".join(words[i : i + n])
+            if gram in known:
+                found[gram] = known[gram]
+                covered |= span
+    return set(found.values())
+
+
+def match_template(question: str, known_values: dict, available_tables=None):
+    """
+    Primeiro template cujo padrão encaixa na pergunta e cujos slots têm exatamente
+    um valor válido cada. 'known_values' mapeia (tabela, coluna) -> {normalizado: valor}.
+    Um template sem slot de ano só é usado se a pergunta não referir nenhum ano.
+    """
+    normalized = normalize_question(question)
+    mentions_year = bool(_YEAR_RE.search(normalized))
+
+    for template in TEMPLATES:
+        if available_tables is not None and not set(template.tables) <= set(available_tables):
+            continue
+        if not re.search(template.pattern, normalized):
+            continue
+        if mentions_year and "year" not in template.slots:
+            continue
+
+        values = {}
+        for slot, source in template.slots.items():
+            found = find_slot_values(normalized, known_values.get(source, {}))
+            if len(found) != 1:
+                break
+            values[slot] = found.pop()
+        else:
+            return TemplateMatch(template, values, template.render(values))
+    return None
+
+
+def slot_sources():
+    return sorted({source for t in TEMPLATES for source in t.slots.values()})
+
+
+_values_lock = threading.Lock()
+_values_cache = {}  # (tabela, coluna) -> (versão da tabela, {normalizado: valor})
+
+
+def load_known_values(engine, table_versions: dict, sources=None) -> dict:
+    """
+    Valores distintos de cada coluna usada em slots (ou das colunas 'sources'),
+    normalizados para o matching. Recarregados apenas quando a versão da tabela de
+    origem muda (table_versions).
+    """
+    with _values_lock:
+        stale = [
+            source
+            for source in (slot_sources() if sources is None else sources)
+            if source not in _values_cache
+            or _values_cache[source][0] != table_versions.get(source[0], 0)
+        ]
+        if stale:
+            conn = engine.raw_connection()
+            try:
+                cur = conn.cursor()
+                for table, column in stale:
+                    try:
+                        cur.execute(
+                            f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL"
+                        )
+                        rows = cur.fetchall()
+                    except Exception as e:
+                        print(f"Aviso: valores de {table}.{column} indisponíveis: {e}")
+                        conn.rollback()
+                        rows = []
+                    values = {}
+                    for (value,) in rows:
+                        key = str(value) if isinstance(value, int) else normalize_question(value)
+                        values.setdefault(key, value)
+                    _values_cache[(table, column)] = (table_versions.get(table, 0), values)
+            finally:
+                conn.rollback()
+                conn.close()
+        return {source: values for source, (_, values) in _values_cache.items()}
+
+
+class TemplateStats:
+    """Taxa de acerto dos templates e latência de geração poupada (estimada)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.generation_ms = 0.0
+        self.by_template = {}
+
+    def record_hit(self, name: str):
+        with self._lock:
+            self.hits += 1
+            self.by_template[name] = self.by_template.get(name, 0) + 1
+
+    def record_generation(self, elapsed_ms: float):
+        with self._lock:
+            self.misses += 1
+            self.generation_ms += elapsed_ms
+
+    def summary(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            avg_generation_ms = self.generation_ms / self.misses if self.misses else 0.0
+            return {
+                "template_hits": self.hits,
+                "llm_generations": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "avg_generation_ms": round(avg_generation_ms, 1),
+                "estimated_saved_ms": round(self.hits * avg_generation_ms, 1),
+                "by_template": dict(self.by_template),
+            }
+
+
+stats = TemplateStats()
@@ -0,0 +1,163 @@
+"""
+Dicionário de valores das colunas de texto de baixa cardinalidade (países, doenças,
+tópicos CDI, vacinas, ...) para corrigir os literais da SQL gerada pelo LLM antes de
+a executar: "WHERE country_name = 'Portugal'" passa a "= 'PORTUGAL'" se for esse o
+valor guardado. Sem isto a query devolve zero linhas e o utilizador tem de repetir a
+pergunta (duas chamadas ao LLM).
+
+Os valores vêm de load_known_values (recarregados quando table_versions muda, ou seja,
+depois de cada ingestão) e ficam em memória com um índice de trigramas para o
+matching aproximado. Só são reescritas comparações simples (=, <>, IN) de colunas
+conhecidas; LIKE/ILIKE e expressões (LOWER(col) = ...) ficam como estão.
+"""
+
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+from sql.query_cache import normalize_question
+from sql.templates import load_known_values
+
+# (tabela, coluna) com valores a usar; os agregados mv_* herdam os nomes das colunas
+GROUNDED_COLUMNS = [
+    ("global_health_stats", "country"),
+    ("global_health_stats", "disease_name"),
+    ("country_dim", "country_name"),
+    ("vaccine_dim", "vaccine_code"),
+    ("chronic_disease_indicators", "topic"),
+    ("chronic_disease_indicators", "location_desc"),
+    ("drugs_side_effects", "medical_condition"),
+]
+
+# Semelhança mínima (0-1, difflib) para trocar um literal pelo valor mais próximo
+SQL_GROUNDING_CUTOFF = float(os.getenv("SQL_GROUNDING_CUTOFF", "0.8"))
+MAX_CANDIDATES = 20  # valores com mais trigramas em comum avaliados com o difflib
+
+_LITERAL = r"'(?:[^']|'')*'"
+_COLUMN = r'(?:"?\w+"?\.)?"?(?P<name>\w+)"?'
+_COMPARISON_RE = re.compile(rf"(?<![\w.\"']){_COLUMN}\s*(?:=|<>|!=)\s*(?P<literal>{_LITERAL})")
+_IN_RE = re.compile(
+    rf"(?<![\w.\"']){_COLUMN}\s+(?:NOT\s+)?IN\s*\((?P<items>\s*{_LITERAL}(?:\s*,\s*{_LITERAL})*\s*)\)",
+    re.IGNORECASE,
+)
+_LITERAL_RE = re.compile(_LITERAL)
+
+
+def _trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class ValueIndex:
+    """Valores de uma coluna ({normalizado: original}) com índice de trigramas e palavras."""
+
+    def __init__(self, values: dict):
+        self.values = values
+        self.originals = set(values.values())
+        self.grams = defaultdict(set)
+        self.words = defaultdict(set)
+        for key in values:
+            for gram in _trigrams(key):
+                self.grams[gram].add(key)
+            for word in key.split():
+                self.words[word].add(key)
+
+    def lookup(self, literal: str) -> str | None:
+        """Valor guardado mais próximo de 'literal', ou None se nenhum for parecido."""
+        if literal in self.originals:
+            return literal
+        key = normalize_question(literal)
+        if not key:
+            return None
+        if key in self.values:  # só muda a capitalização, acentos ou pontuação
+            return self.values[key]
+
+        # Palavras do literal num único valor, por outra ordem ("Disease, Alzheimer's"); tem
+        # de cobrir quase todo o valor: "Cancer" não passa a "Lung Cancer", nem "B" a
+        # "Hepatitis B"
+        words = set(key.split())
+        containing = set.intersection(*(self.words.get(w, set()) for w in words))
+        if len(containing) == 1:
+            candidate = next(iter(containing))
+            if len(words) / len(set(candidate.split())) >= SQL_GROUNDING_CUTOFF:
+                return self.values[candidate]
+
+        shared = Counter(k for gram in _trigrams(key) for k in self.grams.get(gram, ()))
+        best, best_ratio = None, 0.0
+        for candidate, _ in shared.most_common(MAX_CANDIDATES):
+            ratio = SequenceMatcher(None, key, candidate).ratio()
+            if ratio > best_ratio:
+                best, best_ratio = candidate, ratio
+        if best is not None and best_ratio >= SQL_GROUNDING_CUTOFF:
+            return self.values[best]
+        return None
+
+
+class ValueDictionary:
+    """Um ValueIndex por nome de coluna (as mv_* usam os mesmos nomes das tabelas)."""
+
+    def __init__(self, known_values: dict, columns=GROUNDED_COLUMNS):
+        merged = defaultdict(dict)
+        for table, column in columns:
+            for key, value in known_values.get((table, column), {}).items():
+                merged[column].setdefault(key, value)
+        self.indexes = {column: ValueIndex(values) for column, values in merged.items()}
+
+    def lookup(self, column: str, literal: str) -> str | None:
+        index = self.indexes.get(column.lower())
+        return index.lookup(literal) if index is not None else None
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def ground_literals(sql: str, dictionary: ValueDictionary) -> tuple[str, list]:
+    """
+    Troca os literais comparados com colunas do dicionário pelo valor real mais
+    próximo. Devolve a SQL e a lista de trocas (coluna, literal, valor).
+    """
+    replacements = []
+
+    def ground(column: str, quoted: str) -> str:
+        literal = quoted[1:-1].replace("''", "'")
+        value = dictionary.lookup(column, literal)
+        if value is None or value == literal:
+            return quoted
+        replacements.append((column, literal, value))
+        return _quote(value)
+
+    def comparison(match):
+        start, end = match.span("literal")
+        grounded = ground(match.group("name"), match.group("literal"))
+        offset = match.start()
+        text = match.group(0)
+        return text[: start - offset] + grounded + text[end - offset :]
+
+    def in_list(match):
+        start, end = match.span("items")
+        name = match.group("name")
+        items = _LITERAL_RE.sub(lambda m: ground(name, m.group(0)), match.group("items"))
+        offset = match.start()
+        text = match.group(0)
+        return text[: start - offset] + items + text[end - offset :]
+
+    sql = _IN_RE.sub(in_list, sql)
+    sql = _COMPARISON_RE.sub(comparison, sql)
+    return sql, replacements
+
+
+_dictionary_lock = threading.Lock()
+_dictionary_cache = {"versions": None, "dictionary": None}
+
+
+def load_value_dictionary(engine, table_versions: dict) -> ValueDictionary:
+    """Dicionário em memória, reconstruído só quando uma das tabelas de origem muda."""
+    versions = tuple(table_versions.get(table, 0) for table, _ in GROUNDED_COLUMNS)
+    with _dictionary_lock:
+        if _dictionary_cache["versions"] != versions:
+            known_values = load_known_values(engine, table_versions, GROUNDED_COLUMNS)
+            _dictionary_cache.update(versions=versions, dictionary=ValueDictionary(known_values))
+        return _dictionary_cache["dictionary"]
@@ -0,0 +1,89 @@
+"""
+Registo do workload do sql_query na tabela sql_workload: cada query gerada que chega
+a ser executada (ou é rejeitada pela camada de proteção) fica com a duração, o
+estado e o número de linhas. Alimenta o relatório de queries lentas e o index advisor.
+"""
+
+import os
+
+from sqlalchemy import text
+
+from sql.query_cache import sql_hash
+
+WORKLOAD_LOG = os.getenv("SQL_WORKLOAD_LOG", "1") == "1"
+
+WORKLOAD_COLUMNS = ("question", "sql_text", "sql_hash", "status", "duration_ms", "row_count")
+
+_INSERT = text(
+    f"INSERT INTO sql_workload ({', '.join(WORKLOAD_COLUMNS)}) "
+    f"VALUES ({', '.join(':' + c for c in WORKLOAD_COLUMNS)})"
+)
+
+_SLOW_QUERIES = text(
+    """
+    SELECT
+        sql_hash,
+        COUNT(*) AS calls,
+        SUM(duration_ms) AS total_ms,
+        AVG(duration_ms) AS avg_ms,
+        percentile_cont(0.95) WITHIN GROUP (ORDER BY duration_ms) AS p95_ms,
+        MAX(duration_ms) AS max_ms,
+        COUNT(*) FILTER (WHERE status <> 'ok') AS failures,
+        MIN(sql_text) AS sql_text
+    FROM sql_workload
+    WHERE executed_at > now() - make_interval(days => :days)
+    GROUP BY sql_hash
+    ORDER BY total_ms DESC NULLS LAST
+    LIMIT :limit
+    """
+)
+
+# Queries que valem a pena analisar: executadas, lentas demais ou recusadas pelo custo
+_REPLAYABLE = text(
+    """
+    SELECT MIN(sql_text) AS sql_text, COUNT(*) AS calls
+    FROM sql_workload
+    WHERE executed_at > now() - make_interval(days => :days)
+      AND status IN ('ok', 'timeout', 'cancelled', 'cost_too_high')
+    GROUP BY sql_hash
+    ORDER BY calls DESC
+    LIMIT :limit
+    """
+)
+
+
+def workload_row(question, sql, status, duration_ms, row_count=None) -> dict:
+    """Valores de uma linha de sql_workload, pela ordem de WORKLOAD_COLUMNS."""
+    return {
+        "question": question,
+        "sql_text": sql,
+        "sql_hash": sql_hash(sql),
+        "status": status,
+        "duration_ms": duration_ms,
+        "row_count": row_count,
+    }
+
+
+def log_query(engine, question, sql, status, duration_ms, row_count=None):
+    """Regista uma execução; nunca faz falhar o pedido do utilizador."""
+    if not WORKLOAD_LOG:
+        return
+    try:
+        with engine.begin() as conn:
+            conn.execute(_INSERT, workload_row(question, sql, status, duration_ms, row_count))
+    except Exception as e:
+        print(f"Aviso: não foi possível registar a query em sql_workload: {e}")
+
+
+def slow_queries(engine, days=30, limit=20) -> list[dict]:
+    """Queries agrupadas por hash, ordenadas pelo tempo total gasto."""
+    with engine.connect() as conn:
+        rows = conn.execute(_SLOW_QUERIES, {"days": days, "limit": limit})
+        return [dict(row._mapping) for row in rows]
+
+
+def replayable_queries(engine, days=30, limit=200) -> list[tuple[str, int]]:
+    """(sql, nº de execuções) das queries distintas do workload, mais frequentes primeiro."""
+    with engine.connect() as conn:
+        rows = conn.execute(_REPLAYABLE, {"days": days, "limit": limit})
+        return [(row.sql_text, row.calls) for row in rows]
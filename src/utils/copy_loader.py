@@ -0,0 +1,321 @@
+"""
+Loader CSV -> Postgres partilhado pelos scripts ingest_*.py.
+Lê só as colunas necessárias (usecols), como texto e depois convertidas para os
+tipos declarados, em chunks de tamanho fixo; cada chunk é enviado com COPY FROM
+STDIN para uma tabela de staging temporária e no fim um único INSERT ... SELECT
+resolve os conflitos (ON CONFLICT DO NOTHING). A memória fica limitada a um chunk.
+Os chunks limpos ficam na cache Parquet (parquet_cache), por isso uma nova carga do
+mesmo CSV não volta a fazer o parsing.
+
+upsert_csv é o modo incremental: compara hashes por linha sobre uma chave natural
+declarada e só escreve o delta (inseridas, atualizadas e, opcionalmente, apagadas).
+"""
+
+import io
+import os
+import time
+
+import pandas as pd
+from parquet_cache import cached_chunks, code_version
+
+CHUNK_SIZE = 50_000
+
+
+def table_columns(cur, table: str) -> set[str]:
+    cur.execute(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = %s",
+        (table,),
+    )
+    return {row[0] for row in cur.fetchall()}
+
+
+def convert_types(df: pd.DataFrame, dtypes: dict) -> pd.DataFrame:
+    """
+    Converte as colunas declaradas em 'dtypes' ("int" ou "float"); valores inválidos
+    (ex.: '~' no CDI) passam a NULL. As restantes colunas ficam como texto.
+    """
+    for col, kind in dtypes.items():
+        if col not in df.columns:
+            continue
+        values = pd.to_numeric(df[col], errors="coerce")
+        if kind == "int":
+            # Int64 (nullable) para o COPY receber "3" e não "3.0"
+            values = values.where(values % 1 == 0).astype("Int64")
+        else:
+            # Sempre float: um NUMERIC sem escala guardaria "3" e "3.0" de forma diferente
+            # e o row_hash do upsert_csv mudaria conforme o chunk
+            values = values.astype("float64")
+        df[col] = values
+    return df
+
+
+def iter_csv_chunks(csv_path, columns_map, dtypes=None, transform=None, chunksize=CHUNK_SIZE):
+    """Chunks já renomeados, tipados e transformados, só com as colunas de columns_map."""
+    header = pd.read_csv(csv_path, nrows=0).columns
+    usecols = [c for c in columns_map if c in header]
+
+    reader = pd.read_csv(csv_path, usecols=usecols, dtype=str, chunksize=chunksize)
+    for chunk in reader:
+        chunk = convert_types(chunk.rename(columns=columns_map), dtypes or {})
+        if transform is not None:
+            chunk = transform(chunk)
+        yield chunk
+
+
+def copy_chunk(cur, table: str, df: pd.DataFrame):
+    """Envia um DataFrame com COPY ... FROM STDIN (CSV; campos vazios = NULL)."""
+    buf = io.StringIO()
+    df.to_csv(buf, index=False, header=False)
+    buf.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(df.columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+
+def _mapped_columns(cur, table: str, columns_map: dict) -> dict:
+    """columns_map sem as colunas que não existem na tabela de destino (com aviso)."""
+    target_columns = table_columns(cur, table)
+    skipped = [dst for dst in columns_map.values() if dst not in target_columns]
+    if skipped:
+        print(f"Aviso: colunas sem correspondência em {table}, ignoradas: {', '.join(skipped)}")
+    return {src: dst for src, dst in columns_map.items() if dst in target_columns}
+
+
+def _create_staging(cur, table: str, columns) -> str:
+    staging = f"staging_{table}"
+    cols = ", ".join(dict.fromkeys(columns))
+    cur.execute(
+        f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS SELECT {cols} FROM {table} WITH NO DATA"
+    )
+    return staging
+
+
+def _copy_chunks(
+    cur, csv_path, table, destination, columns_map, dtypes, transform, cache_version, chunksize
+):
+    """COPY de todos os chunks (via cache Parquet) para 'destination'; devolve (linhas, colunas)."""
+    start = time.perf_counter()
+    rows_read = 0
+    columns = None
+    # Uma entrada por ficheiro: vários CSV da mesma tabela (ex.: um por ano) não se apagam
+    source = os.path.splitext(os.path.basename(csv_path))[0]
+    chunks = cached_chunks(
+        f"{table}-{source}",
+        [csv_path],
+        code_version(
+            columns_map, dtypes, transform, convert_types, iter_csv_chunks, *cache_version
+        ),
+        lambda: iter_csv_chunks(csv_path, columns_map, dtypes, transform, chunksize),
+        chunksize,
+    )
+    for chunk in chunks:
+        columns = list(chunk.columns)
+        copy_chunk(cur, destination, chunk)
+        rows_read += len(chunk)
+        elapsed = time.perf_counter() - start
+        print(f"  {rows_read} linhas enviadas ({rows_read / elapsed:,.0f} linhas/s)")
+    return rows_read, columns
+
+
+def copy_csv(
+    cur,
+    csv_path,
+    table: str,
+    columns_map: dict,
+    dtypes: dict | None = None,
+    conflict: tuple | None = None,
+    transform=None,
+    cache_version: tuple = (),
+    chunksize: int = CHUNK_SIZE,
+) -> dict:
+    """
+    Carrega 'csv_path' em 'table' na transação do cursor (o chamador faz commit).
+    Com 'conflict' (colunas da chave única) usa staging + ON CONFLICT DO NOTHING;
+    sem chave, faz COPY diretamente para a tabela. Devolve as estatísticas da carga.
+    'cache_version': valores usados pelo 'transform' que não estão no seu código (ex.:
+    o ano do BRFSS), para invalidarem a cache Parquet quando mudam.
+    """
+    start = time.perf_counter()
+    columns_map = _mapped_columns(cur, table, columns_map)
+
+    destination = table
+    staging = None
+    if conflict:
+        staging = destination = _create_staging(cur, table, columns_map.values())
+
+    rows_read, columns = _copy_chunks(
+        cur,
+        csv_path,
+        table,
+        destination,
+        columns_map,
+        dtypes,
+        transform,
+        cache_version,
+        chunksize,
+    )
+
+    rows_inserted = rows_read
+    if staging and columns:
+        cols = ", ".join(columns)
+        cur.execute(
+            f"INSERT INTO {table} ({cols}) SELECT {cols} FROM {staging} "
+            f"ON CONFLICT ({', '.join(conflict)}) DO NOTHING"
+        )
+        rows_inserted = cur.rowcount
+        cur.execute(f"DROP TABLE {staging}")
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "rows_read": rows_read,
+        "rows_inserted": rows_inserted,
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(rows_read / elapsed) if elapsed else rows_read,
+    }
+    print(
+        f"{table}: {rows_read} linhas lidas, {rows_inserted} inseridas em {elapsed:.1f}s "
+        f"({stats['rows_per_second']:,} linhas/s)"
+    )
+    return stats
+
+
+def row_hash_sql(columns, alias: str) -> str:
+    """
+    md5 do registo ROW(...)::text: NULL e '' ficam distintos, ao contrário de
+    concat_ws. Usado tanto para a chave natural (row_key) como para o conteúdo (row_hash).
+    """
+    return "md5(ROW(" + ", ".join(f"{alias}.{col}" for col in columns) + ")::text)"
+
+
+def _has_index(cur, table: str, index: str) -> bool:
+    cur.execute(
+        "SELECT 1 FROM pg_indexes WHERE schemaname = current_schema() "
+        "AND tablename = %s AND indexname = %s",
+        (table, index),
+    )
+    return cur.fetchone() is not None
+
+
+def ensure_row_hashes(cur, table: str, key, columns):
+    """
+    Prepara 'table' para upsert_csv: colunas row_key/row_hash, preenchidas nas linhas
+    antigas, duplicados da chave removidos e índice único em row_key.
+    Só consulta o catálogo quando a tabela já está preparada. Caso contrário migra e faz
+    commit logo, numa transação curta: o ALTER TABLE (ACCESS EXCLUSIVE) não pode ficar
+    a bloquear as leituras do sql_query durante toda a carga.
+    """
+    if {"row_key", "row_hash"} <= table_columns(cur, table) and _has_index(
+        cur, table, f"{table}_row_key"
+    ):
+        return
+
+    values = [col for col in columns if col not in key]
+    cur.execute(
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS row_key TEXT, "
+        f"ADD COLUMN IF NOT EXISTS row_hash TEXT"
+    )
+    cur.execute(
+        f"UPDATE {table} t SET row_key = {row_hash_sql(key, 't')}, "
+        f"row_hash = {row_hash_sql(values, 't')} WHERE row_key IS NULL"
+    )
+    if cur.rowcount:
+        print(f"{table}: row_key/row_hash calculados para {cur.rowcount} linhas existentes")
+        cur.execute(
+            f"DELETE FROM {table} a USING {table} b WHERE a.row_key = b.row_key AND a.ctid > b.ctid"
+        )
+        if cur.rowcount:
+            print(f"{table}: {cur.rowcount} linhas duplicadas (mesma chave) removidas")
+    cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_row_key ON {table} (row_key)")
+    cur.connection.commit()
+
+
+def upsert_csv(
+    cur,
+    csv_path,
+    table: str,
+    columns_map: dict,
+    key: tuple,
+    dtypes: dict | None = None,
+    transform=None,
+    delete_missing: bool = False,
+    cache_version: tuple = (),
+    chunksize: int = CHUNK_SIZE,
+) -> dict:
+    """
+    Carga incremental: compara o hash do conteúdo de cada linha (row_hash) com o da
+    linha com a mesma chave natural (row_key = hash de 'key') e só escreve o delta:
+    insere as chaves novas, atualiza as linhas alteradas e, com 'delete_missing',
+    apaga as que desapareceram da origem. O chamador faz commit (a migração de
+    ensure_row_hashes, se for precisa, é confirmada antes, à parte).
+    """
+    start = time.perf_counter()
+    columns_map = _mapped_columns(cur, table, columns_map)
+    columns = list(dict.fromkeys(columns_map.values()))
+    values = [col for col in columns if col not in key]
+    ensure_row_hashes(cur, table, key, columns)
+
+    staging = _create_staging(cur, table, columns)
+    rows_read, _ = _copy_chunks(
+        cur, csv_path, table, staging, columns_map, dtypes, transform, cache_version, chunksize
+    )
+
+    # Uma linha por chave (a última do ficheiro ganha) com os respetivos hashes
+    delta = f"{staging}_delta"
+    cur.execute(
+        f"""
+        CREATE TEMP TABLE {delta} ON COMMIT DROP AS
+        SELECT DISTINCT ON (row_key) *
+        FROM (
+            SELECT s.*, {row_hash_sql(key, "s")} AS row_key,
+                   {row_hash_sql(values, "s")} AS row_hash, s.ctid AS source_pos
+            FROM {staging} s
+        ) h
+        ORDER BY row_key, source_pos DESC
+        """
+    )
+    cur.execute(f"CREATE INDEX ON {delta} (row_key)")
+    cur.execute(f"ANALYZE {delta}")
+    cur.execute(f"SELECT count(*) FROM {delta}")
+    distinct_keys = cur.fetchone()[0]
+
+    cols = ", ".join(columns)
+    assignments = ", ".join(f"{col} = d.{col}" for col in values + ["row_hash"])
+    cur.execute(
+        f"UPDATE {table} t SET {assignments} FROM {delta} d "
+        f"WHERE t.row_key = d.row_key AND t.row_hash IS DISTINCT FROM d.row_hash"
+    )
+    updated = cur.rowcount
+    cur.execute(
+        f"INSERT INTO {table} ({cols}, row_key, row_hash) "
+        f"SELECT {cols}, row_key, row_hash FROM {delta} d "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE t.row_key = d.row_key)"
+    )
+    inserted = cur.rowcount
+    deleted = 0
+    if delete_missing:
+        cur.execute(
+            f"DELETE FROM {table} t "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {delta} d WHERE d.row_key = t.row_key)"
+        )
+        deleted = cur.rowcount
+    cur.execute(f"DROP TABLE {delta}, {staging}")
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "rows_read": rows_read,
+        "rows_inserted": inserted,
+        "rows_updated": updated,
+        "rows_unchanged": distinct_keys - inserted - updated,
+        "rows_deleted": deleted,
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(rows_read / elapsed) if elapsed else rows_read,
+    }
+    print(
+        f"{table}: {rows_read} linhas lidas, {inserted} inseridas, {updated} atualizadas, "
+        f"{stats['rows_unchanged']} sem alterações, {deleted} apagadas em {elapsed:.1f}s "
+        f"({stats['rows_per_second']:,} linhas/s)"
+    )
+    return stats
+
+
+def rows_changed(stats: dict) -> int:
+    return sum(stats.get(k, 0) for k in ("rows_inserted", "rows_updated", "rows_deleted"))
@@ -64,3 +64,55 @@ def get_db_connection():
         user=os.getenv("SQL_USER"),
         password=os.getenv("SQL_PASSWORD"),
     )
+
+
+def bump_table_versions(cur, tables):
+    """
+    Incrementa a versão das tabelas escritas por uma ingestão (na mesma transação),
+    para que as caches do sql_query que dependem delas sejam invalidadas.
+    """
+    for table in tables:
+        cur.execute(
+            """
+            INSERT INTO table_versions (table_name, version) VALUES (%s, 1)
+            ON CONFLICT (table_name)
+            DO UPDATE SET version = table_versions.version + 1, updated_at = now()
+            """,
+            (table,),
+        )
+
+
+# Vistas materializadas (database/materialized_views.sql) que dependem de cada tabela
+MATERIALIZED_VIEWS = {
+    "global_health_stats": ["mv_global_health_country_year"],
+    "brfss_responses": ["mv_brfss_state_rates"],
+    "immunization_fact": ["mv_immunization_coverage", "mv_immunization_global_year"],
+    "country_dim": ["mv_immunization_coverage"],
+    "vaccine_dim": ["mv_immunization_coverage", "mv_immunization_global_year"],
+}
+
+
+def refresh_materialized_views(cur, tables):
+    """
+    Refresca as vistas materializadas que dependem das tabelas ingeridas e incrementa
+    a sua versão em table_versions. Vistas que ainda não existam (base de dados criada
+    antes de materialized_views.sql) são ignoradas com um aviso.
+    """
+    views = []
+    for table in tables:
+        views += [v for v in MATERIALIZED_VIEWS.get(table, []) if v not in views]
+    if not views:
+        return
+
+    cur.execute("SELECT matviewname FROM pg_matviews WHERE matviewname = ANY(%s)", (views,))
+    existing = {row[0] for row in cur.fetchall()}
+
+    for view in views:
+        if view not in existing:
+            print(f"Aviso: vista materializada {view} não existe; a ignorar refresh.")
+            continue
+        # CONCURRENTLY não bloqueia as leituras do sql_query durante o refresh
+        cur.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}")
+        print(f"Vista {view} refrescada.")
+
+    bump_table_versions(cur, [v for v in views if v in existing])
@@ -0,0 +1,171 @@
+"""
+Camada HTTP partilhada pelos fetchers externos (GHO, MedlinePlus, PMC, PDFs).
+Usa uma requests.Session com pool de ligações keep-alive e guarda as respostas
+em disco, chaveadas pelo URL e parâmetros. Revalida com ETag/Last-Modified
+(pedidos condicionais) e tem um modo offline que só reproduz a cache.
+
+Modos (HTTP_CACHE_MODE):
+  - "revalidate" (omissão): usa a cache com pedidos condicionais; 304 reutiliza o corpo
+  - "offline": nunca vai à rede; falha se o pedido não estiver em cache
+  - "off": sem cache, apenas a sessão partilhada
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+HTTP_CACHE_DIR = os.getenv(
+    "HTTP_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", "..", ".http_cache")
+)
+HTTP_CACHE_MODE = os.getenv("HTTP_CACHE_MODE", "revalidate")
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "0"))  # segundos sem revalidar
+POOL_SIZE = 16
+USER_AGENT = "Mozilla/5.0 (compatible; DrHouseGPT-crawler)"
+
+_CACHED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+def cache_key(url: str, params: dict | None = None) -> str:
+    query = urlencode(sorted((params or {}).items()), doseq=True)
+    return hashlib.sha256(f"{url}?{query}".encode("utf-8")).hexdigest()
+
+
+def _build_response(meta: dict, body: bytes) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = meta["status"]
+    resp._content = body
+    resp.headers = CaseInsensitiveDict(meta["headers"])
+    resp.url = meta["url"]
+    resp.encoding = requests.utils.get_encoding_from_headers(resp.headers)
+    resp.from_cache = True
+    return resp
+
+
+class CachedSession:
+    """Sessão HTTP com pool de ligações e cache em disco com revalidação condicional."""
+
+    def __init__(
+        self,
+        cache_dir: str = HTTP_CACHE_DIR,
+        mode: str = HTTP_CACHE_MODE,
+        max_age: int = HTTP_CACHE_MAX_AGE,
+        pool_size: int = POOL_SIZE,
+    ):
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.max_age = max_age
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        if mode != "off":
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, key: str) -> tuple[str, str]:
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return f"{base}.json", f"{base}.body"
+
+    def _load(self, key: str) -> tuple[dict, bytes] | None:
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                return meta, f.read()
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _store(self, key: str, meta: dict, body: bytes | None = None):
+        meta_path, body_path = self._paths(key)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        # Escrita atómica: um crash nunca deixa uma entrada meio escrita
+        if body is not None:
+            tmp = f"{body_path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(body)
+            os.replace(tmp, body_path)
+        tmp = f"{meta_path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+
+    def get(self, url: str, params: dict | None = None, headers: dict | None = None, **kwargs):
+        """GET com cache. Aceita os mesmos argumentos que requests.get (timeout, ...)."""
+        kwargs.setdefault("timeout", 30)
+
+        if self.mode == "off":
+            return self.session.get(url, params=params, headers=headers, **kwargs)
+
+        key = cache_key(url, params)
+        cached = self._load(key)
+
+        if self.mode == "offline":
+            if cached is None:
+                raise requests.ConnectionError(f"Modo offline: '{url}' não está em cache.")
+            return _build_response(*cached)
+
+        headers = dict(headers or {})
+        if cached is not None:
+            meta, _ = cached
+            if time.time() - meta["fetched_at"] < self.max_age:
+                return _build_response(*cached)
+            if meta["headers"].get("ETag"):
+                headers["If-None-Match"] = meta["headers"]["ETag"]
+            if meta["headers"].get("Last-Modified"):
+                headers["If-Modified-Since"] = meta["headers"]["Last-Modified"]
+
+        try:
+            resp = self.session.get(url, params=params, headers=headers, **kwargs)
+        except requests.RequestException:
+            if cached is None:
+                raise
+            print(f"[WARN] Falha de rede para {url}; a usar a cópia em cache.")
+            return _build_response(*cached)
+
+        if resp.status_code == 304 and cached is not None:
+            meta, body = cached
+            meta["fetched_at"] = time.time()
+            self._store(key, meta)
+            return _build_response(meta, body)
+
+        if resp.status_code == 200:
+            meta = {
+                "url": resp.url,
+                "status": resp.status_code,
+                "headers": {h: resp.headers[h] for h in _CACHED_HEADERS if h in resp.headers},
+                "fetched_at": time.time(),
+            }
+            self._store(key, meta, resp.content)
+
+        resp.from_cache = False
+        return resp
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> CachedSession:
+    """Devolve a sessão partilhada do processo (criada na primeira utilização)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = CachedSession()
+        return _session
+
+
+def http_get(url: str, params: dict | None = None, **kwargs) -> requests.Response:
+    """Atalho para get_session().get(...), compatível com requests.get."""
+    return get_session().get(url, params=params, **kwargs)
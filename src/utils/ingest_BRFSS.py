@@ -1,21 +1,69 @@
 import os
+import re
 
-import numpy as np
-import pandas as pd
-from db_connection import get_db_connection
+from copy_loader import copy_csv
+from db_connection import bump_table_versions, get_db_connection, refresh_materialized_views
 from dotenv import load_dotenv
-from psycopg2.extras import execute_values
 
 load_dotenv()
 
 
-def ingest_brfss(csv_path):
+def survey_year_from_path(csv_path) -> int | None:
+    """Ano do inquérito a partir do nome do ficheiro (ex.: BRFSS2023.csv -> 2023)."""
+    match = re.search(r"(?:19|20)\d{2}", os.path.basename(str(csv_path)))
+    return int(match.group()) if match else None
+
+
+def ensure_survey_year(cur):
+    """
+    Schemas anteriores não tinham survey_year e a chave era só sequence_no (que se
+    repete entre anos). Consulta o catálogo e só altera a tabela se faltar algo; nesse
+    caso faz commit logo, antes da carga, para o lock ACCESS EXCLUSIVE do ALTER TABLE
+    não bloquear as leituras durante o COPY. No layout particionado não faz nada.
+    """
+    cur.execute(
+        "SELECT "
+        "EXISTS (SELECT 1 FROM information_schema.columns WHERE table_schema = current_schema() "
+        "AND table_name = 'brfss_responses' AND column_name = 'survey_year'), "
+        "EXISTS (SELECT 1 FROM pg_constraint "
+        "WHERE conname = 'brfss_responses_sequence_no_key' "
+        "AND conrelid = 'brfss_responses'::regclass), "
+        "to_regclass('brfss_responses_year_seq') IS NOT NULL"
+    )
+    has_year, has_old_key, has_year_key = cur.fetchone()
+    if has_year and not has_old_key and has_year_key:
+        return
+
+    if not has_year:
+        cur.execute("ALTER TABLE brfss_responses ADD COLUMN survey_year INT")
+        cur.execute("SELECT EXISTS (SELECT 1 FROM brfss_responses)")
+        if cur.fetchone()[0]:
+            print(
+                "Aviso: há linhas BRFSS sem survey_year (schema antigo); preencher com "
+                "UPDATE brfss_responses SET survey_year = <ano> WHERE survey_year IS NULL "
+                "ou migrar com database/partitioned_layout.sql"
+            )
+    if has_old_key:
+        cur.execute("ALTER TABLE brfss_responses DROP CONSTRAINT brfss_responses_sequence_no_key")
+    if not has_year_key:
+        cur.execute(
+            "CREATE UNIQUE INDEX brfss_responses_year_seq "
+            "ON brfss_responses (survey_year, sequence_no)"
+        )
+    cur.connection.commit()
+
+
+def ingest_brfss(csv_path, survey_year=None):
     if not os.path.exists(csv_path):
         print(f"Erro: O ficheiro {csv_path} não foi encontrado.")
         return
 
-    print("A carregar dataset BRFSS... (isto pode demorar dependendo do tamanho)")
-    df = pd.read_csv(csv_path, low_memory=False)
+    survey_year = survey_year or survey_year_from_path(csv_path)
+    if survey_year is None:
+        print(f"Erro: ano do inquérito desconhecido para {csv_path} (indicar survey_year).")
+        return
+
+    print("A carregar dataset BRFSS em chunks (apenas as colunas mapeadas)...")
 
     cols_map = {
         "_state": "state_code",
@@ -49,41 +97,43 @@ def ingest_brfss(csv_path):
         "wtkg3": "weight_kg",
         "htm4": "height_cm",
         "_bmi5": "bmi",
+        # Não vem do CSV: preenchida pelo transform com o ano do ficheiro
+        "survey_year": "survey_year",
     }
 
-    available_cols = [c for c in cols_map.keys() if c in df.columns]
-    df_final = df[available_cols].rename(columns=cols_map)
-    print(f"Campos mapeados: {len(df_final.columns)} de {len(cols_map)}")
-
-    # Limpeza e Transformação
-    if "bmi" in df_final.columns:
-        df_final["bmi"] = pd.to_numeric(df_final["bmi"], errors="coerce") / 100
-    if "weight_kg" in df_final.columns:
-        df_final["weight_kg"] = pd.to_numeric(df_final["weight_kg"], errors="coerce") / 100
-
-    for col in df_final.columns:
-        if col not in ["bmi", "weight_kg"]:
-            df_final[col] = pd.to_numeric(df_final[col], errors="coerce")
+    # Todas as colunas do BRFSS são códigos numéricos inteiros, exceto as biométricas
+    dtypes = {col: "int" for col in cols_map.values()}
+    dtypes.update(bmi="float", weight_kg="float")
 
-    df_final = df_final.replace({np.nan: None})
+    def transform(chunk):
+        # _BMI5 e WTKG3 vêm com duas casas decimais implícitas
+        for col in ("bmi", "weight_kg"):
+            if col in chunk.columns:
+                chunk[col] = chunk[col] / 100
+        chunk["survey_year"] = survey_year
+        return chunk
 
     # Inserção
     conn = get_db_connection()
     cur = conn.cursor()
 
-    columns = list(df_final.columns)
-    insert_query = f"""
-        INSERT INTO brfss_responses ({", ".join(columns)})
-        VALUES %s
-        ON CONFLICT (sequence_no) DO NOTHING
-    """
-
-    data_tuples = [tuple(x) for x in df_final.to_numpy()]
-
     try:
-        execute_values(cur, insert_query, data_tuples)
+        ensure_survey_year(cur)
+        stats = copy_csv(
+            cur,
+            csv_path,
+            "brfss_responses",
+            cols_map,
+            dtypes=dtypes,
+            conflict=("survey_year", "sequence_no"),
+            transform=transform,
+            cache_version=(survey_year,),
+        )
+        bump_table_versions(cur, ["brfss_responses"])
+        refresh_materialized_views(cur, ["brfss_responses"])
         conn.commit()
-        print(f"Sucesso! {len(df_final)} registos processados na tabela brfss_responses.")
+        print("Sucesso! Tabela brfss_responses atualizada.")
+        return stats
     except Exception as e:
         conn.rollback()
         print(f"Erro na ingestão: {e}")
@@ -96,4 +146,4 @@ if __name__ == "__main__":
     import sys
 
     path = sys.argv[1] if len(sys.argv) > 1 else "BRFSS2023.csv"
-    ingest_brfss(path)
+    ingest_brfss(path, int(sys.argv[2]) if len(sys.argv) > 2 else None)
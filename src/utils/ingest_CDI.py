@@ -1,17 +1,26 @@
-import numpy as np
-import pandas as pd
-from db_connection import get_db_connection
+from copy_loader import rows_changed, upsert_csv
+from db_connection import bump_table_versions, get_db_connection
 from dotenv import load_dotenv
-from psycopg2.extras import execute_values
 
 load_dotenv()
 
+# A tabela não tem chave: um indicador é identificado por período, local, pergunta,
+# resposta, tipo de valor e estratificação
+NATURAL_KEY = (
+    "year_start",
+    "year_end",
+    "location_id",
+    "datasource",
+    "question_id",
+    "response",
+    "data_value_type",
+    "stratification_category_1",
+    "stratification_id_1",
+)
 
-def ingest_cdi(csv_path):
-    # 1. Carregar dados
-    df = pd.read_csv(csv_path)
 
-    # 2. Selecionar e renomear colunas para corresponder ao SQL
+def ingest_cdi(csv_path, delete_missing=False):
+    # 1. Colunas a ler do CSV e nomes correspondentes no SQL
     cols_to_keep = {
         "YearStart": "year_start",
         "YearEnd": "year_end",
@@ -35,28 +44,34 @@ def ingest_cdi(csv_path):
         "StratificationID1": "stratification_id_1",
     }
 
-    df = df[cols_to_keep.keys()].rename(columns=cols_to_keep)
-
-    # 3. Limpeza: Converter colunas numéricas e tratar erros (como o '~')
-    numeric_cols = ["data_value", "low_confidence_limit", "high_confidence_limit"]
-    for col in numeric_cols:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
-
-    # Substituir NaNs por None para o PostgreSQL aceitar como NULL
-    df = df.replace({np.nan: None})
+    # 2. Tipos: colunas numéricas com erros (como o '~') passam a NULL
+    dtypes = {
+        "year_start": "int",
+        "year_end": "int",
+        "data_value": "float",
+        "low_confidence_limit": "float",
+        "high_confidence_limit": "float",
+    }
 
-    # 4. Inserção
+    # 3. Carga incremental pela chave natural (só o delta é escrito)
     conn = get_db_connection()
     cur = conn.cursor()
 
-    columns = list(df.columns)
-    query = f"INSERT INTO chronic_disease_indicators ({','.join(columns)}) VALUES %s"
-    values = [tuple(x) for x in df.to_numpy()]
-
     try:
-        execute_values(cur, query, values)
+        stats = upsert_csv(
+            cur,
+            csv_path,
+            "chronic_disease_indicators",
+            cols_to_keep,
+            key=NATURAL_KEY,
+            dtypes=dtypes,
+            delete_missing=delete_missing,
+        )
+        if rows_changed(stats):
+            bump_table_versions(cur, ["chronic_disease_indicators"])
         conn.commit()
-        print(f"Sucesso: {len(df)} indicadores CDI ingeridos.")
+        print("Sucesso: indicadores CDI ingeridos.")
+        return stats
     except Exception as e:
         conn.rollback()
         print(f"Erro na ingestão CDI: {e}")
@@ -66,4 +81,8 @@ def ingest_cdi(csv_path):
 
 
 if __name__ == "__main__":
-    ingest_cdi("/Users/matildefernandes/Desktop/PEC/U.S._Chronic_Disease_Indicators.csv")
+    import sys
+
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    path = args[0] if args else "U.S._Chronic_Disease_Indicators.csv"
+    ingest_cdi(path, delete_missing="--delete-missing" in sys.argv)
@@ -1,21 +1,18 @@
 import os
 
-import numpy as np
-import pandas as pd
-from db_connection import get_db_connection
+from copy_loader import rows_changed, upsert_csv
+from db_connection import bump_table_versions, get_db_connection
 from dotenv import load_dotenv
-from psycopg2.extras import execute_values
 
 load_dotenv()
 
 
-def ingest_drugs(csv_path):
+def ingest_drugs(csv_path, delete_missing=False):
     if not os.path.exists(csv_path):
         print(f"Erro: O ficheiro {csv_path} não foi encontrado.")
         return
 
     print("A carregar dataset Drugs & Side Effects...")
-    df = pd.read_csv(csv_path)
 
     cols_map = {
         "drug_name": "drug_name",
@@ -37,36 +34,28 @@ def ingest_drugs(csv_path):
         "medical_condition_url": "medical_condition_url",
     }
 
-    # Filtrar apenas colunas que existem no CSV (protecção contra variações)
-    available = {k: v for k, v in cols_map.items() if k in df.columns}
-    df = df[list(available.keys())].rename(columns=available)
-    print(f"Campos mapeados: {len(df.columns)} de {len(cols_map)}")
-
-    # Limpeza
-    if "rating" in df.columns:
-        df["rating"] = pd.to_numeric(df["rating"], errors="coerce")
-    if "no_of_reviews" in df.columns:
-        df["no_of_reviews"] = pd.to_numeric(df["no_of_reviews"], errors="coerce").astype("Int64")
-
-    df = df.replace({np.nan: None})
+    # Limpeza: colunas numéricas (o resto fica como texto)
+    dtypes = {"rating": "float", "no_of_reviews": "int"}
 
     # Inserção
     conn = get_db_connection()
     cur = conn.cursor()
 
-    columns = list(df.columns)
-    insert_query = f"""
-        INSERT INTO drugs_side_effects ({", ".join(columns)})
-        VALUES %s
-        ON CONFLICT (drug_name, medical_condition) DO NOTHING
-    """
-
-    data_tuples = [tuple(x) for x in df.to_numpy()]
-
     try:
-        execute_values(cur, insert_query, data_tuples)
+        stats = upsert_csv(
+            cur,
+            csv_path,
+            "drugs_side_effects",
+            cols_map,
+            key=("drug_name", "medical_condition"),
+            dtypes=dtypes,
+            delete_missing=delete_missing,
+        )
+        if rows_changed(stats):
+            bump_table_versions(cur, ["drugs_side_effects"])
         conn.commit()
-        print(f"Sucesso! {len(df)} registos inseridos na tabela drugs_side_effects.")
+        print("Sucesso! Tabela drugs_side_effects atualizada.")
+        return stats
     except Exception as e:
         conn.rollback()
         print(f"Erro na ingestão: {e}")
@@ -78,5 +67,6 @@ def ingest_drugs(csv_path):
 if __name__ == "__main__":
     import sys
 
-    path = sys.argv[1] if len(sys.argv) > 1 else "drugs_side_effects.csv"
-    ingest_drugs(path)
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    path = args[0] if args else "drugs_side_effects.csv"
+    ingest_drugs(path, delete_missing="--delete-missing" in sys.argv)
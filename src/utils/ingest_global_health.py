@@ -1,25 +1,21 @@
 import os
 
-import pandas as pd
+from copy_loader import rows_changed, upsert_csv
 
 # Importas a tua utilidade de conexão que já existe
-from db_connection import get_db_connection
+from db_connection import bump_table_versions, get_db_connection, refresh_materialized_views
 from dotenv import load_dotenv
-from psycopg2.extras import execute_values
 
 # 1. Carregar o .env (podes manter o caminho relativo para ser mais flexível)
 load_dotenv()
 
 
-def ingest_global_stats(csv_path):
+def ingest_global_stats(csv_path, delete_missing=False):
     if not os.path.exists(csv_path):
         print(f"Erro: O ficheiro {csv_path} não foi encontrado.")
         return
 
-    # 2. Ler o CSV
-    df = pd.read_csv(csv_path)
-
-    # 3. Mapear as colunas do CSV para os nomes da tabela SQL
+    # 2. Mapear as colunas do CSV para os nomes da tabela SQL
     # Isto garante que os nomes com % ou espaços não quebrem a query
     columns_map = {
         "Country": "country",
@@ -46,27 +42,38 @@ def ingest_global_stats(csv_path):
         "Urbanization Rate (%)": "urbanization_rate_pct",
     }
 
-    df = df.rename(columns=columns_map)
+    dtypes = {
+        "year": "int",
+        "population_affected": "int",
+        "dalys": "int",
+        **{
+            col: "float"
+            for col in columns_map.values()
+            if col.endswith(("_rate", "_pct", "_per_1000", "_usd")) or col == "education_index"
+        },
+    }
 
-    # 4. Conectar e Inserir
+    # 3. Conectar e carregar em chunks com COPY; só as linhas novas ou alteradas
+    # (row_hash diferente) são escritas, por isso correr o script 2 vezes não duplica
     conn = get_db_connection()
     cur = conn.cursor()
 
-    # Prepara a query com ON CONFLICT para evitar erros se correrem o script 2 vezes
-    cols = ", ".join(df.columns)
-    insert_query = f"""
-        INSERT INTO global_health_stats ({cols}) 
-        VALUES %s 
-        ON CONFLICT (country, year, disease_name, age_group, gender) DO NOTHING
-    """
-
-    # Converte o DataFrame para uma lista de tuplos para uma inserção rápida
-    data_tuples = [tuple(x) for x in df.to_numpy()]
-
     try:
-        execute_values(cur, insert_query, data_tuples)
+        stats = upsert_csv(
+            cur,
+            csv_path,
+            "global_health_stats",
+            columns_map,
+            key=("country", "year", "disease_name", "age_group", "gender"),
+            dtypes=dtypes,
+            delete_missing=delete_missing,
+        )
+        if rows_changed(stats):
+            bump_table_versions(cur, ["global_health_stats"])
+            refresh_materialized_views(cur, ["global_health_stats"])
         conn.commit()
-        print(f"Sucesso: {len(df)} registos inseridos na tabela global_health_stats.")
+        print("Sucesso: tabela global_health_stats atualizada.")
+        return stats
     except Exception as e:
         conn.rollback()
         print(f"Erro durante a ingestão: {e}")
@@ -76,6 +83,8 @@ def ingest_global_stats(csv_path):
 
 
 if __name__ == "__main__":
-    # Caminho correto do CSV
-    csv_path = "/Users/matildefernandes/Desktop/PEC/Global Health Statistics.csv"
-    ingest_global_stats(csv_path)
+    import sys
+
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    csv_path = args[0] if args else "Global Health Statistics.csv"
+    ingest_global_stats(csv_path, delete_missing="--delete-missing" in sys.argv)
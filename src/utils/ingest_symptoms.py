@@ -1,89 +1,165 @@
+import os
+import time
+
 import pandas as pd
-from db_connection import get_db_connection  # Uses your existing utility
+from copy_loader import copy_chunk
+from db_connection import bump_table_versions, get_db_connection  # Uses your existing utility
 from dotenv import load_dotenv
+from parquet_cache import cached_frames, code_version
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+
+SYMPTOM_COLUMNS = [f"Symptom_{i}" for i in range(1, 18)]
+PRECAUTION_COLUMNS = [f"Precaution_{i}" for i in range(1, 5)]
+
+
+def _symptom_name(series):
+    return series.str.strip().str.replace("_", " ")
+
+
+def _unpivot(df, columns, value_name):
+    """Colunas 'wide' (Symptom_1..17, Precaution_1..4) -> pares (disease, valor) únicos."""
+    long = df.melt(id_vars="Disease", value_vars=columns, value_name=value_name)
+    long = long.dropna(subset=[value_name])
+    long["disease"] = long["Disease"].str.strip()
+    long[value_name] = long[value_name].str.strip()
+    return long[["disease", value_name]].drop_duplicates()
+
+
+SOURCE_FILES = [
+    "symptom_Description.csv",
+    "symptom_precaution.csv",
+    "Symptom-severity.csv",
+    "dataset.csv",
+]
+
+
+def prepare_frames(data_dir=".") -> dict:
+    """Lê os CSVs e prepara tudo em pandas (sem round trips por linha)."""
+    df_desc, df_prec, df_sev, df_mapping = (
+        pd.read_csv(os.path.join(data_dir, file)) for file in SOURCE_FILES
+    )
+
+    diseases = pd.DataFrame(
+        {"name": df_desc["Disease"].str.strip(), "description": df_desc["Description"]}
+    ).drop_duplicates(subset="name")
+
+    symptoms = pd.DataFrame(
+        {"name": _symptom_name(df_sev["Symptom"]), "severity_weight": df_sev["weight"]}
+    ).drop_duplicates(subset="name")
 
-# Carregar variÃ¡veis de ambiente
-load_dotenv("/Users/matildefernandes/Desktop/PEC/ProjetoEC/.env")
+    mapping = _unpivot(df_mapping, SYMPTOM_COLUMNS, "symptom")
+    mapping["symptom"] = _symptom_name(mapping["symptom"])
+    mapping = mapping.drop_duplicates()
 
+    precautions = _unpivot(df_prec, PRECAUTION_COLUMNS, "precaution")
+    return {
+        "diseases": diseases,
+        "symptoms": symptoms,
+        "mapping": mapping,
+        "precautions": precautions,
+    }
+
+
+def ingest_data(data_dir="."):
+    start = time.perf_counter()
+
+    # 1. DataFrames preparados (da cache Parquet se os CSVs e o código não mudaram)
+    frames = cached_frames(
+        "symptoms",
+        [os.path.join(data_dir, file) for file in SOURCE_FILES],
+        code_version(prepare_frames, _unpivot, _symptom_name, SYMPTOM_COLUMNS, PRECAUTION_COLUMNS),
+        lambda: prepare_frames(data_dir),
+    )
+    diseases, symptoms = frames["diseases"], frames["symptoms"]
+    mapping, precautions = frames["mapping"], frames["precautions"]
 
-def ingest_data():
     conn = get_db_connection()
     cur = conn.cursor()
 
-    # 1. Load CSVs
-    df_desc = pd.read_csv("symptom_Description.csv")
-    df_prec = pd.read_csv("symptom_precaution.csv")
-    df_sev = pd.read_csv("Symptom-severity.csv")
-    df_mapping = pd.read_csv("dataset.csv")
-
-    # 2. Ingest Diseases and Descriptions
-    for _, row in df_desc.iterrows():
+    try:
+        # 2. Staging temporário + COPY
         cur.execute(
-            (
-                "INSERT INTO diseases (name, description) "
-                "VALUES (%s, %s) "
-                "ON CONFLICT (name) DO NOTHING"
-            ),
-            (row["Disease"].strip(), row["Description"]),
+            """
+            CREATE TEMP TABLE stg_diseases (name TEXT, description TEXT) ON COMMIT DROP;
+            CREATE TEMP TABLE stg_symptoms (name TEXT, severity_weight INT) ON COMMIT DROP;
+            CREATE TEMP TABLE stg_disease_symptoms (disease TEXT, symptom TEXT) ON COMMIT DROP;
+            CREATE TEMP TABLE stg_precautions (disease TEXT, precaution TEXT) ON COMMIT DROP;
+            """
         )
+        copy_chunk(cur, "stg_diseases", diseases)
+        copy_chunk(cur, "stg_symptoms", symptoms)
+        copy_chunk(cur, "stg_disease_symptoms", mapping)
+        copy_chunk(cur, "stg_precautions", precautions)
 
-    # 3. Ingest Symptoms and Severities
-    for _, row in df_sev.iterrows():
+        # 3. Inserções set-based; IDs resolvidos por JOIN e re-execuções idempotentes
         cur.execute(
-            (
-                "INSERT INTO symptoms (name, severity_weight)"
-                " VALUES (%s, %s) "
-                "ON CONFLICT (name) DO NOTHING",
-            ),
-            (row["Symptom"].strip().replace("_", " "), row["weight"]),
+            """
+            INSERT INTO diseases (name, description)
+            SELECT name, description FROM stg_diseases
+            ON CONFLICT (name) DO NOTHING
+            """
         )
+        cur.execute(
+            """
+            INSERT INTO symptoms (name, severity_weight)
+            SELECT name, severity_weight FROM stg_symptoms
+            ON CONFLICT (name) DO NOTHING
+            """
+        )
+        cur.execute(
+            """
+            INSERT INTO disease_symptoms (disease_id, symptom_id)
+            SELECT d.disease_id, s.symptom_id
+            FROM stg_disease_symptoms m
+            JOIN diseases d ON d.name = m.disease
+            JOIN symptoms s ON s.name = m.symptom
+            ON CONFLICT DO NOTHING
+            """
+        )
+        mapped = cur.rowcount
+        # disease_precautions não tem chave única: anti-join para não duplicar
+        cur.execute(
+            """
+            INSERT INTO disease_precautions (disease_id, precaution)
+            SELECT DISTINCT d.disease_id, p.precaution
+            FROM stg_precautions p
+            JOIN diseases d ON d.name = p.disease
+            WHERE NOT EXISTS (
+                SELECT 1 FROM disease_precautions e
+                WHERE e.disease_id = d.disease_id AND e.precaution = p.precaution
+            )
+            """
+        )
+        new_precautions = cur.rowcount
 
-    # 4. Ingest Disease-Symptom Mappings
-    # We unpivot the 17 symptom columns into a clean list
-    for _, row in df_mapping.iterrows():
-        disease_name = row["Disease"].strip()
-        # Get disease_id
-        cur.execute("SELECT disease_id FROM diseases WHERE name = %s", (disease_name,))
-        res = cur.fetchone()
-        if res:
-            disease_id = res[0]
-            # Loop through symptom columns (Symptom_1 to Symptom_17)
-            for i in range(1, 18):
-                s_name = row[f"Symptom_{i}"]
-                if pd.notna(s_name):
-                    s_name = s_name.strip().replace("_", " ")
-                    # Ensure symptom exists and get ID
-                    cur.execute("SELECT symptom_id FROM symptoms WHERE name = %s", (s_name,))
-                    s_res = cur.fetchone()
-                    if s_res:
-                        cur.execute(
-                            (
-                                "INSERT INTO disease_symptoms (disease_id, symptom_id) "
-                                "VALUES (%s, %s) "
-                                "ON CONFLICT DO NOTHING"
-                            ),
-                            (disease_id, s_res[0]),
-                        )
-
-    # 5. Ingest Precautions
-    for _, row in df_prec.iterrows():
-        cur.execute("SELECT disease_id FROM diseases WHERE name = %s", (row["Disease"].strip(),))
-        res = cur.fetchone()
-        if res:
-            d_id = res[0]
-            for i in range(1, 5):
-                prec = row[f"Precaution_{i}"]
-                if pd.notna(prec):
-                    cur.execute(
-                        "INSERT INTO disease_precautions (disease_id, precaution) VALUES (%s, %s)",
-                        (d_id, prec),
-                    )
-
-    conn.commit()
-    cur.close()
-    conn.close()
-    print("Ingestion completed successfully!")
+        bump_table_versions(
+            cur, ["diseases", "symptoms", "disease_symptoms", "disease_precautions"]
+        )
+        conn.commit()
+        print(
+            f"Ingestion completed successfully in {time.perf_counter() - start:.1f}s: "
+            f"{len(diseases)} diseases, {len(symptoms)} symptoms, "
+            f"{mapped} new mappings, {new_precautions} new precautions."
+        )
+        return {
+            "rows_read": sum(len(df) for df in frames.values()),
+            "diseases": len(diseases),
+            "symptoms": len(symptoms),
+            "new_mappings": mapped,
+            "new_precautions": new_precautions,
+        }
+    except Exception as e:
+        conn.rollback()
+        print(f"Erro na ingestão: {e}")
+    finally:
+        cur.close()
+        conn.close()
 
 
 if __name__ == "__main__":
-    ingest_data()
+    import sys
+
+    ingest_data(sys.argv[1] if len(sys.argv) > 1 else ".")
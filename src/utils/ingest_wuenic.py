@@ -1,6 +1,40 @@
+import time
+
+import numpy as np
 import pandas as pd
-from db_connection import get_db_connection
-from sqlalchemy import text
+from copy_loader import convert_types, copy_chunk
+from db_connection import bump_table_versions, get_db_connection, refresh_materialized_views
+from dotenv import load_dotenv
+from parquet_cache import cached_frames, code_version
+
+load_dotenv()
+
+# Coluna do Excel WUENIC -> coluna de immunization_fact
+FACT_COLUMNS = {
+    "Year": "year",
+    "WUENIC": "wuenic_coverage",
+    "AdministrativeCoverage": "administrative_coverage",
+    "ChildrenVaccinated": "children_vaccinated",
+    "ChildrenInTarget": "children_target",
+    "BirthsUNPD": "births_unpd",
+    "SurvivingInfantsUNPD": "surviving_infants",
+    "calculated_coverage": "calculated_coverage",
+    "anomaly_flag": "anomaly_flag",
+}
+
+FACT_DTYPES = {
+    "year": "int",
+    "children_vaccinated": "int",
+    "children_target": "int",
+    "births_unpd": "int",
+    "surviving_infants": "int",
+    "wuenic_coverage": "float",
+    "administrative_coverage": "float",
+    "calculated_coverage": "float",
+}
+
+# Limite exclusivo de NUMERIC(5,2)
+MAX_COVERAGE = 1000
 
 
 def clean_wuenic_data(df: pd.DataFrame) -> pd.DataFrame:
@@ -15,92 +49,131 @@ def clean_wuenic_data(df: pd.DataFrame) -> pd.DataFrame:
     df["Country"] = df["Country"].str.strip().str.upper()
     df["Vaccine"] = df["Vaccine"].str.strip().str.upper()
 
-    df["calculated_coverage"] = (df["ChildrenVaccinated"] / df["ChildrenInTarget"]) * 100
+    # População-alvo a 0 daria infinito, que não cabe em NUMERIC(5,2)
+    coverage = ((df["ChildrenVaccinated"] / df["ChildrenInTarget"]) * 100).replace(
+        [np.inf, -np.inf], np.nan
+    )
 
-    df["anomaly_flag"] = abs(df["calculated_coverage"] - df["WUENIC"]) > 5
+    # A anomalia vê o rácio real; fora do intervalo da coluna fica NULL (senão o COPY falha)
+    df["anomaly_flag"] = abs(coverage - df["WUENIC"]) > 5
+    coverage = coverage.round(2)
+    df["calculated_coverage"] = coverage.where(coverage.abs() < MAX_COVERAGE)
 
     df = df.drop_duplicates(subset=["Country", "Vaccine", "Year"])
 
     return df
 
 
+def _id_map(cur, table: str, key: str, columns: list[str]) -> pd.DataFrame:
+    """Mapa chave natural -> id surrogate de uma dimensão, lido uma única vez."""
+    cur.execute(f"SELECT {key}, id FROM {table}")
+    return pd.DataFrame(cur.fetchall(), columns=columns)
+
+
+def load_clean_wuenic(filepath: str) -> pd.DataFrame:
+    """Excel limpo, só com as colunas usadas; da cache Parquet se nada mudou."""
+
+    def build():
+        df = clean_wuenic_data(pd.read_excel(filepath, sheet_name="wuenic_master"))
+        return {
+            "wuenic": df.reindex(columns=["ISOCountryCode", "Country", "Vaccine", *FACT_COLUMNS])
+        }
+
+    version = code_version(clean_wuenic_data, load_clean_wuenic, FACT_COLUMNS, MAX_COVERAGE)
+    return cached_frames("wuenic", [filepath], version, build)["wuenic"]
+
+
 def ingest_wuenic(filepath: str):
-    engine = get_db_connection()
-    df = pd.read_excel("data/wuenic_input.xlsx", sheet_name="wuenic_master")
-    df = clean_wuenic_data(df)
-
-    with engine.begin() as conn:
-        # Insert countries
-        countries = df[["ISOCountryCode", "Country"]].drop_duplicates()
-        for _, row in countries.iterrows():
-            conn.execute(
-                text("""
-                INSERT INTO country_dim (iso_code, country_name)
-                VALUES (:iso, :name)
-                ON CONFLICT (iso_code) DO NOTHING
-            """),
-                {"iso": row["ISOCountryCode"], "name": row["Country"]},
-            )
-
-        # Insert vaccines
-        vaccines = df[["Vaccine"]].drop_duplicates()
-        for _, row in vaccines.iterrows():
-            conn.execute(
-                text("""
-                INSERT INTO vaccine_dim (vaccine_code)
-                VALUES (:code)
-                ON CONFLICT (vaccine_code) DO NOTHING
-            """),
-                {"code": row["Vaccine"]},
-            )
-
-        # Insert fact records
-        for _, row in df.iterrows():
-            conn.execute(
-                text("""
-                INSERT INTO immunization_fact (
-                    country_id,
-                    vaccine_id,
-                    year,
-                    wuenic_coverage,
-                    administrative_coverage,
-                    children_vaccinated,
-                    children_target,
-                    births_unpd,
-                    surviving_infants,
-                    calculated_coverage,
-                    anomaly_flag
-                )
-                VALUES (
-                    (SELECT id FROM country_dim WHERE iso_code = :iso),
-                    (SELECT id FROM vaccine_dim WHERE vaccine_code = :vac),
-                    :year,
-                    :wuenic,
-                    :admin,
-                    :vaccinated,
-                    :target,
-                    :births,
-                    :surviving,
-                    :calc,
-                    :flag
-                )
-                ON CONFLICT DO NOTHING
-            """),
-                {
-                    "iso": row["ISOCountryCode"],
-                    "vac": row["Vaccine"],
-                    "year": int(row["Year"]),
-                    "wuenic": row.get("WUENIC"),
-                    "admin": row.get("AdministrativeCoverage"),
-                    "vaccinated": row.get("ChildrenVaccinated"),
-                    "target": row.get("ChildrenInTarget"),
-                    "births": row.get("BirthsUNPD"),
-                    "surviving": row.get("SurvivingInfantsUNPD"),
-                    "calc": row.get("calculated_coverage"),
-                    "flag": row.get("anomaly_flag"),
-                },
-            )
+    start = time.perf_counter()
+    df = load_clean_wuenic(filepath)
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute(
+            """
+            CREATE TEMP TABLE stg_country (iso_code TEXT, country_name TEXT) ON COMMIT DROP;
+            CREATE TEMP TABLE stg_vaccine (vaccine_code TEXT) ON COMMIT DROP;
+            """
+        )
+
+        # 1. Dimensões em bulk
+        countries = (
+            df[["ISOCountryCode", "Country"]]
+            .drop_duplicates(subset="ISOCountryCode")
+            .rename(columns={"ISOCountryCode": "iso_code", "Country": "country_name"})
+        )
+        vaccines = df[["Vaccine"]].drop_duplicates().rename(columns={"Vaccine": "vaccine_code"})
+        copy_chunk(cur, "stg_country", countries)
+        copy_chunk(cur, "stg_vaccine", vaccines)
+        cur.execute(
+            """
+            INSERT INTO country_dim (iso_code, country_name)
+            SELECT iso_code, country_name FROM stg_country
+            ON CONFLICT (iso_code) DO NOTHING
+            """
+        )
+        cur.execute(
+            """
+            INSERT INTO vaccine_dim (vaccine_code)
+            SELECT vaccine_code FROM stg_vaccine
+            ON CONFLICT (vaccine_code) DO NOTHING
+            """
+        )
+
+        # 2. Chaves surrogate por merge vetorizado (sem sub-selects por linha)
+        fact = df.merge(
+            _id_map(cur, "country_dim", "iso_code", ["ISOCountryCode", "country_id"]),
+            on="ISOCountryCode",
+        ).merge(
+            _id_map(cur, "vaccine_dim", "vaccine_code", ["Vaccine", "vaccine_id"]), on="Vaccine"
+        )
+        fact = fact.rename(columns=FACT_COLUMNS).reindex(
+            columns=["country_id", "vaccine_id", *FACT_COLUMNS.values()]
+        )
+        fact = convert_types(fact, FACT_DTYPES)
+
+        # 3. Factos: COPY para staging e upsert (estimativas revistas substituem as antigas)
+        cols = ", ".join(fact.columns)
+        updates = ", ".join(
+            f"{c} = EXCLUDED.{c}"
+            for c in fact.columns
+            if c not in ("country_id", "vaccine_id", "year")
+        )
+        cur.execute(
+            f"CREATE TEMP TABLE stg_immunization ON COMMIT DROP AS "
+            f"SELECT {cols} FROM immunization_fact WITH NO DATA"
+        )
+        copy_chunk(cur, "stg_immunization", fact)
+        cur.execute(
+            f"""
+            INSERT INTO immunization_fact ({cols})
+            SELECT {cols} FROM stg_immunization
+            ON CONFLICT (country_id, vaccine_id, year) DO UPDATE SET {updates}
+            """
+        )
+
+        tables = ["country_dim", "vaccine_dim", "immunization_fact"]
+        bump_table_versions(cur, tables)
+        refresh_materialized_views(cur, tables)
+        conn.commit()
+
+        elapsed = time.perf_counter() - start
+        print(
+            f"Sucesso: {len(countries)} países, {len(vaccines)} vacinas e {len(fact)} factos "
+            f"carregados em {elapsed:.1f}s ({len(fact) / elapsed:,.0f} linhas/s)."
+        )
+        return {"rows_read": len(fact), "countries": len(countries), "vaccines": len(vaccines)}
+    except Exception as e:
+        conn.rollback()
+        print(f"Erro na ingestão WUENIC: {e}")
+    finally:
+        cur.close()
+        conn.close()
 
 
 if __name__ == "__main__":
-    ingest_wuenic("data/wuenic_input.xlsx")
+    import sys
+
+    ingest_wuenic(sys.argv[1] if len(sys.argv) > 1 else "data/wuenic_input.xlsx")
@@ -0,0 +1,168 @@
+"""
+Cache Parquet (Arrow) dos DataFrames já limpos e tipados pelos loaders ingest_*.py.
+Cada entrada é chaveada pelo hash dos ficheiros de origem e pela versão do código de
+limpeza (hash do código-fonte das funções e da configuração usadas), por isso uma
+nova release dos dados ou uma alteração à limpeza invalidam-na automaticamente.
+Com a cache quente, recarregar (ou carregar numa base de dados nova) salta o parsing
+do CSV/XLSX e a limpeza em pandas: fica só a escrita na base de dados.
+
+Sem pyarrow, ou com PARQUET_CACHE=0, os loaders funcionam como antes, sem cache.
+"""
+
+import hashlib
+import inspect
+import os
+import shutil
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # cache desativada
+    pa = pq = None
+
+PARQUET_CACHE = os.getenv("PARQUET_CACHE", "1") == "1"
+PARQUET_CACHE_DIR = os.getenv(
+    "PARQUET_CACHE_DIR",
+    os.path.join(os.path.dirname(__file__), "..", "..", "data", "parquet_cache"),
+)
+_HASH_BLOCK = 1024 * 1024
+
+
+def enabled() -> bool:
+    return PARQUET_CACHE and pq is not None
+
+
+def file_hash(path) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(_HASH_BLOCK):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def code_version(*parts) -> str:
+    """Hash do código-fonte das funções/classes e do repr dos restantes objetos."""
+    sha = hashlib.sha256()
+    for part in parts:
+        if callable(part):
+            try:
+                part = inspect.getsource(part)
+            except (OSError, TypeError):
+                part = getattr(part, "__qualname__", repr(part))
+        sha.update(repr(part).encode("utf-8"))
+    return sha.hexdigest()[:16]
+
+
+def cache_key(sources, version: str) -> str:
+    sha = hashlib.sha256(version.encode("utf-8"))
+    for source in sources:
+        sha.update(file_hash(source).encode("utf-8"))
+    return sha.hexdigest()[:24]
+
+
+def _arrow_type(series: pd.Series):
+    if pd.api.types.is_bool_dtype(series):
+        return pa.bool_()
+    if pd.api.types.is_integer_dtype(series):
+        return pa.int64()
+    if pd.api.types.is_float_dtype(series):
+        return pa.float64()
+    return pa.string()
+
+
+def _to_table(df: pd.DataFrame, schema=None):
+    # Schema explícito: um chunk com uma coluna só de NULL não pode mudar o tipo
+    if schema is None:
+        schema = pa.schema([(col, _arrow_type(df[col])) for col in df.columns])
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def _entry_dir(name: str, key: str) -> str:
+    return os.path.join(PARQUET_CACHE_DIR, f"{name}-{key}")
+
+
+def _commit(name: str, key: str, tmp_dir: str):
+    """Publica a entrada nova e apaga as versões antigas do mesmo loader."""
+    for entry in os.listdir(PARQUET_CACHE_DIR):
+        # Nome exato ("t-a" não apaga "t-a-b-<key>"): a chave nunca tem "-"
+        if entry.rsplit("-", 1)[0] == name and not entry.startswith(f"{name}-{key}"):
+            shutil.rmtree(os.path.join(PARQUET_CACHE_DIR, entry), ignore_errors=True)
+    os.replace(tmp_dir, _entry_dir(name, key))
+
+
+def _tmp_dir(name: str, key: str) -> str:
+    tmp_dir = _entry_dir(name, key) + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    return tmp_dir
+
+
+def cached_frames(name: str, sources, version: str, build) -> dict:
+    """
+    DataFrames limpos de um loader ({nome: DataFrame}); 'build()' só corre quando a
+    cache não tem uma entrada para estes ficheiros de origem e esta versão da limpeza.
+    """
+    if not enabled():
+        return build()
+
+    key = cache_key(sources, version)
+    entry = _entry_dir(name, key)
+    if os.path.isdir(entry):
+        print(f"Cache Parquet: {name} lido de {entry}")
+        return {
+            file[: -len(".parquet")]: pq.read_table(os.path.join(entry, file)).to_pandas()
+            for file in sorted(os.listdir(entry))
+        }
+
+    frames = build()
+    tmp_dir = _tmp_dir(name, key)
+    try:
+        for frame_name, df in frames.items():
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            pq.write_table(table, os.path.join(tmp_dir, f"{frame_name}.parquet"))
+    except (pa.ArrowException, OSError) as e:
+        # Ex.: coluna com tipos misturados; a ingestão continua sem cache
+        print(f"Aviso: não foi possível guardar {name} na cache Parquet: {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return frames
+    _commit(name, key, tmp_dir)
+    return frames
+
+
+def cached_chunks(name: str, sources, version: str, build_chunks, chunksize: int):
+    """
+    Versão em streaming para os loaders em chunks: com a cache quente lê os row groups
+    do Parquet em lotes de 'chunksize' linhas; senão escreve cada chunk produzido por
+    'build_chunks()' num row group enquanto o devolve. A entrada só é publicada se o
+    iterador chegar ao fim.
+    """
+    if not enabled():
+        yield from build_chunks()
+        return
+
+    key = cache_key(sources, version)
+    entry = _entry_dir(name, key)
+    path = os.path.join(entry, "data.parquet")
+    if os.path.exists(path):
+        print(f"Cache Parquet: {name} lido de {entry}")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+        return
+
+    tmp_dir = _tmp_dir(name, key)
+    writer = schema = None
+    try:
+        for chunk in build_chunks():
+            table = _to_table(chunk, schema)
+            if writer is None:
+                schema = table.schema
+                writer = pq.ParquetWriter(os.path.join(tmp_dir, "data.parquet"), schema)
+            writer.write_table(table)
+            yield chunk
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        _commit(name, key, tmp_dir)
@@ -0,0 +1,173 @@
+"""
+Renderização determinística (sem LLM) de resultados estruturados em markdown
+português: escalares e linhas únicas como frases/listas, resultados pequenos como
+tabela, com rótulos pt-PT para as colunas conhecidas. Usado pelo sql_query e pelo
+mongo_query; acima de RENDER_MAX_COMPLEXITY o resultado segue para a explicação pelo LLM.
+"""
+
+import datetime
+import os
+from decimal import Decimal
+
+# Células + texto/100 caracteres; acima disto a explicação do LLM compensa
+RENDER_MAX_COMPLEXITY = int(os.getenv("RENDER_MAX_COMPLEXITY", "40"))
+
+
+def format_value(value) -> str:
+    """Formato pt-PT: vírgula decimal, espaço como separador de milhares (>= 10 000)."""
+    if value is None:
+        return "—"
+    if isinstance(value, bool):
+        return "sim" if value else "não"
+    if isinstance(value, int):
+        return f"{value:,}".replace(",", " ") if abs(value) >= 10000 else str(value)
+    if isinstance(value, (float, Decimal)):
+        text = f"{value:,.2f}" if abs(value) >= 10000 else f"{value:.2f}"
+        return text.replace(",", " ").replace(".", ",")
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return " ".join(str(value).split())
+
+
+# Rótulos pt-PT das colunas conhecidas (tabelas, vistas mv_* e templates);
+# as restantes usam o nome da coluna humanizado
+COLUMN_LABELS = {
+    # Agregados sem alias (nomes que o Postgres dá às colunas)
+    "count": "Total",
+    "sum": "Soma",
+    "avg": "Média",
+    "min": "Mínimo",
+    "max": "Máximo",
+    # Dimensões comuns
+    "country": "País",
+    "country_name": "País",
+    "iso_code": "Código ISO",
+    "year": "Ano",
+    "survey_year": "Ano do inquérito",
+    "year_start": "Ano de início",
+    "year_end": "Ano de fim",
+    "state_code": "Estado (FIPS)",
+    "location_desc": "Local",
+    "gender": "Género",
+    "age_group": "Faixa etária",
+    "disease": "Doença",
+    "disease_name": "Doença",
+    "disease_category": "Categoria da doença",
+    "symptom": "Sintoma",
+    "precaution": "Precaução",
+    "topic": "Tema",
+    "question": "Pergunta",
+    "data_value": "Valor",
+    "data_value_unit": "Unidade",
+    # Global health
+    "prevalence_rate": "Taxa de prevalência",
+    "incidence_rate": "Taxa de incidência",
+    "mortality_rate": "Taxa de mortalidade",
+    "recovery_rate": "Taxa de recuperação",
+    "population_affected": "População afetada",
+    "dalys": "DALYs",
+    "healthcare_access_pct": "Acesso a cuidados de saúde (%)",
+    "doctors_per_1000": "Médicos por 1000 habitantes",
+    "hospital_beds_per_1000": "Camas hospitalares por 1000 habitantes",
+    "average_treatment_cost_usd": "Custo médio do tratamento (USD)",
+    "avg_prevalence_rate": "Taxa de prevalência média",
+    "avg_incidence_rate": "Taxa de incidência média",
+    "avg_mortality_rate": "Taxa de mortalidade média",
+    "avg_recovery_rate": "Taxa de recuperação média",
+    "total_population_affected": "População afetada total",
+    "total_dalys": "DALYs totais",
+    "avg_healthcare_access_pct": "Acesso médio a cuidados de saúde (%)",
+    "avg_doctors_per_1000": "Média de médicos por 1000 habitantes",
+    "avg_hospital_beds_per_1000": "Média de camas hospitalares por 1000 habitantes",
+    "avg_treatment_cost_usd": "Custo médio do tratamento (USD)",
+    "n_records": "Nº de registos",
+    # BRFSS (mv_brfss_state_rates)
+    "n_respondents": "Nº de inquiridos",
+    "diabetes_pct": "Diabetes (%)",
+    "asthma_pct": "Asma (%)",
+    "stroke_pct": "AVC (%)",
+    "heart_attack_pct": "Enfarte (%)",
+    "heart_disease_pct": "Doença cardíaca (%)",
+    "copd_pct": "DPOC (%)",
+    "depression_pct": "Depressão (%)",
+    "kidney_disease_pct": "Doença renal (%)",
+    "arthritis_pct": "Artrite (%)",
+    "skin_cancer_pct": "Cancro de pele (%)",
+    "other_cancer_pct": "Outros cancros (%)",
+    "high_blood_pressure_pct": "Hipertensão (%)",
+    "high_cholesterol_pct": "Colesterol elevado (%)",
+    "smoked_100_pct": "Fumou 100+ cigarros (%)",
+    "binge_drinking_pct": "Consumo excessivo de álcool (%)",
+    "exercise_any_pct": "Pratica exercício (%)",
+    "bmi": "IMC",
+    "avg_bmi": "IMC médio",
+    # Vacinação (WUENIC)
+    "vaccine_code": "Vacina",
+    "wuenic_coverage": "Cobertura WUENIC (%)",
+    "administrative_coverage": "Cobertura administrativa (%)",
+    "calculated_coverage": "Cobertura calculada (%)",
+    "children_vaccinated": "Crianças vacinadas",
+    "children_target": "Crianças na população-alvo",
+    "anomaly_flag": "Anomalia",
+    "n_countries": "Nº de países",
+    "avg_wuenic_coverage": "Cobertura WUENIC média (%)",
+    "weighted_coverage_pct": "Cobertura ponderada (%)",
+    # Medicamentos
+    "drug_name": "Medicamento",
+    "generic_name": "Nome genérico",
+    "side_effects": "Efeitos secundários",
+    "medical_condition": "Condição médica",
+    "drug_classes": "Classes do medicamento",
+    "brand_names": "Marcas",
+    "rating": "Avaliação",
+    "no_of_reviews": "Nº de avaliações",
+}
+
+
+def column_label(column: str) -> str:
+    return COLUMN_LABELS.get(column.lower()) or column.replace("_", " ").strip().capitalize()
+
+
+def complexity(columns, rows) -> int:
+    chars = sum(len(str(v)) for row in rows for v in row if v is not None)
+    return len(rows) * max(len(columns), 1) + chars // 100
+
+
+def render_table(columns, rows) -> str:
+    def cell(value):
+        return format_value(value).replace("|", "\\|")
+
+    lines = [
+        "| " + " | ".join(column_label(c) for c in columns) + " |",
+        "|" + "|".join(" --- " for _ in columns) + "|",
+    ]
+    lines += ["| " + " | ".join(cell(v) for v in row) + " |" for row in rows]
+    return "\n".join(lines)
+
+
+def render_rows(columns, rows) -> str | None:
+    """
+    Markdown para um resultado tabular, ou None se for complexo demais
+    (nesse caso o chamador usa o LLM).
+    """
+    if not rows or complexity(columns, rows) > RENDER_MAX_COMPLEXITY:
+        return None
+
+    if len(rows) == 1 and len(columns) == 1:
+        return f"{column_label(columns[0])}: **{format_value(rows[0][0])}**."
+    if len(rows) == 1:
+        return "\n".join(
+            f"- **{column_label(c)}**: {format_value(v)}" for c, v in zip(columns, rows[0])
+        )
+    if len(columns) == 1:
+        items = "\n".join(f"- {format_value(row[0])}" for row in rows)
+        return f"{column_label(columns[0])} ({len(rows)}):\n{items}"
+    return f"Encontrei {len(rows)} resultados:\n\n{render_table(columns, rows)}"
+
+
+def render_list(title: str, items) -> str | None:
+    """Lista markdown com título, ou None se for longa demais."""
+    items = list(items)
+    if complexity(["item"], [(i,) for i in items]) > RENDER_MAX_COMPLEXITY:
+        return None
+    return f"{title} ({len(items)}):\n" + "\n".join(f"- {item}" for item in items)
@@ -0,0 +1,40 @@
+import io
+
+from utils.copy_loader import iter_csv_chunks, row_hash_sql, rows_changed
+
+CSV = "Year,Value,Name,Unused\n2019,1.5,a,x\n2020,~,b,y\n,3,c,z\n"
+
+
+def test_chunks_use_only_mapped_columns_and_declared_types(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text(CSV)
+
+    chunks = list(
+        iter_csv_chunks(
+            path,
+            {"Year": "year", "Value": "value", "Name": "name", "Missing": "missing"},
+            dtypes={"year": "int", "value": "float"},
+            chunksize=2,
+        )
+    )
+
+    assert [len(c) for c in chunks] == [2, 1]
+    first = chunks[0]
+    assert list(first.columns) == ["year", "value", "name"]
+    assert first["value"].isna().tolist() == [False, True]
+
+    # Inteiros sem ".0" e NULL como campo vazio, como o COPY espera
+    buf = io.StringIO()
+    chunks[1].to_csv(buf, index=False, header=False)
+    assert buf.getvalue() == ",3.0,c\n"
+    buf = io.StringIO()
+    first.to_csv(buf, index=False, header=False)
+    assert buf.getvalue().splitlines() == ["2019,1.5,a", "2020,,b"]
+
+
+def test_row_hash_sql_and_delta_counts():
+    # ROW(...)::text distingue NULL de '' (concat_ws ignoraria o NULL)
+    assert row_hash_sql(["drug_name", "rating"], "s") == "md5(ROW(s.drug_name, s.rating)::text)"
+    stats = {"rows_inserted": 2, "rows_updated": 1, "rows_unchanged": 40, "rows_deleted": 0}
+    assert rows_changed(stats) == 3
+    assert rows_changed({"rows_unchanged": 5}) == 0
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+pytest.importorskip("duckdb")
+pytest.importorskip("psycopg2")
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from sql import duckdb_backend  # noqa: E402
+from sql.duckdb_backend import AnalyticsFallback, run_analytics, use_analytics  # noqa: E402
+
+
+@pytest.fixture
+def snapshots(tmp_path, monkeypatch):
+    pq.write_table(
+        pa.table({"state_code": [1, 1, 2], "bmi": [20.0, 30.0, 25.0]}),
+        tmp_path / "brfss_responses.parquet",
+    )
+    (tmp_path / "manifest.json").write_text(
+        json.dumps({"brfss_responses": {"version": 3, "rows": 3, "exported_at": "-"}})
+    )
+    monkeypatch.setattr(duckdb_backend, "SQL_ANALYTICS_DIR", str(tmp_path))
+    duckdb_backend.close()
+    yield tmp_path
+    duckdb_backend.close()
+
+
+def test_only_fresh_aggregates_use_duckdb(snapshots):
+    sql = "SELECT state_code, AVG(bmi) FROM brfss_responses GROUP BY state_code"
+    assert use_analytics(sql, {"brfss_responses"}, {"brfss_responses": 3})
+    # Ingestão depois do snapshot, tabela sem snapshot ou query sem agregação
+    assert not use_analytics(sql, {"brfss_responses"}, {"brfss_responses": 4})
+    assert not use_analytics(sql, {"brfss_responses", "diseases"}, {"brfss_responses": 3})
+    assert not use_analytics(
+        "SELECT bmi FROM brfss_responses", {"brfss_responses"}, {"brfss_responses": 3}
+    )
+
+
+def test_run_analytics_applies_limit(snapshots):
+    sql, columns, rows = run_analytics(
+        "SELECT state_code, AVG(bmi) AS avg_bmi FROM brfss_responses "
+        "GROUP BY state_code ORDER BY state_code LIMIT 1000"
+    )
+    assert sql.endswith("LIMIT 200")
+    assert columns == ["state_code", "avg_bmi"]
+    assert rows == [(1, 25.0), (2, 25.0)]
+
+
+def test_integer_division_matches_postgres(snapshots):
+    # No Postgres: SELECT 3 / 2, 4 / 3, -7 / 2, 7.0 / 2 -> 1, 1, -3, 3.5
+    _, _, rows = run_analytics(
+        "SELECT COUNT(*) / 2, SUM(state_code) / 3, -7 / 2, 7.0 / 2 FROM brfss_responses"
+    )
+    assert rows == [(1, 1, -3, 3.5)]
+
+
+def test_errors_and_file_access_fall_back_to_postgres(snapshots):
+    with pytest.raises(AnalyticsFallback):
+        run_analytics("SELECT COUNT(*) FROM diseases")
+    with pytest.raises(AnalyticsFallback):
+        run_analytics("SELECT COUNT(*) FROM read_csv('/etc/passwd')")
@@ -0,0 +1,29 @@
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from sql.guardrails import ensure_limit  # noqa: E402
+
+
+@pytest.mark.parametrize(
+    "sql, expected",
+    [
+        ("SELECT 1 FROM t", "SELECT 1 FROM t LIMIT 200"),
+        ("SELECT 1 FROM t;", "SELECT 1 FROM t LIMIT 200"),
+        ("SELECT 1 FROM t LIMIT 10", "SELECT 1 FROM t LIMIT 10"),
+        ("SELECT 1 FROM t LIMIT 5000 OFFSET 20", "SELECT 1 FROM t LIMIT 200 OFFSET 20"),
+        ("SELECT 1 FROM t LIMIT ALL", "SELECT 1 FROM t LIMIT 200"),
+        ("select 1 from t limit all offset 5;", "select 1 from t LIMIT 200 offset 5"),
+        ("SELECT 1 FROM t OFFSET 5 LIMIT 500", "SELECT 1 FROM t OFFSET 5 LIMIT 200"),
+        ("SELECT 1 FROM t OFFSET 10", "SELECT 1 FROM t LIMIT 200 OFFSET 10"),
+        ("SELECT 1 FROM t OFFSET 10 ROWS", "SELECT 1 FROM t LIMIT 200 OFFSET 10 ROWS"),
+        ("SELECT 1 FROM t FETCH FIRST 10 ROWS ONLY", "SELECT 1 FROM t FETCH FIRST 10 ROWS ONLY"),
+        ("SELECT 1 FROM t FETCH NEXT ROW ONLY", "SELECT 1 FROM t FETCH NEXT ROW ONLY"),
+        (
+            "SELECT 1 FROM t ORDER BY 1 OFFSET 5 ROWS FETCH FIRST 5000 ROWS WITH TIES",
+            "SELECT 1 FROM t ORDER BY 1 OFFSET 5 ROWS FETCH FIRST 200 ROWS WITH TIES",
+        ),
+    ],
+)
+def test_ensure_limit(sql, expected):
+    assert ensure_limit(sql, max_rows=200) == expected
@@ -0,0 +1,30 @@
+import pytest
+
+from ingest_all import JOBS, Job, blocked_jobs, ready_jobs, select_jobs, validate
+
+DAG = [
+    Job("a", ".", "m"),
+    Job("b", ".", "m", deps=("a",)),
+    Job("c", ".", "m", deps=("b",)),
+    Job("d", ".", "m"),
+]
+
+
+def test_declared_jobs_form_a_dag():
+    validate(JOBS)
+    medline = next(job for job in JOBS if job.name == "medlineplus")
+    assert medline.deps == ("symptoms",)
+
+
+def test_cycles_and_unknown_dependencies_are_rejected():
+    with pytest.raises(ValueError, match="Ciclo"):
+        validate([Job("a", ".", "m", deps=("b",)), Job("b", ".", "m", deps=("a",))])
+    with pytest.raises(ValueError, match="desconhecidas"):
+        validate([Job("a", ".", "m", deps=("x",))])
+
+
+def test_scheduling_follows_dependencies():
+    assert [j.name for j in ready_jobs(DAG, set(), set())] == ["a", "d"]
+    assert [j.name for j in ready_jobs(DAG, {"a"}, {"a", "d"})] == ["b"]
+    assert blocked_jobs(DAG, {"a"}) == {"b", "c"}
+    assert [j.name for j in select_jobs(DAG, ["c"])] == ["a", "b", "c"]
@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("chromadb")
+pytest.importorskip("pymongo")
+
+from ingest_wuenic import MAX_COVERAGE, clean_wuenic_data  # noqa: E402
+
+
+def test_coverage_outside_the_column_range_becomes_null():
+    df = pd.DataFrame(
+        {
+            "Country": ["a", "b", "c", "d"],
+            "Vaccine": ["dtp1"] * 4,
+            "Year": [2020] * 4,
+            "WUENIC": [99, 90, 80, 95],
+            "ChildrenVaccinated": [10321, 900, 50, 9999999],
+            "ChildrenInTarget": [1000, 1000, 0, 1000],
+        }
+    )
+
+    out = clean_wuenic_data(df).set_index("Country")["calculated_coverage"]
+
+    # 1032% e 999995% não cabem em NUMERIC(5,2); alvo 0 daria infinito
+    assert out.isna().tolist() == [True, False, True, True]
+    assert out["B"] == 90
+    assert (out.dropna().abs() < MAX_COVERAGE).all()
+
+
+def test_anomaly_flag_uses_the_raw_ratio():
+    df = pd.DataFrame(
+        {
+            "Country": ["a"],
+            "Vaccine": ["dtp1"],
+            "Year": [2020],
+            "WUENIC": [99],
+            "ChildrenVaccinated": [10321],
+            "ChildrenInTarget": [1000],
+        }
+    )
+
+    assert clean_wuenic_data(df)["anomaly_flag"].tolist() == [True]
@@ -0,0 +1,65 @@
+import io
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import parquet_cache  # noqa: E402
+from copy_loader import convert_types, iter_csv_chunks  # noqa: E402
+
+CSV = "Year,Value,Name\n2019,1.5,a\n2020,~,\n,3,\n"
+
+
+def _csv_lines(chunks):
+    lines = []
+    for chunk in chunks:
+        buf = io.StringIO()
+        chunk.to_csv(buf, index=False, header=False)
+        lines += buf.getvalue().splitlines()
+    return lines
+
+
+def test_warm_cache_replays_typed_chunks_without_reparsing(tmp_path, monkeypatch):
+    monkeypatch.setattr(parquet_cache, "PARQUET_CACHE_DIR", str(tmp_path / "cache"))
+    (tmp_path / "cache").mkdir()
+    source = tmp_path / "data.csv"
+    source.write_text(CSV)
+    columns_map = {"Year": "year", "Value": "value", "Name": "name"}
+    dtypes = {"year": "int", "value": "float"}
+    version = parquet_cache.code_version(columns_map, dtypes, convert_types)
+    parsed = []
+
+    def build():
+        parsed.append(True)
+        return iter_csv_chunks(source, columns_map, dtypes, chunksize=2)
+
+    cold = _csv_lines(parquet_cache.cached_chunks("t", [source], version, build, 2))
+    warm = _csv_lines(parquet_cache.cached_chunks("t", [source], version, build, 2))
+
+    assert len(parsed) == 1
+    # Inteiros continuam sem ".0" depois de passarem pelo Parquet
+    assert warm == cold == ["2019,1.5,a", "2020,,", ",3.0,"]
+
+    # Nova release do ficheiro: a entrada antiga é substituída
+    source.write_text(CSV + "2021,4,d\n")
+    rows = _csv_lines(parquet_cache.cached_chunks("t", [source], version, build, 2))
+    assert len(parsed) == 2 and len(rows) == 4
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+
+
+def test_entries_are_only_replaced_by_the_same_name(tmp_path, monkeypatch):
+    monkeypatch.setattr(parquet_cache, "PARQUET_CACHE_DIR", str(tmp_path / "cache"))
+    (tmp_path / "cache").mkdir()
+    source = tmp_path / "data.csv"
+    source.write_text(CSV)
+    columns_map = {"Year": "year", "Value": "value", "Name": "name"}
+
+    def build():
+        return iter_csv_chunks(source, columns_map, {"year": "int"}, chunksize=2)
+
+    # Um ficheiro por ano da mesma tabela, e um nome que é prefixo do outro
+    for name, version in [("t-2022", "a"), ("t-2022-b", "a"), ("t-2023", "a"), ("t-2022", "b")]:
+        list(parquet_cache.cached_chunks(name, [source], version, build, 2))
+
+    names = sorted(entry.name.rsplit("-", 1)[0] for entry in (tmp_path / "cache").iterdir())
+    assert names == ["t-2022", "t-2022-b", "t-2023"]
@@ -0,0 +1,61 @@
+import time
+
+from sql.query_cache import TTLCache, normalize_question, referenced_tables, sql_hash
+
+TABLES = ["global_health_stats", "drugs_side_effects", "country_dim", "immunization_fact"]
+
+
+def test_normalize_question_ignores_case_accents_and_punctuation():
+    assert normalize_question("  Qual a prevalência da Diabetes em Portugal? ") == (
+        normalize_question("qual a prevalencia da diabetes em portugal")
+    )
+
+
+def test_sql_hash_ignores_whitespace_and_trailing_semicolon():
+    assert sql_hash("SELECT *\n  FROM drugs_side_effects;") == sql_hash(
+        "SELECT * FROM drugs_side_effects"
+    )
+
+
+def test_referenced_tables_from_and_join():
+    sql = (
+        "SELECT c.country_name, f.year FROM immunization_fact f "
+        "JOIN public.country_dim c ON c.id = f.country_id"
+    )
+    assert referenced_tables(sql, TABLES) == {"immunization_fact", "country_dim"}
+
+
+def test_referenced_tables_unknown_falls_back_to_all():
+    assert referenced_tables("SELECT 1", TABLES) == set(TABLES)
+
+
+def test_cache_invalidated_when_table_version_changes():
+    cache = TTLCache(maxsize=4, ttl=60)
+    cache.set("q", "SELECT 1", {"drugs_side_effects"}, {"drugs_side_effects": 1})
+
+    assert cache.get("q", {"drugs_side_effects": 1}) == "SELECT 1"
+    assert cache.get("q", {"drugs_side_effects": 1, "global_health_stats": 7}) == "SELECT 1"
+    assert cache.get("q", {"drugs_side_effects": 2}) is None
+    assert len(cache) == 0
+
+
+def test_cache_lru_eviction_and_invalidate_tables():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1, {"country_dim"})
+    cache.set("b", 2, {"drugs_side_effects"})
+    cache.get("a")
+    cache.set("c", 3, {"drugs_side_effects"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    cache.invalidate_tables(["drugs_side_effects"])
+    assert cache.get("c") is None
+    assert cache.get("a") == 1
+
+
+def test_cache_ttl_expiry():
+    cache = TTLCache(maxsize=2, ttl=0)
+    cache.set("a", 1)
+    time.sleep(0.01)
+    assert cache.get("a") is None
@@ -0,0 +1,39 @@
+from decimal import Decimal
+
+from utils.result_render import column_label, format_value, render_list, render_rows
+
+
+def test_format_value_portuguese_numbers():
+    assert format_value(Decimal("12.5")) == "12,50"
+    assert format_value(1234567) == "1 234 567"
+    assert format_value(2020) == "2020"
+    assert format_value(None) == "—"
+
+
+def test_scalar_is_a_sentence():
+    assert render_rows(["avg_prevalence_rate"], [(Decimal("3.1"),)]) == (
+        "Taxa de prevalência média: **3,10**."
+    )
+
+
+def test_column_labels_are_portuguese_with_humanised_fallback():
+    assert column_label("country_name") == "País"
+    assert column_label("COUNT") == "Total"
+    assert column_label("some_new_metric") == "Some new metric"
+
+
+def test_small_result_is_a_table():
+    text = render_rows(["country", "year"], [("Portugal", 2019), ("Spain", 2019)])
+    assert text.startswith("Encontrei 2 resultados:")
+    assert "| País | Ano |" in text
+    assert "| Portugal | 2019 |" in text
+
+
+def test_complex_result_falls_back_to_llm():
+    rows = [("x" * 50, i, i) for i in range(30)]
+    assert render_rows(["a", "b", "c"], rows) is None
+    assert render_rows(["a"], []) is None
+
+
+def test_render_list():
+    assert render_list("Coleções", ["a", "b"]) == "Coleções (2):\n- a\n- b"
@@ -0,0 +1,78 @@
+import os
+import uuid
+from pathlib import Path
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+# DSN de um servidor Postgres descartável (o teste cria e apaga a sua própria base de dados)
+DSN = os.getenv("SQL_TEST_DSN")
+pytestmark = pytest.mark.skipif(not DSN, reason="SQL_TEST_DSN não definido")
+
+DATABASE_DIR = Path(__file__).resolve().parent.parent / "database"
+
+
+def _run_script(conn, name):
+    with conn.cursor() as cur:
+        cur.execute((DATABASE_DIR / name).read_text())
+
+
+def _columns(conn, relation):
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT attname FROM pg_attribute"
+            " WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped",
+            (relation,),
+        )
+        return {r[0] for r in cur.fetchall()}
+
+
+@pytest.fixture
+def fresh_db():
+    # Base de dados vazia, como a que o docker-entrypoint-initdb.d recebe
+    name = f"test_{uuid.uuid4().hex[:12]}"
+    admin = psycopg2.connect(DSN)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(f"CREATE DATABASE {name}")
+    conn = psycopg2.connect(DSN, dbname=name)
+    conn.autocommit = True
+    try:
+        yield conn
+    finally:
+        conn.close()
+        with admin.cursor() as cur:
+            cur.execute(f"DROP DATABASE {name}")
+        admin.close()
+
+
+def test_init_scripts_run_on_a_fresh_database(fresh_db):
+    _run_script(fresh_db, "schema.sql")
+    _run_script(fresh_db, "materialized_views.sql")
+    assert "survey_year" in _columns(fresh_db, "mv_brfss_state_rates")
+
+    # Idempotente: voltar a correr não falha nem recria a vista
+    _run_script(fresh_db, "materialized_views.sql")
+
+
+def test_materialized_views_recreates_the_view_after_a_drop_or_legacy_layout(fresh_db):
+    _run_script(fresh_db, "schema.sql")
+
+    # Como após partitioned_layout.sql, que apaga a vista
+    _run_script(fresh_db, "materialized_views.sql")
+    with fresh_db.cursor() as cur:
+        cur.execute("DROP MATERIALIZED VIEW mv_brfss_state_rates")
+    _run_script(fresh_db, "materialized_views.sql")
+    assert "survey_year" in _columns(fresh_db, "mv_brfss_state_rates")
+
+    # Versão antiga, agregada só por estado
+    with fresh_db.cursor() as cur:
+        cur.execute("DROP MATERIALIZED VIEW mv_brfss_state_rates")
+        cur.execute(
+            "CREATE MATERIALIZED VIEW mv_brfss_state_rates AS"
+            " SELECT state_code, COUNT(*) AS n_respondents FROM brfss_responses"
+            " GROUP BY state_code"
+        )
+    _run_script(fresh_db, "materialized_views.sql")
+    assert "survey_year" in _columns(fresh_db, "mv_brfss_state_rates")
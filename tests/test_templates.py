@@ -0,0 +1,41 @@
+from sql.templates import find_slot_values, match_template
+
+KNOWN = {
+    ("global_health_stats", "disease_name"): {"malaria": "Malaria", "hiv aids": "HIV/AIDS"},
+    ("global_health_stats", "country"): {
+        "africa": "Africa",
+        "south africa": "South Africa",
+        "portugal": "Portugal",
+    },
+    ("global_health_stats", "year"): {"2019": 2019, "2020": 2020},
+    ("drugs_side_effects", "drug_name"): {"o neil": "O'Neil", "ibuprofen": "ibuprofen"},
+}
+
+
+def test_longest_value_wins():
+    assert find_slot_values(
+        "malaria in south africa", KNOWN[("global_health_stats", "country")]
+    ) == {"South Africa"}
+
+
+def test_prevalence_with_year_fills_all_slots():
+    match = match_template("Qual a prevalência de HIV/AIDS em Portugal em 2020?", KNOWN)
+    assert match.template.name == "prevalence_country_year"
+    assert match.values == {"disease": "HIV/AIDS", "country": "Portugal", "year": 2020}
+    assert "country = 'Portugal' AND year = 2020" in match.sql
+
+
+def test_unknown_year_or_ambiguous_slot_falls_back():
+    assert match_template("prevalência de malária em Portugal em 1999", KNOWN) is None
+    assert match_template("prevalência de malária em Portugal e South Africa", KNOWN) is None
+
+
+def test_literals_are_quoted():
+    match = match_template("efeitos secundários de O'Neil", KNOWN)
+    assert match.sql.endswith("drug_name = 'O''Neil'")
+
+
+def test_templates_require_their_tables():
+    assert (
+        match_template("mortalidade de malária em Portugal", KNOWN, ["drugs_side_effects"]) is None
+    )
@@ -0,0 +1,53 @@
+from sql.value_grounding import ValueDictionary, ground_literals
+
+KNOWN = {
+    ("country_dim", "country_name"): {"portugal": "PORTUGAL", "south africa": "SOUTH AFRICA"},
+    ("global_health_stats", "disease_name"): {
+        "alzheimer s disease": "Alzheimer's Disease",
+        "diabetes": "Diabetes",
+        "hiv aids": "HIV/AIDS",
+        "hepatitis b": "Hepatitis B",
+        "lung cancer": "Lung Cancer",
+    },
+    ("chronic_disease_indicators", "topic"): {"diabetes": "Diabetes"},
+}
+
+DICTIONARY = ValueDictionary(KNOWN)
+
+
+def test_case_and_fuzzy_literals_are_grounded():
+    sql, replacements = ground_literals(
+        "SELECT * FROM mv_immunization_coverage c WHERE c.country_name = 'Portugal' "
+        "AND disease_name='Diabets'",
+        DICTIONARY,
+    )
+    assert "c.country_name = 'PORTUGAL'" in sql
+    assert "disease_name='Diabetes'" in sql
+    assert replacements == [
+        ("country_name", "Portugal", "PORTUGAL"),
+        ("disease_name", "Diabets", "Diabetes"),
+    ]
+
+
+def test_in_lists_and_quoting():
+    sql, _ = ground_literals(
+        "SELECT * FROM t WHERE disease_name IN ('Disease, Alzheimer''s', 'hiv/aids')", DICTIONARY
+    )
+    assert sql.endswith("IN ('Alzheimer''s Disease', 'HIV/AIDS')")
+
+
+def test_exact_unknown_and_other_columns_are_untouched():
+    sql = (
+        "SELECT * FROM t WHERE topic = 'Diabetes' AND disease_name = 'Tuberculosis' "
+        "AND gender = 'female' AND LOWER(country_name) = 'portugal'"
+    )
+    assert ground_literals(sql, DICTIONARY) == (sql, [])
+
+
+def test_short_ambiguous_literals_are_untouched():
+    # Contidos num único valor, mas cobrem só parte dele
+    sql = (
+        "SELECT * FROM t WHERE disease_name = 'B' OR disease_name = 'Cancer' "
+        "OR disease_name IN ('alzheimer')"
+    )
+    assert ground_literals(sql, DICTIONARY) == (sql, [])